@@ -0,0 +1,165 @@
+# coding: utf-8
+"""
+Benchmark of check_accounting_update (oaraccounting) after a burst of short jobs:
+
+- legacy: windows are updated job by job with update_accounting (a SELECT then an UPDATE
+  or INSERT per window and per type), measured on NB_LEGACY_JOBS jobs
+- bulk: check_accounting_update, windows of all the jobs are summed in memory and written
+  with an INSERT ... ON CONFLICT DO UPDATE statement, measured on NB_JOBS jobs
+
+The database is a sqlite in-memory one unless DB_TYPE="Pg" and the DB_* variables of
+oar.conf are given through the environment (e.g. DB_HOSTNAME, DB_BASE_NAME, DB_BASE_LOGIN,
+DB_BASE_PASSWD).
+"""
+import contextlib
+import io
+import os
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from oar.lib.accounting import check_accounting_update, update_accounting
+from oar.lib.globals import init_config, init_oar
+from oar.lib.models import (
+    Accounting,
+    AssignedResource,
+    DeferredReflectionModel,
+    Job,
+    Model,
+    MoldableJobDescription,
+    Resource,
+)
+
+NB_JOBS = 100000
+NB_LEGACY_JOBS = 1000
+NB_RESOURCES = 64
+NB_USERS = 20
+WINDOW_SIZE = 3600
+
+
+def init_session():
+    config = init_config()
+    if os.environ.get("DB_TYPE", "sqlite") == "Pg":
+        for key in ("DB_HOSTNAME", "DB_BASE_NAME", "DB_BASE_LOGIN", "DB_BASE_PASSWD"):
+            if key in os.environ:
+                config[key] = os.environ[key]
+        config["DB_TYPE"] = "Pg"
+    else:
+        config["DB_TYPE"] = "sqlite"
+        config["DB_BASE_FILE"] = ":memory:"
+
+    config, engine = init_oar(config=config, no_reflect=True)
+    Model.metadata.create_all(bind=engine)
+    DeferredReflectionModel.prepare(engine)
+    return sessionmaker(bind=engine)()
+
+
+def insert_short_jobs(session, nb_jobs):
+    """Insert nb_jobs terminated jobs of 1 to 4 resources, of a few minutes each."""
+    session.query(AssignedResource).delete(synchronize_session=False)
+    session.query(MoldableJobDescription).delete(synchronize_session=False)
+    session.query(Job).delete(synchronize_session=False)
+    session.query(Accounting).delete(synchronize_session=False)
+
+    jobs = []
+    moldables = []
+    assigned_resources = []
+    for i in range(1, nb_jobs + 1):
+        start_time = 100000 + 30 * i
+        jobs.append(
+            {
+                "job_id": i,
+                "job_user": "user%d" % (i % NB_USERS),
+                "project": "project%d" % (i % 3),
+                "queue_name": "default",
+                "state": "Terminated",
+                "start_time": start_time,
+                "stop_time": start_time + 60 + (i % 7) * 60,
+                "assigned_moldable_job": i,
+                "accounted": "NO",
+            }
+        )
+        moldables.append(
+            {"moldable_id": i, "moldable_job_id": i, "moldable_walltime": 600}
+        )
+        for r in range(i % 4 + 1):
+            assigned_resources.append(
+                {"moldable_job_id": i, "resource_id": (i + r) % NB_RESOURCES + 1}
+            )
+
+    session.execute(insert(Job.__table__), jobs)
+    session.execute(insert(MoldableJobDescription.__table__), moldables)
+    session.execute(insert(AssignedResource.__table__), assigned_resources)
+    session.commit()
+
+
+def legacy_accounting_update(session, window_size):
+    """check_accounting_update before the bulk pipeline: windows updated job by job."""
+    for job in session.query(Job).filter(Job.accounted == "NO").all():
+        nb_resources = (
+            session.query(AssignedResource)
+            .filter(AssignedResource.moldable_id == job.assigned_moldable_job)
+            .count()
+        )
+        walltime = (
+            session.query(MoldableJobDescription.walltime)
+            .filter(MoldableJobDescription.id == job.assigned_moldable_job)
+            .one()[0]
+        )
+        for c_type, stop_time in (
+            ("USED", job.stop_time),
+            ("ASKED", job.start_time + walltime),
+        ):
+            update_accounting(
+                session,
+                job.start_time,
+                stop_time,
+                window_size,
+                job.user,
+                job.project,
+                job.queue_name,
+                c_type,
+                nb_resources,
+            )
+    session.query(Job).update({Job.accounted: "YES"}, synchronize_session=False)
+    session.commit()
+
+
+def accounting_rows(session):
+    return sorted(
+        (a.window_start, a.user, a.project, a.consumption_type, a.consumption)
+        for a in session.query(Accounting).all()
+    )
+
+
+def bench(name, func, session, nb_jobs):
+    insert_short_jobs(session, nb_jobs)
+    start = time.time()
+    # Accounting functions print the windows or jobs they treat
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(session, WINDOW_SIZE)
+    secs = time.time() - start
+    nb_windows = session.query(Accounting).count()
+    print(
+        "  %-7s %7d jobs %10.3f s  (%.3f ms/job, %d windows)"
+        % (name, nb_jobs, secs, secs * 1000 / nb_jobs, nb_windows)
+    )
+    return accounting_rows(session)
+
+
+def main():
+    session = init_session()
+    for r in range(1, NB_RESOURCES + 1):
+        session.execute(insert(Resource.__table__), {"resource_id": r})
+    session.commit()
+
+    rows_legacy = bench("legacy", legacy_accounting_update, session, NB_LEGACY_JOBS)
+    rows_bulk = bench("bulk", check_accounting_update, session, NB_LEGACY_JOBS)
+    assert rows_legacy == rows_bulk
+
+    bench("bulk", check_accounting_update, session, NB_JOBS)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# coding: utf-8
+"""
+Micro-benchmark of find_resource_hierarchies_scattered on 3 levels (switch/host/core)
+and 4 levels (cluster/switch/host/core) hierarchies of more than 10k cores, with:
+
+- list: levels are plain lists of ProcSet, children are found by scanning the next level
+- index: levels are built by Hierarchy, children are taken from the precomputed index
+- bitset: same as index, with blocks as bitmaps (SCHEDULER_HIERARCHY_BITSET="yes")
+"""
+import time
+
+from procset import ProcSet
+
+from oar.lib.hierarchy import Hierarchy, find_resource_hierarchies_scattered
+
+NB_CLUSTERS = 4
+NB_SWITCHES = 8
+NB_HOSTS = 20
+NB_CORES = 16
+NB_RUNS = 5
+
+
+def hierarchy_rid(nb_clusters, nb_switches, nb_hosts, nb_cores):
+    hy_rid = {"cluster": {}, "switch": {}, "host": {}, "core": {}}
+    roid = 1
+    for c in range(nb_clusters):
+        for s in range(nb_switches):
+            for h in range(nb_hosts):
+                for _ in range(nb_cores):
+                    hy_rid["cluster"].setdefault(c, []).append(roid)
+                    hy_rid["switch"].setdefault((c, s), []).append(roid)
+                    hy_rid["host"].setdefault((c, s, h), []).append(roid)
+                    hy_rid["core"][roid] = [roid]
+                    roid += 1
+    return hy_rid
+
+
+def bench(name, hy, labels, rqts, itvs):
+    levels = [hy[label] for label in labels]
+    start = time.time()
+    for _ in range(NB_RUNS):
+        res = find_resource_hierarchies_scattered(itvs, levels, rqts)
+    msecs = (time.time() - start) * 1000 / NB_RUNS
+    print("  %-7s %10.3f ms  (%d resources)" % (name, msecs, len(res)))
+    return res
+
+
+def main():
+    hy_rid = hierarchy_rid(NB_CLUSTERS, NB_SWITCHES, NB_HOSTS, NB_CORES)
+
+    start = time.time()
+    hy_index = Hierarchy(hy_rid=hy_rid).hy
+    print("index construction: %.3f ms" % ((time.time() - start) * 1000))
+    start = time.time()
+    hy_bitset = Hierarchy(hy_rid=hy_rid, bitset=True).hy
+    print("bitset construction: %.3f ms" % ((time.time() - start) * 1000))
+    hy_list = {label: list(level) for label, level in hy_index.items()}
+
+    nb_res = len(hy_index["core"])
+    # Fragmented availability: one core out of 7 is busy
+    itvs = ProcSet(*[i for i in range(1, nb_res + 1) if i % 7])
+
+    for labels, rqts in [
+        (["switch", "host", "core"], [4, 2, 8]),
+        (["switch", "host", "core"], [NB_SWITCHES * NB_CLUSTERS, 1, 1]),
+        (["cluster", "switch", "host", "core"], [2, 4, 2, 8]),
+        (["cluster", "switch", "host", "core"], [NB_CLUSTERS, NB_SWITCHES, 4, 2]),
+    ]:
+        print("%d cores, %s = %s" % (nb_res, "/".join(labels), rqts))
+        res_list = bench("list", hy_list, labels, rqts, itvs)
+        res_index = bench("index", hy_index, labels, rqts, itvs)
+        res_bitset = bench("bitset", hy_bitset, labels, rqts, itvs)
+        assert res_list == res_index == res_bitset
+
+
+if __name__ == "__main__":
+    main()
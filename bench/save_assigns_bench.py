@@ -0,0 +1,117 @@
+# coding: utf-8
+"""
+Benchmark of save_assigns on a large gantt (full machine jobs and many small jobs) with:
+
+- executemany: rows of the gantt tables are inserted by executemany (default)
+- bulk: save_assigns_bulk (SCHEDULER_SAVE_ASSIGNS_BULK="yes"), a binary COPY on PostgreSQL,
+  multi-row INSERT statements otherwise
+
+The database is a sqlite in-memory one unless DB_TYPE="Pg" and the DB_* variables of
+oar.conf are given through the environment (e.g. DB_HOSTNAME, DB_BASE_NAME, DB_BASE_LOGIN,
+DB_BASE_PASSWD).
+"""
+import logging
+import os
+import time
+from types import SimpleNamespace
+
+from procset import ProcSet
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker
+
+from oar.lib.globals import init_config, init_oar
+from oar.lib.job_handling import JobPseudo, gantt_flush_tables, save_assigns
+from oar.lib.models import (
+    DeferredReflectionModel,
+    GanttJobsPrediction,
+    GanttJobsResource,
+    Model,
+)
+
+NB_NODES = 1024
+NB_CORES = 32
+NB_FULL_MACHINE_JOBS = 10
+NB_SMALL_JOBS = 5000
+NB_SMALL_JOB_CORES = 64
+
+
+def init_session():
+    config = init_config()
+    if os.environ.get("DB_TYPE", "sqlite") == "Pg":
+        for key in ("DB_HOSTNAME", "DB_BASE_NAME", "DB_BASE_LOGIN", "DB_BASE_PASSWD"):
+            if key in os.environ:
+                config[key] = os.environ[key]
+        config["DB_TYPE"] = "Pg"
+    else:
+        config["DB_TYPE"] = "sqlite"
+        config["DB_BASE_FILE"] = ":memory:"
+
+    config, engine = init_oar(config=config, no_reflect=True)
+    Model.metadata.create_all(bind=engine)
+    DeferredReflectionModel.prepare(engine)
+    return config, sessionmaker(bind=engine)()
+
+
+def large_gantt():
+    nb_resources = NB_NODES * NB_CORES
+    jobs = []
+    start_time = 100000
+    for i in range(NB_FULL_MACHINE_JOBS):
+        jobs.append((start_time, ProcSet((0, nb_resources - 1))))
+        start_time += 3600
+    for i in range(NB_SMALL_JOBS):
+        first = (i * NB_SMALL_JOB_CORES) % nb_resources
+        jobs.append((start_time, ProcSet((first, first + NB_SMALL_JOB_CORES - 1))))
+        if first + NB_SMALL_JOB_CORES == nb_resources:
+            start_time += 600
+
+    return [
+        JobPseudo(
+            id=i,
+            moldable_id=i,
+            start_time=start_time,
+            walltime=600,
+            res_set=res_set,
+            type="PASSIVE",
+            queue_name="default",
+            name=None,
+        )
+        for i, (start_time, res_set) in enumerate(jobs, 1)
+    ]
+
+
+def bench(name, session, config, jobs, resource_set):
+    gantt_flush_tables(session, [])
+    start = time.time()
+    save_assigns(session, jobs, resource_set, config)
+    secs = time.time() - start
+    nb_rows = session.query(GanttJobsResource).count()
+    print(
+        "  %-11s %7d jobs %9d rows %10.3f s  (%.3f us/row)"
+        % (name, len(jobs), nb_rows, secs, secs * 1e6 / nb_rows)
+    )
+    return (
+        session.query(func.sum(GanttJobsPrediction.start_time)).scalar(),
+        session.query(
+            func.sum(GanttJobsResource.moldable_id * GanttJobsResource.resource_id)
+        ).scalar(),
+    )
+
+
+def main():
+    # save_assigns logs each job
+    logging.disable(logging.INFO)
+    config, session = init_session()
+    jobs = large_gantt()
+    # resource_id = roid + 1
+    resource_set = SimpleNamespace(rid_o2i=range(1, NB_NODES * NB_CORES + 1))
+
+    config["SCHEDULER_SAVE_ASSIGNS_BULK"] = "no"
+    sums_executemany = bench("executemany", session, config, jobs, resource_set)
+    config["SCHEDULER_SAVE_ASSIGNS_BULK"] = "yes"
+    sums_bulk = bench("bulk", session, config, jobs, resource_set)
+    assert sums_executemany == sums_bulk
+
+
+if __name__ == "__main__":
+    main()
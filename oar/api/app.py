@@ -8,7 +8,7 @@ from sqlalchemy.orm import scoped_session, sessionmaker
 from oar.lib.configuration import Configuration
 from oar.lib.globals import get_logger, init_config, init_oar
 
-from .routers import frontend, job, media, proxy, resource, stress_factor
+from .routers import frontend, job, media, proxy, resource, scheduler, stress_factor
 
 # from oar.api import API_VERSION
 logger = get_logger("rest_api")
@@ -83,6 +83,7 @@ def create_app(
     app.include_router(proxy.router)
     app.include_router(media.router)
     app.include_router(stress_factor.router)
+    app.include_router(scheduler.router)
 
     @app.middleware("http")
     async def tokens_revocations_data(request: Request, call_next):
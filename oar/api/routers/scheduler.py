@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+oar.api.routers.scheduler
+~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Define scheduler profiling retrieving api
+
+"""
+import os
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from oar.kao.round_profiler import read_round_profiles
+from oar.lib.configuration import Configuration
+
+from ..dependencies import get_config
+from . import TimestampRoute
+
+router = APIRouter(
+    route_class=TimestampRoute,
+    prefix="/scheduler",
+    tags=["scheduler"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+@router.get("/rounds")
+def rounds(limit: int = 10, config: Configuration = Depends(get_config)):
+    """Give the profiles of the last meta scheduling rounds (the most recent last).
+
+    Each item gives the duration, the number of SQL queries and of rows of the round
+    and of each of its phases (see SCHEDULER_ROUND_PROFILE_FILE in oar.conf).
+    """
+    profile_file = config.get("SCHEDULER_ROUND_PROFILE_FILE", "")
+    if not profile_file:
+        raise HTTPException(
+            status_code=404, detail="Scheduler round profiling is not enabled"
+        )
+
+    items = []
+    if os.path.exists(profile_file):
+        items = read_round_profiles(profile_file, limit if limit > 0 else None)
+
+    return {"total": len(items), "items": items}
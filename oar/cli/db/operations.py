@@ -34,6 +34,7 @@ def archive_db(ctx):
 
     ignored_tables = [
         "accounting",
+        "accounting_usage",
         "gantt_jobs_predictions",
         "gantt_jobs_predictions_log",
         "gantt_jobs_predictions_visu",
@@ -14,16 +14,27 @@
 # 4	This is the last partial execution, job failed
 # 5	Job was cancelled (either before starting or during run)
 
+import gzip
+import io
+import os
 import pickle
 import time
 import uuid
 from collections import OrderedDict
 
 import click
-from sqlalchemy.sql import distinct, func, or_
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.sql import case, distinct, func, or_
 
 from oar.lib.globals import init_oar
-from oar.lib.models import AssignedResource, Job, MoldableJobDescription, Resource
+from oar.lib.models import (
+    AssignedResource,
+    DeferredReflectionModel,
+    Job,
+    MoldableJobDescription,
+    Resource,
+)
 
 click.disable_unicode_literals_warning = True
 
@@ -77,6 +88,7 @@ class JobMetrics:
 class WorkloadMetadata:
     def __init__(
         self,
+        session,
         db_server,
         db_name,
         first_jobid=None,
@@ -85,7 +97,8 @@ class WorkloadMetadata:
         uuid=None,
     ):
         if filename:
-            return pickle.load(open(filename, "rb"))
+            self.__dict__.update(pickle.load(open(filename, "rb")).__dict__)
+            return
 
         self.db_name = db_name
         self.db_server = db_server
@@ -94,7 +107,7 @@ class WorkloadMetadata:
         self.project = {}
         self.command = {}
         self.queue = {}
-        self.resources = db.query(Resource).order_by(Resource.id.asc()).all()
+        self.resources = session.query(Resource).order_by(Resource.id.asc()).all()
         self.rid2resource = {r.id: r for r in self.resources}
         self.first_jobid = first_jobid
         self.last_jobid = last_jobid
@@ -143,10 +156,37 @@ class WorkloadMetadata:
         return self.dict2int("queue", queue)
 
 
-def get_jobs(first_jobid, last_jobid, wkld_metadata):
+def new_job_metrics(
+    job, wkld_metadata, walltime=0, nb_default_ressources=0, nb_extra_ressources=0
+):
+    return JobMetrics(
+        job_id=job.id,
+        submission_time=job.submission_time,
+        start_time=job.start_time,
+        stop_time=job.stop_time,
+        walltime=walltime,
+        nb_default_ressources=nb_default_ressources,
+        nb_extra_ressources=nb_extra_ressources,
+        status=1 if job.state == "Terminated" else 0,
+        user=wkld_metadata.user2int(job.user),
+        command=wkld_metadata.command2int(job.command),
+        queue=wkld_metadata.queue2int(job.queue_name),
+        name=wkld_metadata.name2int(job.name),
+        array=job.array_id,
+        type=0 if job.type == "PASSIVE" else 1,
+        reservation=1 if (job.reservation != "None") else 0,
+        cigri=(
+            job.name.split(".")[1]
+            if (job.name and job.name.split(".")[0] == "cigri")
+            else "0"
+        ),
+    )
+
+
+def get_jobs(session, first_jobid, last_jobid, wkld_metadata):
     jobs_metrics = OrderedDict()
     jobs = (
-        db.query(Job)
+        session.query(Job)
         .filter(Job.id >= first_jobid)
         .filter(Job.id <= last_jobid)
         .order_by(Job.id)
@@ -159,34 +199,14 @@ def get_jobs(first_jobid, last_jobid, wkld_metadata):
     assigned_moldable_ids = []
     for job in jobs:
         if job.state == "Terminated" or job.state == "Error":
-            status = 1 if job.state == "Terminated" else 0
             assigned_moldable_ids.append(job.assigned_moldable_job)
             job_id2job[job.id] = job
             # job_id2moldable_id[job.id] = job.assigned_moldable_job
             moldable_id2job[job.assigned_moldable_job] = job
-            job_metrics = JobMetrics(
-                job_id=job.id,
-                submission_time=job.submission_time,
-                start_time=job.start_time,
-                stop_time=job.stop_time,
-                walltime=0,
-                nb_default_ressources=0,
-                nb_extra_ressources=0,
-                status=status,
-                user=wkld_metadata.user2int(job.user),
-                command=wkld_metadata.command2int(job.command),
-                queue=wkld_metadata.queue2int(job.queue_name),
-                name=wkld_metadata.name2int(job.name),
-                array=job.array_id,
-                type=0 if job.type == "PASSIVE" else 1,
-                reservation=1 if (job.reservation != "None") else 0,
-                cigri=(
-                    job.name.split(".")[1]
-                    if (job.name and job.name.split(".")[0] == "cigri")
-                    else "0"
-                ),
-            )
-            jobs_metrics[job.id] = job_metrics
+            jobs_metrics[job.id] = new_job_metrics(job, wkld_metadata)
+
+    if not assigned_moldable_ids:
+        return jobs_metrics
 
     # Determine walltime thanks to assigned moldable id
     assigned_moldable_ids.sort()
@@ -194,7 +214,7 @@ def get_jobs(first_jobid, last_jobid, wkld_metadata):
     max_mld_id = assigned_moldable_ids[-1]
 
     result = (
-        db.query(MoldableJobDescription)
+        session.query(MoldableJobDescription)
         .filter(MoldableJobDescription.id >= min_mld_id)
         .filter(MoldableJobDescription.id <= max_mld_id)
         .all()
@@ -208,7 +228,7 @@ def get_jobs(first_jobid, last_jobid, wkld_metadata):
 
     # Determine nb_default_ressources and nb_extra_ressources for jobs in Terminated or Error state
     result = (
-        db.query(AssignedResource)
+        session.query(AssignedResource)
         .filter(AssignedResource.moldable_id >= min_mld_id)
         .filter(AssignedResource.moldable_id <= max_mld_id)
         .order_by(AssignedResource.moldable_id, AssignedResource.resource_id)
@@ -248,6 +268,233 @@ def get_jobs(first_jobid, last_jobid, wkld_metadata):
     return jobs_metrics
 
 
+# Job attributes used by new_job_metrics
+TRACED_JOB_ATTRIBUTES = [
+    "id",
+    "submission_time",
+    "start_time",
+    "stop_time",
+    "state",
+    "user",
+    "command",
+    "queue_name",
+    "name",
+    "array_id",
+    "type",
+    "reservation",
+]
+
+
+def get_jobs_chunks(session, first_jobid, last_jobid, wkld_metadata, chunk_size):
+    """
+    Same metrics as get_jobs, but yielded chunk by chunk of at most chunk_size traced
+    (Terminated or Error) jobs in job id order, as (last job id of the chunk, metrics).
+
+    Walltimes and numbers of resources are joined by the database and the rows of a
+    chunk are read with a server-side cursor (yield_per), so only one chunk is in memory.
+    """
+    traced_states = ("Terminated", "Error")
+    begin_jobid = first_jobid
+    while begin_jobid <= last_jobid:
+        end_jobid = (
+            session.query(Job.id)
+            .filter(Job.id >= begin_jobid)
+            .filter(Job.id <= last_jobid)
+            .filter(Job.state.in_(traced_states))
+            .order_by(Job.id)
+            .offset(chunk_size - 1)
+            .limit(1)
+            .scalar()
+        )
+        if end_jobid is None:
+            end_jobid = last_jobid
+
+        nb_resources = (
+            session.query(
+                AssignedResource.moldable_id.label("moldable_id"),
+                func.sum(case((Resource.type == "default", 1), else_=0)).label(
+                    "nb_default"
+                ),
+                func.sum(case((Resource.type == "default", 0), else_=1)).label(
+                    "nb_extra"
+                ),
+            )
+            .join(Resource, Resource.id == AssignedResource.resource_id)
+            .join(Job, Job.assigned_moldable_job == AssignedResource.moldable_id)
+            .filter(Job.id >= begin_jobid)
+            .filter(Job.id <= end_jobid)
+            .group_by(AssignedResource.moldable_id)
+            .subquery()
+        )
+
+        rows = (
+            session.query(
+                *[getattr(Job, attr).label(attr) for attr in TRACED_JOB_ATTRIBUTES],
+                MoldableJobDescription.walltime,
+                nb_resources.c.nb_default,
+                nb_resources.c.nb_extra,
+            )
+            .outerjoin(
+                MoldableJobDescription,
+                MoldableJobDescription.id == Job.assigned_moldable_job,
+            )
+            .outerjoin(
+                nb_resources, nb_resources.c.moldable_id == Job.assigned_moldable_job
+            )
+            .filter(Job.id >= begin_jobid)
+            .filter(Job.id <= end_jobid)
+            .filter(Job.state.in_(traced_states))
+            .order_by(Job.id)
+            .yield_per(min(chunk_size, 1000))
+        )
+
+        jobs_metrics = OrderedDict()
+        for row in rows:
+            jobs_metrics[row.id] = new_job_metrics(
+                row,
+                wkld_metadata,
+                walltime=row.walltime or 0,
+                nb_default_ressources=row.nb_default or 0,
+                nb_extra_ressources=row.nb_extra or 0,
+            )
+
+        yield (end_jobid, jobs_metrics)
+        begin_jobid = end_jobid + 1
+
+
+class TraceWriter(object):
+    """
+    Write a trace file by blocks of lines. With gzip or zstd compression, each block is
+    a complete gzip member or zstd frame (their concatenation is a valid compressed file),
+    so the file can be truncated after any block to resume an export.
+
+    :param offset: position, in bytes, to truncate the existing file at and write from
+    """
+
+    def __init__(self, filename, compression=None, offset=None):
+        if compression == "zstd":
+            # Optional dependency
+            import zstandard
+
+            self.compress = zstandard.ZstdCompressor().compress
+        elif compression == "gzip":
+            self.compress = gzip.compress
+        else:
+            self.compress = None
+
+        if offset is None:
+            self.file = open(filename, "wb")
+        else:
+            self.file = open(filename, "r+b")
+            self.file.truncate(offset)
+            self.file.seek(offset)
+
+    def write(self, text):
+        """Write the block of lines and return the position after it."""
+        data = text.encode("utf-8")
+        if self.compress:
+            data = self.compress(data)
+        self.file.write(data)
+        self.file.flush()
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def save_checkpoint(filename, checkpoint):
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, "wb") as checkpoint_file:
+        pickle.dump(checkpoint, checkpoint_file)
+    os.replace(tmp_filename, filename)
+
+
+def stream_trace(
+    session,
+    trace_file,
+    wkld_metadata,
+    mode,
+    first_jobid,
+    last_jobid,
+    chunk_size,
+    compression=None,
+    checkpoint_file=None,
+    resume=False,
+    display=False,
+):
+    """
+    Write the trace of the jobs chunk by chunk (see get_jobs_chunks). After each chunk,
+    the position in the trace file and the workload metadata are saved in checkpoint_file,
+    if resume is set the export continues from it. Return the number of traced jobs.
+    """
+    trace_params = (trace_file, mode, compression, first_jobid, last_jobid)
+    checkpoint = None
+    if resume and checkpoint_file and os.path.isfile(checkpoint_file):
+        with open(checkpoint_file, "rb") as f:
+            checkpoint = pickle.load(f)
+        if checkpoint["trace_params"] != trace_params:
+            raise ValueError(
+                "Checkpoint {} was saved for another export: {}".format(
+                    checkpoint_file, checkpoint["trace_params"]
+                )
+            )
+
+    if checkpoint:
+        for dictname in ("user", "name", "project", "command", "queue"):
+            setattr(wkld_metadata, dictname, checkpoint["metadata"][dictname])
+        wkld_metadata.uuid = checkpoint["uuid"]
+        writer = TraceWriter(trace_file, compression, checkpoint["offset"])
+        unix_start_time = checkpoint["unix_start_time"]
+        begin_jobid = checkpoint["next_jobid"]
+        nb_jobs = checkpoint["nb_jobs"]
+        print("# Resume from job id {}".format(begin_jobid))
+    else:
+        writer = TraceWriter(trace_file, compression)
+        header = io.StringIO()
+        unix_start_time = write_header(
+            session, header, wkld_metadata, mode, first_jobid, last_jobid
+        )
+        writer.write(header.getvalue())
+        begin_jobid = first_jobid
+        nb_jobs = 0
+
+    for chunk, (end_jobid, jobs_metrics) in enumerate(
+        get_jobs_chunks(session, begin_jobid, last_jobid, wkld_metadata, chunk_size)
+    ):
+        print(
+            "# Jobids Range: [{}-{}], Chunck: {}".format(
+                begin_jobid, end_jobid, (chunk + 1)
+            )
+        )
+        lines = io.StringIO()
+        jobs2trace(jobs_metrics, lines, unix_start_time, mode, display)
+        offset = writer.write(lines.getvalue())
+        nb_jobs += len(jobs_metrics)
+        begin_jobid = end_jobid + 1
+
+        if checkpoint_file:
+            save_checkpoint(
+                checkpoint_file,
+                {
+                    "trace_params": trace_params,
+                    "uuid": wkld_metadata.uuid,
+                    "unix_start_time": unix_start_time,
+                    "next_jobid": begin_jobid,
+                    "nb_jobs": nb_jobs,
+                    "offset": offset,
+                    "metadata": {
+                        dictname: getattr(wkld_metadata, dictname)
+                        for dictname in ("user", "name", "project", "command", "queue")
+                    },
+                },
+            )
+
+    writer.close()
+    if checkpoint_file and os.path.isfile(checkpoint_file):
+        os.remove(checkpoint_file)
+    return nb_jobs
+
+
 def jobs2trace(jobs_metrics, filehandle, unix_start_time, mode, display):
     for _, job_metrics in jobs_metrics.items():
         if display:
@@ -376,9 +623,9 @@ def jobs2trace(jobs_metrics, filehandle, unix_start_time, mode, display):
                 )
 
 
-def header_values(first_jobid, last_jobid):
+def header_values(session, first_jobid, last_jobid):
     nb_traced_jobs = (
-        db.query(Job)
+        session.query(Job)
         .filter(Job.id >= first_jobid)
         .filter(Job.id <= last_jobid)
         .filter(or_(Job.state == "Terminated", Job.state == "Error"))
@@ -386,19 +633,21 @@ def header_values(first_jobid, last_jobid):
     )
 
     # Resources
-    nb_nodes = db.query(func.count(distinct(Resource.network_address))).scalar()
+    nb_nodes = session.query(func.count(distinct(Resource.network_address))).scalar()
 
-    nb_resources = db.query(Resource).count()
-    nb_default_resources = db.query(Resource).filter(Resource.type == "default").count()
+    nb_resources = session.query(Resource).count()
+    nb_default_resources = (
+        session.query(Resource).filter(Resource.type == "default").count()
+    )
 
     # Time
     unix_start_time = (
-        db.query(Job.submission_time).filter(Job.id == first_jobid).one()[0]
+        session.query(Job.submission_time).filter(Job.id == first_jobid).one()[0]
     )
 
     # Max stop time
     max_stop_time = (
-        db.query(func.max(Job.stop_time))
+        session.query(func.max(Job.stop_time))
         .filter(Job.id >= first_jobid)
         .filter(Job.id <= last_jobid)
         .filter(or_(Job.state == "Terminated", Job.state == "Error"))
@@ -424,9 +673,15 @@ def header_values(first_jobid, last_jobid):
     )
 
 
-def file_header(trace_file, wkld_metadata, mode, first_jobid, last_jobid):
+def file_header(session, trace_file, wkld_metadata, mode, first_jobid, last_jobid):
     filehandle = open(trace_file, "w")
+    unix_start_time = write_header(
+        session, filehandle, wkld_metadata, mode, first_jobid, last_jobid
+    )
+    return (filehandle, unix_start_time)
 
+
+def write_header(session, filehandle, wkld_metadata, mode, first_jobid, last_jobid):
     if mode == "swf":
         filehandle.write("; WARNING HEADER MISSIING TO BE COMPLETE see : \n;\n")
         filehandle.write(
@@ -453,7 +708,7 @@ def file_header(trace_file, wkld_metadata, mode, first_jobid, last_jobid):
         tz_string,
         start_time,
         end_time,
-    ) = header_values(first_jobid, last_jobid)
+    ) = header_values(session, first_jobid, last_jobid)
 
     filehandle.write("; {:>22}: {}\n".format("MaxJobs", nb_traced_jobs))
     filehandle.write("; {:>22}: {}\n".format("MaxRecords", nb_traced_jobs))
@@ -484,7 +739,7 @@ def file_header(trace_file, wkld_metadata, mode, first_jobid, last_jobid):
 
     filehandle.write(";\n")
 
-    return (filehandle, unix_start_time)
+    return unix_start_time
 
 
 @click.command()
@@ -520,8 +775,37 @@ def file_header(trace_file, wkld_metadata, mode, first_jobid, last_jobid):
     type=click.STRING,
     help="Metadata file stores various non-anonymized jobs' information (user, job name, project, command).",
 )
+@click.option(
+    "--stream",
+    is_flag=True,
+    help="Stream the jobs chunk by chunk with a server-side cursor, resource counts and walltimes being computed by the database.",
+)
+@click.option(
+    "-z",
+    "--compression",
+    type=click.Choice(["none", "gzip", "zstd"]),
+    default="none",
+    help="Compression of the trace file in stream mode (zstd requires the zstandard package).",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="Resume an interrupted stream export from its checkpoint file (<trace file>.checkpoint).",
+)
+@click.pass_context
 def cli(
-    db_url, trace_file, first_jobid, last_jobid, chunk_size, metadata_file, p, mode
+    ctx,
+    db_url,
+    trace_file,
+    first_jobid,
+    last_jobid,
+    chunk_size,
+    metadata_file,
+    p,
+    mode,
+    stream,
+    compression,
+    resume,
 ):
     """This program allows to extract workload traces from OAR RJMS.
 
@@ -535,17 +819,25 @@ def cli(
         print("Mode must set to swf or owf")
         exit(1)
 
-    if db_url:
-        db._cache["uri"] = db_url
+    if ctx.obj:
+        (session, config) = ctx.obj
+        db_name = config.get("DB_BASE_NAME", "oar")
+        db_server = config.get("DB_HOSTNAME", "localhost")
+    elif db_url:
+        engine = create_engine(db_url)
+        DeferredReflectionModel.prepare(engine)
+        session = scoped_session(sessionmaker(bind=engine))()
         db_name = db_url.split("/")[-1]
         db_server = (db_url.split("/")[-2]).split("@")[-1]
     else:
-        _, engine = init_oar()
+        config, engine = init_oar()
         session_factory = sessionmaker(bind=engine)
         scoped = scoped_session(session_factory)
         session = scoped()
+        db_name = config.get("DB_BASE_NAME", "oar")
+        db_server = config.get("DB_HOSTNAME", "localhost")
     try:
-        jobids_range = db.query(
+        jobids_range = session.query(
             func.max(Job.id).label("max"), func.min(Job.id).label("min")
         ).one()
     except Exception as e:
@@ -566,8 +858,18 @@ def cli(
         print("First job id must be lower then last one.")
         exit(1)
 
+    if compression == "none":
+        compression = None
+    elif not stream:
+        print("Compression is only available in stream mode")
+        exit(1)
+
     if not trace_file:
         suffix = "swf" if mode == "swf" else "owf"
+        if compression == "gzip":
+            suffix += ".gz"
+        elif compression == "zstd":
+            suffix += ".zst"
         trace_file = "oar_trace_{}_{}_{}_{}.{}".format(
             db_server, db_name, first_jobid, last_jobid, suffix
         )
@@ -577,15 +879,36 @@ def cli(
     uuid_str = str(uuid.uuid4())
 
     wkld_metadata = WorkloadMetadata(
-        db_server, db_name, first_jobid, last_jobid, metadata_file, uuid_str
+        session, db_server, db_name, first_jobid, last_jobid, metadata_file, uuid_str
     )
 
+    if stream:
+        try:
+            stream_trace(
+                session,
+                trace_file,
+                wkld_metadata,
+                mode,
+                first_jobid,
+                last_jobid,
+                chunk_size,
+                compression=compression,
+                checkpoint_file=trace_file + ".checkpoint",
+                resume=resume,
+                display=display,
+            )
+        except (ImportError, ValueError) as e:
+            print(e)
+            exit(1)
+        wkld_metadata.dump()
+        return
+
     nb_chunck = int((last_jobid - first_jobid) / chunk_size) + 1
 
     begin_jobid = first_jobid
     end_jobid = 0
     fh, unix_start_time = file_header(
-        trace_file, wkld_metadata, mode, first_jobid, last_jobid
+        session, trace_file, wkld_metadata, mode, first_jobid, last_jobid
     )
     for chunk in range(nb_chunck):
         if (begin_jobid + chunk_size - 1) > last_jobid:
@@ -598,7 +921,7 @@ def cli(
             )
         )
 
-        jobs_metrics = get_jobs(begin_jobid, end_jobid, wkld_metadata)
+        jobs_metrics = get_jobs(session, begin_jobid, end_jobid, wkld_metadata)
         jobs2trace(jobs_metrics, fh, unix_start_time, mode, display)
 
         begin_jobid = end_jobid + 1
@@ -8,6 +8,7 @@ from oar.lib.accounting import (
     check_accounting_update,
     delete_accounting_windows_before,
     delete_all_from_accounting,
+    update_accounting_usage,
 )
 from oar.lib.globals import init_oar
 
@@ -65,3 +66,11 @@ def cli(ctx, reinitialize, delete_before, version):
         delete_accounting_windows_before(session, delete_windows_before)
     else:
         check_accounting_update(session, window_size)
+
+    if config["SCHEDULER_FAIRSHARING_USAGE_SUMMARY"] == "yes":
+        update_accounting_usage(
+            session,
+            tools.get_date(session),
+            int(config["SCHEDULER_FAIRSHARING_WINDOW_SIZE"]),
+            int(window_size),
+        )
@@ -0,0 +1,308 @@
+# coding: utf-8
+"""
+Incremental maintenance of the gantt between two meta-scheduler rounds.
+
+At each round, :func:`oar.kao.meta_sched.gantt_init_with_running_jobs` flushes the gantt
+tables, saves again the assignments of all current jobs and rebuilds the slot sets from
+scratch. When the meta-scheduler is long-lived, :class:`IncrementalGantt` keeps the slot sets
+of the previous round (with only the already fixed jobs, i.e. current jobs and scheduled
+advance reservations) and only applies the difference: finished or modified jobs are released,
+new ones are inserted, and the slots before now are dropped.
+
+Whenever the difference cannot be safely applied (resources changes, containers, temporal
+quotas, ...), the gantt is fully rebuilt.
+"""
+from oar.kao.meta_sched import (
+    CURRENT_JOB_STATES,
+    availability_pseudo_jobs,
+    gantt_init_with_running_jobs,
+)
+from oar.kao.quotas import Quotas
+from oar.kao.scheduling import set_slots_with_prev_scheduled_jobs
+from oar.lib.globals import get_logger
+from oar.lib.job_handling import (
+    NO_PLACEHOLDER,
+    JobPseudo,
+    gantt_flush_tables,
+    get_jobs_in_multiple_states,
+    get_waiting_moldable_of_reservations_already_scheduled,
+)
+
+logger = get_logger("oar.kao.incremental_gantt")
+
+
+class GanttInconsistency(Exception):
+    """Raised when the previous gantt cannot be incrementally updated."""
+
+
+def resources_signature(resource_set):
+    """
+    Return what the initial slot set depends on in `resource_set`: the resources in the
+    gantt (with their order), their availability and the suspendable ones.
+    """
+    return (
+        tuple(resource_set.rid_o2i[roid] for roid in resource_set.roid_itvs),
+        tuple(sorted(resource_set.available_upto.items())),
+        resource_set.suspendable_roid_itvs,
+    )
+
+
+def fixed_job(job):
+    """
+    Return a :class:`JobPseudo` holding what is inserted in slots for an already scheduled `job`.
+    """
+    return JobPseudo(
+        id=job.id,
+        moldable_id=job.moldable_id,
+        start_time=job.start_time,
+        walltime=job.walltime,
+        res_set=job.res_set,
+        types=dict(job.types),
+        ts=job.ts,
+        ts_user=getattr(job, "ts_user", None),
+        ts_name=getattr(job, "ts_name", None),
+        ph=job.ph,
+        ph_name=getattr(job, "ph_name", None),
+        user=job.user,
+        project=job.project,
+        queue_name=job.queue_name,
+    )
+
+
+def fixed_job_signature(job):
+    return (
+        job.start_time,
+        job.walltime,
+        job.res_set,
+        tuple(sorted(job.types.items())),
+        job.ts,
+        job.ts_user,
+        job.ts_name,
+        job.ph,
+        job.ph_name,
+        job.user,
+        job.project,
+        job.queue_name,
+    )
+
+
+class IncrementalGantt(object):
+    """
+    Gantt kept between meta-scheduler rounds, see :func:`oar.kao.meta_sched.meta_schedule`.
+
+    The gantt is fully rebuilt at the first round, when it cannot be incrementally updated, and
+    at least every ``SCHEDULER_GANTT_FULL_REBUILD_ROUNDS`` rounds.
+    """
+
+    def __init__(self, config):
+        self.full_rebuild_rounds = int(
+            config.get("SCHEDULER_GANTT_FULL_REBUILD_ROUNDS", 100)
+        )
+        self.base_slot_sets = None
+        self.resources_signature = None
+        # moldable_id -> fixed JobPseudo (current jobs and already scheduled reservations)
+        self.fixed_jobs = {}
+        # moldable_id -> (start_time, res_set) of the current jobs whose assignments
+        # are in gantt tables
+        self.saved_current_jobs = {}
+        # Counter keys registry the quotas counters of the gantt are indexed with
+        self.quotas_counter_indices = None
+        self.nb_incremental_rounds = 0
+        self.nb_full_rebuilds = 0
+
+    def reset(self):
+        """Forget the previous gantt, the next round will fully rebuild it."""
+        self.base_slot_sets = None
+
+    def init_with_running_jobs(
+        self, session, config, plt, initial_time_sec, job_security_time
+    ):
+        """
+        Same as :func:`oar.kao.meta_sched.gantt_init_with_running_jobs` but starting from the
+        gantt of the previous round when possible.
+        """
+        if (self.base_slot_sets is not None) and (
+            self.nb_incremental_rounds < self.full_rebuild_rounds
+        ):
+            try:
+                results = self.update(
+                    session, config, plt, initial_time_sec, job_security_time
+                )
+                self.nb_incremental_rounds += 1
+                return results
+            except GanttInconsistency as e:
+                logger.debug("Gantt fully rebuilt: {}".format(e))
+
+        return self.rebuild(session, config, plt, initial_time_sec, job_security_time)
+
+    def rebuild(self, session, config, plt, initial_time_sec, job_security_time):
+        """Fully rebuild the gantt and keep it for the next rounds."""
+        # The counter keys of the jobs no longer in the gantt are dropped
+        Quotas.reset_registries()
+        (
+            all_slot_sets,
+            scheduled_jobs,
+            besteffort_rid2job,
+        ) = gantt_init_with_running_jobs(
+            session, config, plt, initial_time_sec, job_security_time
+        )
+        self.nb_full_rebuilds += 1
+        self.nb_incremental_rounds = 0
+
+        if Quotas.calendar or (len(all_slot_sets) != 1):
+            # Temporal quotas and containers are not incrementally maintained
+            self.reset()
+            return (all_slot_sets, scheduled_jobs, besteffort_rid2job)
+
+        resource_set = plt.resource_set(session, config)
+        self.resources_signature = resources_signature(resource_set)
+        self.fixed_jobs = {job.moldable_id: fixed_job(job) for job in scheduled_jobs}
+        self.saved_current_jobs = {
+            job.moldable_id: (job.start_time, job.res_set)
+            for job in scheduled_jobs
+            if job.state in CURRENT_JOB_STATES
+        }
+        self.base_slot_sets = {
+            name: slot_set.copy() for name, slot_set in all_slot_sets.items()
+        }
+        self.quotas_counter_indices = Quotas.counter_indices
+
+        return (all_slot_sets, scheduled_jobs, besteffort_rid2job)
+
+    def update(self, session, config, plt, initial_time_sec, job_security_time):
+        """
+        Update the gantt of the previous round. Raise :class:`GanttInconsistency` if it is not possible.
+        """
+        if Quotas.calendar:
+            raise GanttInconsistency("temporal quotas are enabled")
+
+        if Quotas.counter_indices is not self.quotas_counter_indices:
+            raise GanttInconsistency("quotas rules have been reloaded")
+
+        if initial_time_sec < self.base_slot_sets["default"].begin:
+            raise GanttInconsistency("time goes backward")
+
+        resource_set = plt.resource_set(session, config)
+        if resources_signature(resource_set) != self.resources_signature:
+            raise GanttInconsistency("resources have changed")
+
+        #
+        # Gantt tables: only assignments of new (or restarted) current jobs are saved
+        #
+        moldable_ids = get_waiting_moldable_of_reservations_already_scheduled(session)
+        current_jobs = get_jobs_in_multiple_states(
+            session, CURRENT_JOB_STATES, resource_set
+        )
+        current_assigns = {
+            job.moldable_id: (job.start_time, job.res_set)
+            for job in current_jobs.values()
+        }
+        saved_moldable_ids = [
+            moldable_id
+            for moldable_id, assign in current_assigns.items()
+            if self.saved_current_jobs.get(moldable_id) == assign
+        ]
+        gantt_flush_tables(session, moldable_ids + saved_moldable_ids, config)
+        plt.save_assigns(
+            session,
+            [
+                job
+                for job in current_jobs.values()
+                if job.moldable_id not in saved_moldable_ids
+            ],
+            resource_set,
+            config,
+        )
+        self.saved_current_jobs = current_assigns
+
+        scheduled_jobs = plt.get_scheduled_jobs(
+            session, resource_set, job_security_time, initial_time_sec
+        )
+
+        fixed_jobs = {}
+        for job in scheduled_jobs:
+            if ("container" in job.types) or ("inner" in job.types):
+                raise GanttInconsistency("container jobs are scheduled")
+            fixed_jobs[job.moldable_id] = fixed_job(job)
+
+        if set(fixed_jobs) != set(moldable_ids) | set(current_assigns):
+            raise GanttInconsistency("gantt tables do not match the jobs")
+
+        #
+        # Difference with previous round
+        #
+        released_jobs = []
+        for moldable_id, job in self.fixed_jobs.items():
+            if (moldable_id not in fixed_jobs) or (
+                fixed_job_signature(fixed_jobs[moldable_id]) != fixed_job_signature(job)
+            ):
+                if "besteffort" in job.types:
+                    continue
+                if job.ts or (job.ph != NO_PLACEHOLDER):
+                    raise GanttInconsistency("a shared job has to be released")
+                if Quotas.enabled:
+                    raise GanttInconsistency("quotas have to be released")
+                released_jobs.append(job)
+
+        inserted_jobs = []
+        unchanged_jobs = []
+        for job in scheduled_jobs:
+            if (job.moldable_id in self.fixed_jobs) and (
+                fixed_job_signature(fixed_jobs[job.moldable_id])
+                == fixed_job_signature(self.fixed_jobs[job.moldable_id])
+            ):
+                if "besteffort" not in job.types:
+                    unchanged_jobs.append(fixed_jobs[job.moldable_id])
+            else:
+                inserted_jobs.append(job)
+
+        slot_set = self.base_slot_sets["default"]
+        slot_set.trim_before(initial_time_sec)
+
+        if released_jobs:
+            released_jobs.sort(key=lambda j: j.start_time)
+            slot_set.split_slots_jobs(released_jobs, False)
+
+            # Resources of released jobs may be also used by unchanged fixed jobs
+            # or be unavailable
+            overlapping_jobs = [
+                job
+                for job in unchanged_jobs
+                if any(
+                    (job.res_set & r_job.res_set)
+                    and (job.start_time < r_job.start_time + r_job.walltime)
+                    and (r_job.start_time < job.start_time + job.walltime)
+                    for r_job in released_jobs
+                )
+            ]
+            overlapping_jobs.sort(key=lambda j: j.start_time)
+            slot_set.split_slots_jobs(overlapping_jobs)
+            slot_set.split_slots_jobs(availability_pseudo_jobs(resource_set))
+
+        if inserted_jobs:
+            set_slots_with_prev_scheduled_jobs(
+                self.base_slot_sets,
+                inserted_jobs,
+                job_security_time,
+                initial_time_sec,
+                True,
+            )
+
+        logger.debug(
+            "Gantt incrementally updated: {} released jobs, {} inserted jobs".format(
+                len(released_jobs), len(inserted_jobs)
+            )
+        )
+        self.fixed_jobs = fixed_jobs
+
+        # retrieve resources used by besteffort jobs
+        besteffort_rid2job = {}
+        for job in scheduled_jobs:
+            if "besteffort" in job.types:
+                for r_id in list(job.res_set):
+                    besteffort_rid2job[r_id] = job
+
+        all_slot_sets = {
+            name: slot_set.copy() for name, slot_set in self.base_slot_sets.items()
+        }
+        return (all_slot_sets, scheduled_jobs, besteffort_rid2job)
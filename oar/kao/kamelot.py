@@ -1,5 +1,5 @@
 import sys
-from typing import List
+from typing import List, Optional
 
 from sqlalchemy.orm import Session, scoped_session, sessionmaker
 
@@ -7,8 +7,9 @@ from oar.kao.karma import karma_jobs_sorting
 from oar.kao.multifactor_priority import multifactor_jobs_sorting
 from oar.kao.platform import Platform
 from oar.kao.quotas import Quotas
+from oar.kao.round_profiler import RoundProfiler
 from oar.kao.scheduling import schedule_id_jobs_ct, set_slots_with_prev_scheduled_jobs
-from oar.kao.slot import MAX_TIME, SlotSet
+from oar.kao.slot import MAX_TIME, get_slot_set_class
 from oar.lib.configuration import Configuration
 from oar.lib.globals import get_logger, init_oar
 from oar.lib.job_handling import NO_PLACEHOLDER, JobPseudo
@@ -51,8 +52,16 @@ def jobs_sorting(session, config, queues, now, waiting_jids, waiting_jobs, plt):
                 session, config, queues, now, waiting_jids, waiting_jobs, plt
             )
         elif config["JOB_PRIORITY"] == "MULTIFACTOR":
+            # Only the jobs which will be scheduled are needed
             waiting_ordered_jids = multifactor_jobs_sorting(
-                session, config, queues, now, waiting_jids, waiting_jobs, plt
+                session,
+                config,
+                queues,
+                now,
+                waiting_jids,
+                waiting_jobs,
+                plt,
+                max_jobs=get_max_job_per_queues_group(config),
             )
 
         elif config["JOB_PRIORITY"] == "CUSTOM":
@@ -83,15 +92,20 @@ def internal_schedule_cycle(
     all_slot_sets,
     job_security_time: int,
     queues,
+    profiler: Optional[RoundProfiler] = None,
 ):
+    if profiler is None:
+        profiler = RoundProfiler(enabled=False)
+
     resource_set = plt.resource_set(session, config)
 
     #
     # Retrieve waiting jobs
     #
-    waiting_jobs, waiting_jids, nb_waiting_jobs = plt.get_waiting_jobs(
-        queues, session=session
-    )
+    with profiler.phase("get_waiting_jobs"):
+        waiting_jobs, waiting_jids, nb_waiting_jobs = plt.get_waiting_jobs(
+            queues, session=session
+        )
 
     if nb_waiting_jobs > 0:
         logger.info("nb_waiting_jobs:" + str(nb_waiting_jobs))
@@ -101,44 +115,50 @@ def internal_schedule_cycle(
         #
         # Get  additional waiting jobs' data
         #
-        plt.get_data_jobs(
-            session, waiting_jobs, waiting_jids, resource_set, job_security_time
-        )
+        with profiler.phase("get_data_jobs"):
+            plt.get_data_jobs(
+                session, waiting_jobs, waiting_jids, resource_set, job_security_time
+            )
 
-        waiting_ordered_jids = jobs_sorting(
-            session, config, queues, now, waiting_jids, waiting_jobs, plt
-        )
+        with profiler.phase("sorting"):
+            waiting_ordered_jids = jobs_sorting(
+                session, config, queues, now, waiting_jids, waiting_jobs, plt
+            )
 
-        # Limit the number of jobs scheduled per round for this group of queues.
+        # Limit the number of jobs scheduled per round for this group of queues
+        # (the multifactor sorting already returns only the first max_job jobs).
         max_job = get_max_job_per_queues_group(config)
-        if max_job is not None and len(waiting_ordered_jids) > max_job:
+        if max_job is not None and len(waiting_jids) > max_job:
             logger.info(
                 "MAX_JOB_PER_QUEUES_GROUP_SCHEDULING_ROUND=%d reached for queues %s: scheduling %d of %d waiting jobs",
                 max_job,
                 queues,
                 max_job,
-                len(waiting_ordered_jids),
+                len(waiting_jids),
             )
             waiting_ordered_jids = waiting_ordered_jids[:max_job]
-            waiting_jobs = {jid: waiting_jobs[jid] for jid in waiting_ordered_jids}
+        # Only the sorted jobs are scheduled and saved
+        waiting_jobs = {jid: waiting_jobs[jid] for jid in waiting_ordered_jids}
 
         #
         # Scheduled
         #
-        schedule_id_jobs_ct(
-            all_slot_sets,
-            waiting_jobs,
-            resource_set.hierarchy,
-            waiting_ordered_jids,
-            job_security_time,
-        )
+        with profiler.phase("scheduling"):
+            schedule_id_jobs_ct(
+                all_slot_sets,
+                waiting_jobs,
+                resource_set.hierarchy,
+                waiting_ordered_jids,
+                job_security_time,
+            )
 
         #
         # Save assignement
         #
         logger.info("save assignement")
 
-        plt.save_assigns(session, waiting_jobs, resource_set)
+        with profiler.phase("save_assigns"):
+            plt.save_assigns(session, waiting_jobs, resource_set, config)
     else:
         logger.info("no waiting jobs")
 
@@ -173,7 +193,7 @@ def schedule_cycle(
         # Determine Global Resource Intervals and Initial Slot
         #
         resource_set = plt.resource_set(session, config)
-        initial_slot_set = SlotSet((resource_set.roid_itvs, now))
+        initial_slot_set = get_slot_set_class(config)((resource_set.roid_itvs, now))
 
         #
         #  Resource availabilty (Available_upto field) is integrated through pseudo job
@@ -206,18 +226,20 @@ def schedule_cycle(
             session, config, queues, now, waiting_jids, waiting_jobs, plt
         )
 
-        # Limit the number of jobs scheduled per round for this group of queues.
+        # Limit the number of jobs scheduled per round for this group of queues
+        # (the multifactor sorting already returns only the first max_job jobs).
         max_job = get_max_job_per_queues_group(config)
-        if max_job is not None and len(waiting_ordered_jids) > max_job:
+        if max_job is not None and len(waiting_jids) > max_job:
             logger.info(
                 "MAX_JOB_PER_QUEUES_GROUP_SCHEDULING_ROUND=%d reached for queues %s: scheduling %d of %d waiting jobs",
                 max_job,
                 queues,
                 max_job,
-                len(waiting_ordered_jids),
+                len(waiting_jids),
             )
             waiting_ordered_jids = waiting_ordered_jids[:max_job]
-            waiting_jobs = {jid: waiting_jobs[jid] for jid in waiting_ordered_jids}
+        # Only the sorted jobs are scheduled and saved
+        waiting_jobs = {jid: waiting_jobs[jid] for jid in waiting_ordered_jids}
 
         #
         # Get already scheduled jobs advanced reservations and jobs from more higher priority queues
@@ -252,7 +274,7 @@ def schedule_cycle(
         #
         logger.info("save assignement")
 
-        plt.save_assigns(session, waiting_jobs, resource_set)
+        plt.save_assigns(session, waiting_jobs, resource_set, config)
     else:
         logger.info("no waiting jobs")
 
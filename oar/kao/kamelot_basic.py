@@ -83,7 +83,7 @@ def schedule_cycle(session, config, plt, queues=["default"]):
         #
         # Save assignement
         #
-        plt.save_assigns(session, waiting_jobs, resource_set)
+        plt.save_assigns(session, waiting_jobs, resource_set, config)
     else:
         logger.info("no waiting jobs")
 
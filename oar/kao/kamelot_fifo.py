@@ -101,7 +101,7 @@ def schedule_fifo_cycle(session, config, plt, queue="default", hierarchy_use=Fal
         # Save assignement
         #
         logger.info("save assignement")
-        plt.save_assigns(session, assigned_jobs, resource_set)
+        plt.save_assigns(session, assigned_jobs, resource_set, config)
 
     else:
         logger.info("no waiting jobs")
@@ -4,7 +4,8 @@ import re
 
 from sqlalchemy import func
 
-from oar.lib.models import Accounting
+from oar.lib.accounting import accounting_usage_range
+from oar.lib.models import Accounting, AccountingUsage
 
 
 # convert perl hash 2 dict
@@ -102,6 +103,44 @@ def get_sum_accounting_by_user(session, queues, window_start, window_stop):
     return (karma_asked, karma_used)
 
 
+def get_sum_accounting_usage(session, queues, window_start, window_stop):
+    """Same sums as get_sum_accounting_window, get_sum_accounting_by_project and
+    get_sum_accounting_by_user, read from the accounting_usage table maintained by
+    oaraccounting. Return None if this table does not hold the sums of the accounting
+    windows between window_start and window_stop."""
+    req = (
+        session.query(
+            AccountingUsage.user,
+            AccountingUsage.project,
+            AccountingUsage.consumption_type,
+            AccountingUsage.consumption,
+        )
+        .filter(AccountingUsage.queue_name.in_(tuple(queues)))
+        .filter(AccountingUsage.window_start == window_start)
+        .filter(AccountingUsage.window_stop == window_stop)
+        .all()
+    )
+    if not req:
+        return None
+
+    sum_time = {}
+    projects = {"ASKED": {}, "USED": {}}
+    users = {"ASKED": {}, "USED": {}}
+    for user, project, consumption_type, consumption in req:
+        sum_time[consumption_type] = sum_time.get(consumption_type, 0) + consumption
+        if consumption_type in projects:
+            karma_projects = projects[consumption_type]
+            karma_projects[project] = karma_projects.get(project, 0.0) + consumption
+            karma_users = users[consumption_type]
+            karma_users[user] = karma_users.get(user, 0.0) + consumption
+
+    return (
+        (float(sum_time.get("ASKED", 1)), float(sum_time.get("USED", 1))),
+        (projects["ASKED"], projects["USED"]),
+        (users["ASKED"], users["USED"]),
+    )
+
+
 #
 # Evaluate Karma value for each job
 #
@@ -131,15 +170,40 @@ def evaluate_jobs_karma(session, config, queues, now, jids, jobs, plt):
     window_start = now - karma_window_size
     window_stop = now
 
-    karma_sum_time_asked, karma_sum_time_used = plt.get_sum_accounting_window(
-        session, queues, window_start, window_stop
-    )
-    karma_projects_asked, karma_projects_used = plt.get_sum_accounting_by_project(
-        session, queues, window_start, window_stop
-    )
-    karma_users_asked, karma_users_used = plt.get_sum_accounting_by_user(
-        session, queues, window_start, window_stop
-    )
+    usage = None
+    if config["SCHEDULER_FAIRSHARING_USAGE_SUMMARY"] == "yes":
+        # The sums are those of the accounting windows in the fairsharing window
+        accounting_window_size = int(config.get("ACCOUNTING_WINDOW", 86400))
+        usage_start, usage_stop = accounting_usage_range(
+            now, karma_window_size, accounting_window_size
+        )
+        # The sum by user includes the accounting window which stops at now
+        if (
+            usage_stop
+            == accounting_usage_range(
+                now, karma_window_size, accounting_window_size, inclusive=True
+            )[1]
+        ):
+            usage = plt.get_sum_accounting_usage(
+                session, queues, usage_start, usage_stop
+            )
+
+    if usage is not None:
+        (
+            (karma_sum_time_asked, karma_sum_time_used),
+            (karma_projects_asked, karma_projects_used),
+            (karma_users_asked, karma_users_used),
+        ) = usage
+    else:
+        karma_sum_time_asked, karma_sum_time_used = plt.get_sum_accounting_window(
+            session, queues, window_start, window_stop
+        )
+        karma_projects_asked, karma_projects_used = plt.get_sum_accounting_by_project(
+            session, queues, window_start, window_stop
+        )
+        karma_users_asked, karma_users_used = plt.get_sum_accounting_by_user(
+            session, queues, window_start, window_stop
+        )
     #
     # Compute actual karma for each job
     #
@@ -11,12 +11,13 @@ from typing import Dict
 from procset import ProcSet
 
 # for quotas
-from sqlalchemy import text
+from sqlalchemy import and_, delete, exists, insert, select, text
 
 import oar.lib.tools as tools
 from oar.kao.kamelot import internal_schedule_cycle
 from oar.kao.platform import Platform
 from oar.kao.quotas import Quotas
+from oar.kao.round_profiler import RoundProfiler
 from oar.kao.scheduling import (
     find_resource_hierarchies_job,
     set_slots_with_prev_scheduled_jobs,
@@ -24,6 +25,7 @@ from oar.kao.scheduling import (
 from oar.kao.slot import (
     MAX_TIME,
     SlotSet,
+    get_slot_set_class,
     intersec_itvs_slots,
     intersec_ts_ph_itvs_slots,
 )
@@ -39,7 +41,9 @@ from oar.lib.job_handling import (
     JobPseudo,
     add_resource_job_pairs,
     frag_job,
+    gantt_delete_orphan_resources,
     gantt_flush_tables,
+    gantt_write_diff,
     get_after_sched_no_AR_jobs,
     get_cpuset_values,
     get_current_not_waiting_jobs,
@@ -60,11 +64,16 @@ from oar.lib.job_handling import (
     set_job_state,
     set_moldable_job_max_time,
 )
-from oar.lib.models import GanttJobsPredictionsVisu, GanttJobsResourcesVisu
+from oar.lib.models import (
+    GanttJobsPrediction,
+    GanttJobsPredictionsVisu,
+    GanttJobsResource,
+    GanttJobsResourcesVisu,
+)
 from oar.lib.node import (
     get_gantt_hostname_to_wake_up,
-    get_last_wake_up_date_of_node,
-    get_next_job_date_on_node,
+    get_last_wake_up_date_of_nodes,
+    get_next_job_date_on_nodes,
     search_idle_nodes,
 )
 from oar.lib.plugins import find_plugin_function
@@ -97,12 +106,42 @@ exit_code = 0
 # stock the job ids that where already send to almighty
 to_launch_jobs_already_treated = {}
 
+# States of the jobs which hold their resources
+CURRENT_JOB_STATES = [
+    "Running",
+    "toLaunch",
+    "Launching",
+    "Finishing",
+    "Suspended",
+    "Resuming",
+]
+
 # order_part = config['SCHEDULER_RESOURCE_ORDER']
 
 
 batsim_sched_proxy = None
 
 
+def availability_pseudo_jobs(resource_set):
+    """
+    Return the pseudo jobs, sorted by start time, which integrate resources
+    availability (Available_upto field) in slots.
+    """
+    pseudo_jobs = []
+    for t_avail_upto in sorted(resource_set.available_upto.keys()):
+        itvs = resource_set.available_upto[t_avail_upto]
+        j = JobPseudo()
+        j.start_time = t_avail_upto
+        j.walltime = MAX_TIME - t_avail_upto
+        j.res_set = itvs
+        j.ts = False
+        j.ph = NO_PLACEHOLDER
+
+        pseudo_jobs.append(j)
+
+    return pseudo_jobs
+
+
 def gantt_init_with_running_jobs(
     session, config, plt, initial_time_sec, job_security_time
 ):
@@ -121,37 +160,26 @@ def gantt_init_with_running_jobs(
     # Determine Global Resource Intervals and Initial Slot
     #
     resource_set = plt.resource_set(session, config)
-    initial_slot_set = SlotSet((resource_set.roid_itvs, initial_time_sec))
+    initial_slot_set = get_slot_set_class(config)(
+        (resource_set.roid_itvs, initial_time_sec)
+    )
 
     logger.debug("Processing of processing of already handled reservations")
     moldable_ids = get_waiting_moldable_of_reservations_already_scheduled(session)
-    gantt_flush_tables(session, moldable_ids)
+    gantt_flush_tables(session, moldable_ids, config)
 
     # TODO Can we remove this step, below ???
     #  why don't use: assigned_resources and job start_time ??? in get_scheduled_jobs ???
     logger.debug("Processing of current jobs")
     current_jobs = get_jobs_in_multiple_states(
-        session,
-        ["Running", "toLaunch", "Launching", "Finishing", "Suspended", "Resuming"],
-        resource_set,
+        session, CURRENT_JOB_STATES, resource_set
     )
-    plt.save_assigns(session, current_jobs, resource_set)  # TODO to verify
+    plt.save_assigns(session, current_jobs, resource_set, config)  # TODO to verify
 
     #
     #  Resource availabilty (Available_upto field) is integrated through pseudo job
     #
-    pseudo_jobs = []
-    for t_avail_upto in sorted(resource_set.available_upto.keys()):
-        itvs = resource_set.available_upto[t_avail_upto]
-        j = JobPseudo()
-        j.start_time = t_avail_upto
-        j.walltime = MAX_TIME - t_avail_upto
-        j.res_set = itvs
-        j.ts = False
-        j.ph = NO_PLACEHOLDER
-
-        pseudo_jobs.append(j)
-
+    pseudo_jobs = availability_pseudo_jobs(resource_set)
     if pseudo_jobs != []:
         initial_slot_set.split_slots_jobs(pseudo_jobs)
 
@@ -469,7 +497,7 @@ def check_reservation_jobs(
 
     if ar_jobs_scheduled != []:
         logger.debug("Save AR jobs' assignements in database")
-        save_assigns(session, ar_jobs_scheduled, resource_set)
+        save_assigns(session, ar_jobs_scheduled, resource_set, config)
 
     logger.debug("Queue " + queue_name + ": end processing of new reservations")
 
@@ -608,10 +636,18 @@ def handle_jobs_to_launch(
     return return_code
 
 
-def update_gantt_visualization(session):
+def update_gantt_visualization(session, config=None):
     """
     Update the database with the new scheduling decisions for visualizations.
+
+    With SCHEDULER_GANTT_WRITE_DIFF="yes", only the rows which differ between the
+    gantt tables and the visualization ones are deleted or inserted.
     """
+    if gantt_write_diff(config):
+        gantt_delete_orphan_resources(session)
+        update_gantt_visualization_diff(session)
+        return
+
     session.query(GanttJobsPredictionsVisu).delete()
     session.query(GanttJobsResourcesVisu).delete()
     session.commit()
@@ -629,6 +665,36 @@ def update_gantt_visualization(session):
     session.commit()
 
 
+def update_gantt_visualization_diff(session):
+    def same_row(a, b, columns):
+        return and_(*[getattr(a, c) == getattr(b, c) for c in columns])
+
+    for visu_model, model, columns in (
+        (
+            GanttJobsPredictionsVisu,
+            GanttJobsPrediction,
+            ("moldable_id", "start_time"),
+        ),
+        (GanttJobsResourcesVisu, GanttJobsResource, ("moldable_id", "resource_id")),
+    ):
+        # Rows which are no more in the gantt (or moved) ...
+        session.execute(
+            delete(visu_model).where(
+                ~exists().where(same_row(model, visu_model, columns))
+            )
+        )
+        # ... and new ones
+        session.execute(
+            insert(visu_model).from_select(
+                [getattr(visu_model, c) for c in columns],
+                select(*[getattr(model, c) for c in columns]).where(
+                    ~exists().where(same_row(visu_model, model, columns))
+                ),
+            )
+        )
+    session.commit()
+
+
 def call_external_scheduler(
     session,
     schedulers_path,
@@ -757,7 +823,15 @@ def call_batsim_sched_proxy(
 
 
 def call_internal_scheduler(
-    session, config, plt, scheduled_jobs, all_slot_sets, job_security_time, queues, now
+    session,
+    config,
+    plt,
+    scheduled_jobs,
+    all_slot_sets,
+    job_security_time,
+    queues,
+    now,
+    profiler=None,
 ):
     """
     Internal scheduling phase. The scheduler is not loaded from an external command,
@@ -778,6 +852,7 @@ def call_internal_scheduler(
         all_slot_sets,
         job_security_time,
         [q.name for q in queues],
+        profiler,
     )
 
 
@@ -815,15 +890,23 @@ def nodes_energy_saving(session, config, logger, current_time_sec):
 
         tmp_time = current_time_sec - idle_duration
 
-        # Determine nodes to halt
+        # Determine nodes to halt, the next job and last wake up dates of the
+        # nodes idle for long enough are retrieved at once
+        candidate_nodes = [
+            node
+            for node, idle_duration in idle_nodes.items()
+            if idle_duration < tmp_time
+        ]
         nodes_2_halt = []
-        for node, idle_duration in idle_nodes.items():
-            if idle_duration < tmp_time:
+        if candidate_nodes:
+            next_job_dates = get_next_job_date_on_nodes(session, candidate_nodes)
+            wakeup_dates = get_last_wake_up_date_of_nodes(session, candidate_nodes)
+            for node in candidate_nodes:
                 # Search if the node has enough time to sleep
-                tmp = get_next_job_date_on_node(session, node)
+                tmp = next_job_dates.get(node)
                 if (tmp is None) or (tmp - sleep_duration > current_time_sec):
                     # Search if node has not been woken up recently
-                    wakeup_date = get_last_wake_up_date_of_node(session, node)
+                    wakeup_date = wakeup_dates.get(node)
                     if (wakeup_date is None) or (wakeup_date < tmp_time):
                         nodes_2_halt.append(node)
 
@@ -842,7 +925,81 @@ def nodes_energy_saving(session, config, logger, current_time_sec):
     return {"halt": nodes_2_halt, "wakeup": nodes_2_wakeup}
 
 
-def meta_schedule(session, config, mode="internal", plt=Platform()):
+def energy_saving(session, config, current_time_sec):
+    """
+    Manage dynamic node feature for energy saving: nodes are halted or woken up
+    by :class:`Greta` or by the configured commands.
+    """
+    if config["ENERGY_SAVING_MODE"] == "metascheduler_decision_making":
+        nodes_2_change = nodes_energy_saving(session, config, logger, current_time_sec)
+    elif config["ENERGY_SAVING_MODE"] == "batsim_scheduler_proxy_decision_making":
+        nodes_2_change = batsim_sched_proxy.retrieve_pstate_changes_to_apply()
+    else:
+        logger.error(
+            "Error ENERGY_SAVING_MODE unknown: " + config["ENERGY_SAVING_MODE"]
+        )
+
+    greta = GretaClient(config, logger)
+
+    flag_greta = False
+    timeout_cmd = int(config["SCHEDULER_TIMEOUT"])
+
+    # Command Greta to halt selected nodes
+    nodes_2_halt = nodes_2_change["halt"]
+    if nodes_2_halt != []:
+        logger.debug("Powering off some nodes (energy saving): " + str(nodes_2_halt))
+        # Using the built-in energy saving module to shut down nodes
+        if config["ENERGY_SAVING_INTERNAL"] == "yes":
+            greta.halt_nodes(nodes_2_halt)
+            # logger.error("Communication problem with the energy saving module (Greta)\n")
+            flag_greta = True
+        else:
+            # Not using the built-in energy saving module to shut down nodes
+            cmd = config["SCHEDULER_NODE_MANAGER_SLEEP_CMD"]
+            if tools.fork_and_feed_stdin(cmd, timeout_cmd, nodes_2_halt):
+                logger.error(
+                    "Command "
+                    + cmd
+                    + "timeouted ("
+                    + str(timeout_cmd)
+                    + "s) while trying to  poweroff some nodes"
+                )
+
+    # Command Greta to wake up selected nodes
+    nodes_2_wakeup = nodes_2_change["wakeup"]
+    if nodes_2_wakeup != []:
+        logger.debug("Awaking some nodes: " + str(nodes_2_change))
+        # Using the built-in energy saving module to wake up nodes
+        if config["ENERGY_SAVING_INTERNAL"] == "yes":
+            greta.wake_up_nodes(nodes_2_wakeup)
+            # logger.error("Communication problem with the energy saving module (Greta)")
+            flag_greta = True
+        else:
+            # Not using the built-in energy saving module to wake up nodes
+            cmd = config["SCHEDULER_NODE_MANAGER_WAKE_UP_CMD"]
+            if tools.fork_and_feed_stdin(cmd, timeout_cmd, nodes_2_wakeup):
+                logger.error(
+                    "Command "
+                    + cmd
+                    + "timeouted ("
+                    + str(timeout_cmd)
+                    + "s) while trying to wake-up some nodes "
+                )
+
+    # Send CHECK signal to Greta if needed
+    if not flag_greta and (config["ENERGY_SAVING_INTERNAL"] == "yes"):
+        greta.check_nodes()
+        #    logger.error("Communication problem with the energy saving module (Greta)")
+
+
+def meta_schedule(
+    session,
+    config,
+    mode="internal",
+    plt=Platform(),
+    gantt=None,
+    profiler=None,
+):
     """
     Meta scheduling phase.
     Run the scheduler on each queue dependeding on their priority order.
@@ -851,9 +1008,20 @@ def meta_schedule(session, config, mode="internal", plt=Platform()):
     #. Loops through queues order by priority and call the scheduler
     #. It is also responsible to detect best effort jobs that need to be killed
     #. If the energy saving mode is enabled, it calls :class:`Greta`.
+
+    When the meta scheduler is long-lived, `gantt` is the
+    :class:`oar.kao.incremental_gantt.IncrementalGantt` kept between rounds,
+    the gantt is then updated from the previous round instead of being rebuilt.
+
+    The phases of the round are measured by `profiler`
+    (see :class:`oar.kao.round_profiler.RoundProfiler`).
     """
     exit_code = 0
 
+    if profiler is None:
+        profiler = RoundProfiler(config)
+    profiler.start(session)
+
     job_security_time = int(config["SCHEDULER_JOB_SECURITY_TIME"])
 
     # Kill duration before starting jobs
@@ -867,12 +1035,13 @@ def meta_schedule(session, config, mode="internal", plt=Platform()):
         kill_duration_before_reservation = 0
 
     if ("QUOTAS" in config) and (config["QUOTAS"] == "yes"):
-        Quotas.enable(config, plt.resource_set(session, config))
+        plt.enable_quotas(config, plt.resource_set(session, config))
 
     if ("WALLTIME_CHANGE_ENABLED" in config) and (
         config["WALLTIME_CHANGE_ENABLED"] == "yes"
     ):
-        process_walltime_change_requests(plt)
+        with profiler.phase("walltime_change"):
+            process_walltime_change_requests(plt)
 
     tools.create_almighty_socket(
         config["SERVER_HOSTNAME"], config["APPENDICE_SERVER_PORT"]
@@ -891,9 +1060,15 @@ def meta_schedule(session, config, mode="internal", plt=Platform()):
     current_time_sec = initial_time_sec
     current_time_sql = initial_time_sql
 
-    gantt_init_results = gantt_init_with_running_jobs(
-        session, config, plt, initial_time_sec, job_security_time
-    )
+    with profiler.phase("gantt_init_with_running_jobs"):
+        if gantt is None:
+            gantt_init_results = gantt_init_with_running_jobs(
+                session, config, plt, initial_time_sec, job_security_time
+            )
+        else:
+            gantt_init_results = gantt.init_with_running_jobs(
+                session, config, plt, initial_time_sec, job_security_time
+            )
     all_slot_sets, scheduled_jobs, besteffort_rid2jid = gantt_init_results
     resource_set = plt.resource_set(session=session, config=config)
 
@@ -921,6 +1096,7 @@ def meta_schedule(session, config, mode="internal", plt=Platform()):
     prev_queues = None
 
     for queues in get_queues_groupby_priority(session):
+        profiler.start_queue_group([q.name for q in queues])
         extra_metasched_func(
             session,
             prev_queues,
@@ -955,29 +1131,34 @@ def meta_schedule(session, config, mode="internal", plt=Platform()):
                 job_security_time,
                 active_queues,
                 initial_time_sec,
+                profiler,
             )
-            for queue in active_queues:
-                handle_waiting_reservation_jobs(
-                    session,
-                    config,
-                    queue.name,
-                    resource_set,
-                    job_security_time,
-                    current_time_sec,
-                )
-                # handle_new_AR_jobs
-                check_reservation_jobs(
-                    session,
-                    config,
-                    plt,
-                    resource_set,
-                    queue.name,
-                    all_slot_sets,
-                    current_time_sec,
-                )
+            with profiler.phase("reservations"):
+                for queue in active_queues:
+                    handle_waiting_reservation_jobs(
+                        session,
+                        config,
+                        queue.name,
+                        resource_set,
+                        job_security_time,
+                        current_time_sec,
+                    )
+                    # handle_new_AR_jobs
+                    check_reservation_jobs(
+                        session,
+                        config,
+                        plt,
+                        resource_set,
+                        queue.name,
+                        all_slot_sets,
+                        current_time_sec,
+                    )
         else:
             for queue in active_queues:
                 if mode == "external":  # pragma: no cover
+                    if gantt_write_diff(config):
+                        # External schedulers write in gantt tables on their own
+                        gantt_delete_orphan_resources(session)
                     call_external_scheduler(
                         session,
                         schedulers_path,
@@ -1010,17 +1191,20 @@ def meta_schedule(session, config, mode="internal", plt=Platform()):
                     current_time_sec,
                 )
 
-    (
-        jobs_to_launch_with_security_time,
-        jobs_to_launch_with_security_time_lst,
-        rid2jid_to_launch,
-    ) = get_gantt_jobs_to_launch(
-        session,
-        resource_set,
-        job_security_time,
-        current_time_sec,
-        kill_duration_before_reservation=kill_duration_before_reservation,
-    )
+    profiler.start_queue_group(None)
+
+    with profiler.phase("get_gantt_jobs_to_launch"):
+        (
+            jobs_to_launch_with_security_time,
+            jobs_to_launch_with_security_time_lst,
+            rid2jid_to_launch,
+        ) = get_gantt_jobs_to_launch(
+            session,
+            resource_set,
+            job_security_time,
+            current_time_sec,
+            kill_duration_before_reservation=kill_duration_before_reservation,
+        )
 
     # Filter jobs that are not yet ready to be scheduled, but present because of the
     # kill_duration_before_reservation=kill_duration_before_reservation parameter
@@ -1037,8 +1221,8 @@ def meta_schedule(session, config, mode="internal", plt=Platform()):
     # for job in jobs_to_launch_lst:
     #    logger.debug(f"TOLAUNCH Job id:{job.id}, start_time: {job.start_time}, now: {current_time_sec}")
 
-    if (
-        check_besteffort_jobs_to_kill(
+    with profiler.phase("check_besteffort_jobs_to_kill"):
+        besteffort_jobs_to_kill = check_besteffort_jobs_to_kill(
             session,
             jobs_to_launch_with_security_time,  # Jobs to launch or about to be launched
             rid2jid_to_launch,
@@ -1046,90 +1230,35 @@ def meta_schedule(session, config, mode="internal", plt=Platform()):
             besteffort_rid2jid,
             resource_set,
         )
-        == 1
-    ):
+
+    if besteffort_jobs_to_kill == 1:
         # We must kill some besteffort jobs
         tools.notify_almighty("ChState")
         exit_code = 2
-    elif (
-        handle_jobs_to_launch(
-            session, config, jobs_to_launch_lst, current_time_sec, current_time_sql
-        )
-        == 1
-    ):
-        exit_code = 0
+    else:
+        with profiler.phase("handle_jobs_to_launch"):
+            if (
+                handle_jobs_to_launch(
+                    session,
+                    config,
+                    jobs_to_launch_lst,
+                    current_time_sec,
+                    current_time_sql,
+                )
+                == 1
+            ):
+                exit_code = 0
 
     # Update visu gantt tables
-    update_gantt_visualization(session)
+    with profiler.phase("update_gantt_visualization"):
+        update_gantt_visualization(session, config)
 
     #
     # Manage dynamic node feature for energy saving:
     #
     if ("ENERGY_SAVING_MODE" in config) and config["ENERGY_SAVING_MODE"] != "":
-        if config["ENERGY_SAVING_MODE"] == "metascheduler_decision_making":
-            nodes_2_change = nodes_energy_saving(
-                session, config, logger, current_time_sec
-            )
-        elif config["ENERGY_SAVING_MODE"] == "batsim_scheduler_proxy_decision_making":
-            nodes_2_change = batsim_sched_proxy.retrieve_pstate_changes_to_apply()
-        else:
-            logger.error(
-                "Error ENERGY_SAVING_MODE unknown: " + config["ENERGY_SAVING_MODE"]
-            )
-
-        greta = GretaClient(config, logger)
-
-        flag_greta = False
-        timeout_cmd = int(config["SCHEDULER_TIMEOUT"])
-
-        # Command Greta to halt selected nodes
-        nodes_2_halt = nodes_2_change["halt"]
-        if nodes_2_halt != []:
-            logger.debug(
-                "Powering off some nodes (energy saving): " + str(nodes_2_halt)
-            )
-            # Using the built-in energy saving module to shut down nodes
-            if config["ENERGY_SAVING_INTERNAL"] == "yes":
-                greta.halt_nodes(nodes_2_halt)
-                # logger.error("Communication problem with the energy saving module (Greta)\n")
-                flag_greta = True
-            else:
-                # Not using the built-in energy saving module to shut down nodes
-                cmd = config["SCHEDULER_NODE_MANAGER_SLEEP_CMD"]
-                if tools.fork_and_feed_stdin(cmd, timeout_cmd, nodes_2_halt):
-                    logger.error(
-                        "Command "
-                        + cmd
-                        + "timeouted ("
-                        + str(timeout_cmd)
-                        + "s) while trying to  poweroff some nodes"
-                    )
-
-        # Command Greta to wake up selected nodes
-        nodes_2_wakeup = nodes_2_change["wakeup"]
-        if nodes_2_wakeup != []:
-            logger.debug("Awaking some nodes: " + str(nodes_2_change))
-            # Using the built-in energy saving module to wake up nodes
-            if config["ENERGY_SAVING_INTERNAL"] == "yes":
-                greta.wake_up_nodes(nodes_2_wakeup)
-                # logger.error("Communication problem with the energy saving module (Greta)")
-                flag_greta = True
-            else:
-                # Not using the built-in energy saving module to wake up nodes
-                cmd = config["SCHEDULER_NODE_MANAGER_WAKE_UP_CMD"]
-                if tools.fork_and_feed_stdin(cmd, timeout_cmd, nodes_2_wakeup):
-                    logger.error(
-                        "Command "
-                        + cmd
-                        + "timeouted ("
-                        + str(timeout_cmd)
-                        + "s) while trying to wake-up some nodes "
-                    )
-
-        # Send CHECK signal to Greta if needed
-        if not flag_greta and (config["ENERGY_SAVING_INTERNAL"] == "yes"):
-            greta.check_nodes()
-            #    logger.error("Communication problem with the energy saving module (Greta)")
+        with profiler.phase("energy_saving"):
+            energy_saving(session, config, current_time_sec)
 
     # Retrieve jobs according to their state and excluding job in 'Waiting' state.
     jobs_by_state = get_current_not_waiting_jobs(session)
@@ -1329,4 +1458,6 @@ def meta_schedule(session, config, mode="internal", plt=Platform()):
 
     logger.debug("End of Meta Scheduler")
 
+    profiler.stop()
+
     return exit_code
@@ -1,3 +1,6 @@
+import heapq
+import os
+
 import yaml
 
 from oar.kao.karma import evaluate_jobs_karma
@@ -6,6 +9,52 @@ from oar.lib.globals import get_logger, init_oar
 config, db = init_oar(no_db=True)
 logger = get_logger("oar.kao.priorty")
 
+PRIORITY_CONF_DEFAULTS = {
+    "age_weight": 0,
+    "age_coef": 1.65e-06,  # 7 days in seconds
+    "queue_weight": 0,
+    "queue_coefs": {},
+    "work_weight": 0,
+    "work_mode": 0,  # prioritize small jobs
+    "size_weight": 0,
+    "size_mode": 0,  # prioritize small jobs
+    "karma_weight": 0,
+    "qos_weight": 0,
+    "nice_weight": 0,
+}
+
+# Parsed priority configuration files, by path: ((modification time, size), priority conf)
+priority_confs = {}
+
+
+def get_priority_conf(priority_conf_file):
+    """
+    Return the priority configuration (PRIORITY_CONF_FILE) completed with the default
+    weights and coefficients. The file is parsed again only when it is modified.
+    """
+    stat = os.stat(priority_conf_file)
+    mtime = (stat.st_mtime_ns, stat.st_size)
+    if priority_conf_file in priority_confs:
+        conf_mtime, priority_conf = priority_confs[priority_conf_file]
+        if conf_mtime == mtime:
+            return priority_conf
+
+    with open(priority_conf_file, "r") as stream:
+        try:
+            yaml_priority = yaml.safe_load(stream)
+        except yaml.YAMLError as exc:
+            logger.error(exc)
+            raise
+
+    priority_conf = dict(PRIORITY_CONF_DEFAULTS)
+    priority_conf.update(
+        (key, value)
+        for key, value in yaml_priority.items()
+        if key in PRIORITY_CONF_DEFAULTS
+    )
+    priority_confs[priority_conf_file] = (mtime, priority_conf)
+    return priority_conf
+
 
 def evaluate_jobs_priority(session, config, queues, now, jids, jobs, plt):
     """
@@ -29,90 +78,96 @@ def evaluate_jobs_priority(session, config, queues, now, jids, jobs, plt):
     Note: The priority approach is largely inspired by Slurm's one
     """
 
-    age_weight = 0
-    age_coef = 1.65e-06  # 7 days in seconds
-    queue_weight = 0
-    work_weight = 0
-    work_mode = 0  # prioritize small jobs
-    size_weight = 0
-    size_mode = 0  # prioritize small jobs
-    karma_weight = 0
-    qos_weight = 0
-    nice_weight = 0
-
-    queue_coefs = {}
-
-    with open(config["PRIORITY_CONF_FILE"], "r") as stream:
-        try:
-            yaml_priority = yaml.safe_load(stream)
-        except yaml.YAMLError as exc:
-            logger.error(exc)
-
-    if ("age_weight") in yaml_priority:
-        age_weight = yaml_priority["age_weight"]
-    if ("age_coef") in yaml_priority:
-        age_coef = yaml_priority["age_coef"]
-    if ("queue_weight") in yaml_priority:
-        queue_weight = yaml_priority["queue_weight"]
-    if ("queue_coefs") in yaml_priority:
-        queue_coefs = yaml_priority["queue_coefs"]
-    if ("work_weight") in yaml_priority:
-        work_weight = yaml_priority["work_weight"]
-    if ("work_mode") in yaml_priority:
-        work_mode = yaml_priority["work_mode"]
-    if ("size_weight") in yaml_priority:
-        size_weight = yaml_priority["size_weight"]
-    if ("size_mode") in yaml_priority:
-        size_mode = yaml_priority["size_mode"]
-    if ("karma_weight") in yaml_priority:
-        karma_weight = yaml_priority["karma_weight"]
-    if ("qos_weight") in yaml_priority:
-        qos_weight = yaml_priority["qos_weight"]
-    if ("nice_weight") in yaml_priority:
-        nice_weight = yaml_priority["nice_weight"]
+    priority_conf = get_priority_conf(config["PRIORITY_CONF_FILE"])
+    age_weight = priority_conf["age_weight"]
+    age_coef = priority_conf["age_coef"]
+    queue_weight = priority_conf["queue_weight"]
+    queue_coefs = priority_conf["queue_coefs"]
+    work_weight = priority_conf["work_weight"]
+    work_mode = priority_conf["work_mode"]
+    size_weight = priority_conf["size_weight"]
+    size_mode = priority_conf["size_mode"]
+    karma_weight = priority_conf["karma_weight"]
+    qos_weight = priority_conf["qos_weight"]
+    nice_weight = priority_conf["nice_weight"]
 
     # evalute and retrieve jobs' karma for fair-share
     evaluate_jobs_karma(session, config, queues, now, jids, jobs, plt)
 
-    for job in jobs.values():
-        job.priority = age_weight * max(1.0, age_coef * (now - job.submission_time))
-        if queue_weight > 0.0:
-            if job.queue_name in queue_coefs:
-                job.priority += queue_weight * queue_coefs[job.queue_name]
-            else:
-                logger.warning(
-                    "queue {} is define in queue_coefs but the queue_weight is.".format(
-                        job.queue_name
-                    )
-                )
-        if work_weight > 0.0:
-            if work_mode:
-                # prioritize big jobs over small ones (work = nb_resources * walltime)
-                job.priority += work_weight * (1.0 - 1.0 / min(1.0, job.work))
-            else:
-                # prioritize small jobs over big ones  (work = nb_resources * walltime)
-                job.priority += work_weight * 1.0 / min(1.0, job.work)
-        if size_weight > 0.0:
-            if size_mode:
-                # prioritize big jobs over small ones
-                job.priority += size_weight * (job.size / plt.nb_default_resources)
-            else:
-                # prioritize small jobs over big ones
-                job.priority += size_weight * (
-                    1.0 - (job.size / plt.nb_default_resources)
+    # Each criterion is evaluated for all the jobs at once, in the same order as they
+    # were added job by job, so that priorities are the same
+    job_list = list(jobs.values())
+    priorities = [
+        age_weight * max(1.0, age_coef * (now - job.submission_time))
+        for job in job_list
+    ]
+    if queue_weight > 0.0:
+        for queue_name in {job.queue_name for job in job_list} - queue_coefs.keys():
+            logger.warning(
+                "queue {} is define in queue_coefs but the queue_weight is.".format(
+                    queue_name
                 )
-
-        print("job id {} Karma {}".format(job.id, job.karma))
-        job.priority += karma_weight * (1.0 / (1.0 + job.karma))
-        if qos_weight > 0.0:
-            job.priority += qos_weight * job.qos
-        if nice_weight > 0.0:
-            job.priority += nice_weight * max(1.0, job.nice)
-
-
-def multifactor_jobs_sorting(session, config, queues, now, jids, jobs, plt):
+            )
+        priorities = [
+            p + queue_weight * queue_coefs[job.queue_name]
+            if job.queue_name in queue_coefs
+            else p
+            for p, job in zip(priorities, job_list)
+        ]
+    if work_weight > 0.0:
+        if work_mode:
+            # prioritize big jobs over small ones (work = nb_resources * walltime)
+            priorities = [
+                p + work_weight * (1.0 - 1.0 / min(1.0, job.work))
+                for p, job in zip(priorities, job_list)
+            ]
+        else:
+            # prioritize small jobs over big ones  (work = nb_resources * walltime)
+            priorities = [
+                p + work_weight * 1.0 / min(1.0, job.work)
+                for p, job in zip(priorities, job_list)
+            ]
+    if size_weight > 0.0:
+        nb_default_resources = plt.nb_default_resources
+        if size_mode:
+            # prioritize big jobs over small ones
+            priorities = [
+                p + size_weight * (job.size / nb_default_resources)
+                for p, job in zip(priorities, job_list)
+            ]
+        else:
+            # prioritize small jobs over big ones
+            priorities = [
+                p + size_weight * (1.0 - (job.size / nb_default_resources))
+                for p, job in zip(priorities, job_list)
+            ]
+    priorities = [
+        p + karma_weight * (1.0 / (1.0 + job.karma))
+        for p, job in zip(priorities, job_list)
+    ]
+    if qos_weight > 0.0:
+        priorities = [p + qos_weight * job.qos for p, job in zip(priorities, job_list)]
+    if nice_weight > 0.0:
+        priorities = [
+            p + nice_weight * max(1.0, job.nice) for p, job in zip(priorities, job_list)
+        ]
+
+    for p, job in zip(priorities, job_list):
+        job.priority = p
+
+
+def multifactor_jobs_sorting(
+    session, config, queues, now, jids, jobs, plt, max_jobs=None
+):
+    """
+    Sort jobs by decreasing priority. When only the `max_jobs` first jobs will be
+    scheduled, only them are returned (the same as the `max_jobs` first sorted jobs).
+    """
     evaluate_jobs_priority(session, config, queues, now, jids, jobs, plt)
 
+    if max_jobs is not None and max_jobs < len(jids):
+        return heapq.nlargest(max_jobs, jids, key=lambda jid: jobs[jid].priority)
+
     ordered_jids = sorted(jids, key=lambda jid: jobs[jid].priority, reverse=True)
     # print("job priorty")
     # for job in jobs.values():
@@ -6,8 +6,10 @@ from procset import ProcSet
 from oar.kao.karma import (
     get_sum_accounting_by_project,
     get_sum_accounting_by_user,
+    get_sum_accounting_usage,
     get_sum_accounting_window,
 )
+from oar.kao.quotas import Quotas
 from oar.lib.job_handling import (
     get_data_jobs,
     get_scheduled_jobs,
@@ -46,6 +48,9 @@ class Platform(object):
     def save_assigns(self, *args):
         return save_assigns(*args)
 
+    def enable_quotas(self, config, resource_set):
+        Quotas.enable(config, resource_set)
+
     def get_sum_accounting_window(self, *args):
         return get_sum_accounting_window(*args)
 
@@ -55,6 +60,9 @@ class Platform(object):
     def get_sum_accounting_by_user(self, *args):
         return get_sum_accounting_by_user(*args)
 
+    def get_sum_accounting_usage(self, *args):
+        return get_sum_accounting_usage(*args)
+
     #
     # SimSim and BatSim mode simu
     #
@@ -145,6 +153,9 @@ class SimuPlatform(Platform):
     def get_sum_accounting_by_user(self, *args):
         print("get_sum_accounting_by_user NOT IMPLEMENTED")
 
+    def get_sum_accounting_usage(self, *args):
+        print("get_sum_accounting_usage NOT IMPLEMENTED")
+
     def get_waiting_jobs(self, queue):
         print(" get_waiting_jobs_simu:", self.waiting_jids)
         waiting_jobs = {}
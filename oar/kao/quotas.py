@@ -1,8 +1,6 @@
 # coding: utf-8
-from collections import defaultdict
-from copy import deepcopy
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import simplejson as json
 from rich import print
@@ -517,6 +515,15 @@ class Quotas(object):
     # Job types are apart, so they can extends the quotas globally ?
     job_types: List[str] = ["*"]
 
+    # Counters of all Quotas are flat lists holding, for each counter key
+    # (queue, project, job_type, user), its 3 values (nb resources, nb jobs,
+    # resources time) at 3 * (index of the key)
+    counter_indices: Dict[Tuple[str, str, str, str], int] = {}
+    # job's (queue, project, user, job types) -> (indices of the counters it updates, counters size)
+    job_counters: Dict[Tuple, Tuple[List[int], int]] = {}
+    # id(rules) -> (rules, rule tree, {job's (queue, project, job type, user): applicable rule})
+    compiled_rules: Dict[int, Tuple[dict, dict, dict]] = {}
+
     @classmethod
     def enable(cls, config: configuration, resource_set=None):
         cls.enabled = True
@@ -533,10 +540,24 @@ class Quotas(object):
         else:
             all_value = None
 
+        cls.reset_registries()
         cls.load_quotas_rules(config, all_value)
 
+    @classmethod
+    def reset_registries(cls):
+        """
+        Forget the counter keys, the jobs' counter indices and the compiled rules. The counters of
+        the existing Quotas are no longer valid, only the Quotas created afterward must be used.
+        """
+        cls.counter_indices = {}
+        cls.job_counters = {}
+        cls.compiled_rules = {}
+
     def __init__(self, rules=None):
-        self.counters = defaultdict(lambda: [0, 0, 0])
+        self.counters: List[int] = []
+        # counters may be shared with other Quotas (see deepcopy_from), they are copied before
+        # being modified
+        self.counters_shared = False
         if not rules:
             self.rules = Quotas.default_rules
         else:
@@ -545,23 +566,74 @@ class Quotas(object):
         self.init_rule_tree()
 
     def deepcopy_from(self, quotas):
-        self.counters = deepcopy(quotas.counters)
+        """Copy the counters of `quotas`, they are shared until one of both Quotas modifies them."""
+        self.counters = quotas.counters
+        self.counters_shared = True
+        quotas.counters_shared = True
+
+    def writable_counters(self, size: int) -> List[int]:
+        """Return the counters, of at least `size` values, ready to be modified."""
+        if self.counters_shared:
+            self.counters = self.counters.copy()
+            self.counters_shared = False
+        if len(self.counters) < size:
+            self.counters.extend([0] * (size - len(self.counters)))
+        return self.counters
+
+    @staticmethod
+    def counter_index(key: Tuple[str, str, str, str]) -> int:
+        """Return the index of the counter `key` in counters, registering it if needed."""
+        index = Quotas.counter_indices.get(key)
+        if index is None:
+            index = len(Quotas.counter_indices)
+            Quotas.counter_indices[key] = index
+        return index
+
+    def counter(self, key: Tuple[str, str, str, str]) -> List[int]:
+        """Return the [nb resources, nb jobs, resources time] values of the counter `key`."""
+        index = Quotas.counter_indices.get(key)
+        if (index is None) or (3 * index >= len(self.counters)):
+            return [0, 0, 0]
+        return self.counters[3 * index : 3 * index + 3]
 
     def show_counters(self, msg=""):  # pragma: no cover
         print("show_counters:", msg)
-        for k, v in self.counters.items():
-            print(k, " = ", v)
+        for key in Quotas.counter_indices:
+            print(key, " = ", self.counter(key))
 
-    def update(self, job, prev_nb_res=0, prev_duration=0):
-        queue = job.queue_name
-        project = job.project
-        user = job.user
+    @staticmethod
+    def job_counter_indices(job) -> Tuple[List[int], int]:
+        """
+        Return the indices of the counters updated by `job` (resolved once for all the jobs with
+        same queue, project, user and types), and the size of counters needed to hold them.
+        """
+        types = tuple(t for t in Quotas.job_types if (t == "*") or (t in job.types))
+        key = (job.queue_name, job.project, job.user, types)
+        if key not in Quotas.job_counters:
+            queue, project, user, _ = key
+            indices = []
+            for t in types:
+                for counter_key in [
+                    ("*", "*", t, "*"),
+                    ("*", "*", t, user),
+                    ("*", project, t, "*"),
+                    (queue, "*", t, "*"),
+                    (queue, project, t, user),
+                    (queue, project, t, "*"),
+                    (queue, "*", t, user),
+                    ("*", project, t, user),
+                ]:
+                    indices.append(Quotas.counter_index(counter_key))
+            Quotas.job_counters[key] = (indices, 3 * (max(indices, default=-1) + 1))
+        return Quotas.job_counters[key]
 
+    @staticmethod
+    def job_usage(job, prev_nb_res=0, prev_duration=0) -> Tuple[int, int]:
+        """Return the number of resources and the duration accounted for `job`."""
         # TOREMOVE ?
         if hasattr(job, "res_set"):
-            if not hasattr(self, "nb_res"):
-                job.nb_res = len(job.res_set & ResourceSet.default_itvs)
-                nb_resources = job.nb_res
+            job.nb_res = len(job.res_set & ResourceSet.default_itvs)
+            nb_resources = job.nb_res
         else:
             nb_resources = prev_nb_res
 
@@ -570,44 +642,29 @@ class Quotas(object):
         else:
             duration = prev_duration
 
-        for t in Quotas.job_types:
-            if (t == "*") or (t in job.types):
-                # TODO: can't we instead loop over active rules?
-                # Update the number of used resources
-                self.counters["*", "*", t, "*"][0] += nb_resources
-                self.counters["*", "*", t, user][0] += nb_resources
-                self.counters["*", project, t, "*"][0] += nb_resources
-                self.counters[queue, "*", t, "*"][0] += nb_resources
-                self.counters[queue, project, t, user][0] += nb_resources
-                self.counters[queue, project, t, "*"][0] += nb_resources
-                self.counters[queue, "*", t, user][0] += nb_resources
-                self.counters["*", project, t, user][0] += nb_resources
-                # Update the number of running jobs
-                self.counters["*", "*", t, "*"][1] += 1
-                self.counters["*", "*", t, user][1] += 1
-                self.counters["*", project, t, "*"][1] += 1
-                self.counters[queue, "*", t, "*"][1] += 1
-                self.counters[queue, project, t, user][1] += 1
-                self.counters[queue, project, t, "*"][1] += 1
-                self.counters[queue, "*", t, user][1] += 1
-                self.counters["*", project, t, user][1] += 1
-                # Update the resource * second
-                self.counters["*", "*", t, "*"][2] += nb_resources * duration
-                self.counters["*", "*", t, user][2] += nb_resources * duration
-                self.counters["*", project, t, "*"][2] += nb_resources * duration
-                self.counters[queue, "*", t, "*"][2] += nb_resources * duration
-                self.counters[queue, project, t, user][2] += nb_resources * duration
-                self.counters[queue, project, t, "*"][2] += nb_resources * duration
-                self.counters[queue, "*", t, user][2] += nb_resources * duration
-                self.counters["*", project, t, user][2] += nb_resources * duration
+        return (nb_resources, duration)
+
+    def update(self, job, prev_nb_res=0, prev_duration=0):
+        nb_resources, duration = Quotas.job_usage(job, prev_nb_res, prev_duration)
+        indices, size = Quotas.job_counter_indices(job)
+
+        counters = self.writable_counters(size)
+
+        resources_time = nb_resources * duration
+        for index in indices:
+            i = 3 * index
+            # Update the number of used resources, of running jobs and the resource * second
+            counters[i] += nb_resources
+            counters[i + 1] += 1
+            counters[i + 2] += resources_time
 
     def combine(self, quotas):
-        # self.show_counters('combine before')
-        for key, value in quotas.counters.items():
-            self.counters[key][0] = max(self.counters[key][0], value[0])
-            self.counters[key][1] = max(self.counters[key][1], value[1])
-            self.counters[key][2] += value[2]
-        # self.show_counters('combine after')
+        other_counters = quotas.counters
+        counters = self.writable_counters(len(other_counters))
+        for i in range(0, len(other_counters), 3):
+            counters[i] = max(counters[i], other_counters[i])
+            counters[i + 1] = max(counters[i + 1], other_counters[i + 1])
+            counters[i + 2] += other_counters[i + 2]
 
     def init_rule_tree(self):
         # Create the rule multi-tree from all active rules
@@ -623,33 +680,47 @@ class Quotas(object):
         #                 /      \          /
         # user:         '/'     '*'       '*'
 
-        self.rule_tree: dict[str, dict[str, dict[str, (int, int, float)]]] = dict()
+        # The tree (and the applicable rules) are computed once for each set of rules
+        compiled = Quotas.compiled_rules.get(id(self.rules))
+        if (compiled is None) or (compiled[0] is not self.rules):
+            rule_tree: dict[str, dict[str, dict[str, (int, int, float)]]] = dict()
 
-        for fields, rule in self.rules.items():
-            current = self.rule_tree
-            for f in fields:
-                if f not in current:
-                    current[f] = dict()
-                current = current[f]
-            queue, project, job_type, user = fields
+            for fields, rule in self.rules.items():
+                current = rule_tree
+                for f in fields:
+                    if f not in current:
+                        current[f] = dict()
+                    current = current[f]
+                queue, project, job_type, user = fields
 
-            self.rule_tree[queue][project][job_type][user] = rule
+                rule_tree[queue][project][job_type][user] = rule
+
+            compiled = (self.rules, rule_tree, {})
+            Quotas.compiled_rules[id(self.rules)] = compiled
+
+        self.rule_tree = compiled[1]
+        self.applicable_rules = compiled[2]
 
         return self.rule_tree
 
     def find_applicable_rule(self, job):
+        """
+        Return the rule applying to `job`, the key of the counter to check and the key of the rule.
+        The result is computed once for all the jobs with the same queue, project, (first) job type and user.
+        """
+        # Only the first job type is considered
+        key = (job.queue_name, job.project, next(iter(job.types), "*"), job.user)
+        if key not in self.applicable_rules:
+            self.applicable_rules[key] = self.walk_rule_tree(*key)
+        return self.applicable_rules[key]
+
+    def walk_rule_tree(self, queue, project, job_type, user):
         """ """
         # Function that get the rule that should be applied to the current job in parameter.
         # Only one rule applies to the job, and the rule is found by looking at the rule tree
         # from top to bottom with the following priority:
         # '*' < '/' < $var
         # $var is any specified value for instance 'toto' for the user or 'besteffort' for the queue
-        (queue, project, job_types, user) = (
-            job.queue_name,
-            job.project,
-            job.types,
-            job.user,
-        )
 
         def get_item(d: dict, value: str):
             if value in d:
@@ -675,11 +746,9 @@ class Quotas(object):
         if key_queue:
             key_project = get_item(self.rule_tree[key_queue], project)
             if key_project:
-                for jtype in list(job_types) + Quotas.job_types:
-                    key_job_type = get_item(
-                        self.rule_tree[key_queue][key_project], jtype
-                    )
-                    break
+                key_job_type = get_item(
+                    self.rule_tree[key_queue][key_project], job_type
+                )
 
                 if key_job_type:
                     key_user = get_item(
@@ -704,43 +773,46 @@ class Quotas(object):
 
         return (rule, rule_counter, rule_key)
 
+    @staticmethod
+    def check_rule(
+        rule, rl_quotas, nb_resources: int, nb_jobs: int, resources_time: int
+    ) -> tuple[bool, str, str, int]:
+        rl_nb_resources, rl_nb_jobs, rl_resources_time = rule
+
+        # test quotas values plus job's ones
+        # 1) test nb_resources
+        if (rl_nb_resources > -1) and (rl_nb_resources < nb_resources):
+            return (
+                False,
+                "nb resources quotas failed",
+                rl_quotas,
+                rl_nb_resources,
+            )
+
+        # 2) test nb_jobs
+        if (rl_nb_jobs > -1) and (rl_nb_jobs < nb_jobs):
+            return (
+                False,
+                "nb jobs quotas failed",
+                rl_quotas,
+                rl_nb_jobs,
+            )
+        # 3) test resources_time (work)
+        if (rl_resources_time > -1) and (rl_resources_time < resources_time):
+            return (
+                False,
+                "resources hours quotas failed",
+                rl_quotas,
+                rl_resources_time,
+            )
+
+        return (True, "quotas ok", "", 0)
+
     def check(self, job) -> tuple[bool, str, str, int]:
         (rule, complete_key, rl_quotas) = self.find_applicable_rule(job)
-        print("on en est la", self.rule_tree, self.rules, rule, complete_key, rl_quotas)
-
-        if rule and complete_key in self.counters:
-            rl_nb_resources, rl_nb_jobs, rl_resources_time = rule
-            (key_queue, key_project, key_job_type, key_user) = complete_key
-
-            count = self.counters[key_queue, key_project, key_job_type, key_user]
-            nb_resources, nb_jobs, resources_time = count
-
-            # test quotas values plus job's ones
-            # 1) test nb_resources
-            if (rl_nb_resources > -1) and (rl_nb_resources < nb_resources):
-                return (
-                    False,
-                    "nb resources quotas failed",
-                    rl_quotas,
-                    rl_nb_resources,
-                )
 
-            # 2) test nb_jobs
-            if (rl_nb_jobs > -1) and (rl_nb_jobs < nb_jobs):
-                return (
-                    False,
-                    "nb jobs quotas failed",
-                    rl_quotas,
-                    rl_nb_jobs,
-                )
-            # 3) test resources_time (work)
-            if (rl_resources_time > -1) and (rl_resources_time < resources_time):
-                return (
-                    False,
-                    "resources hours quotas failed",
-                    rl_quotas,
-                    rl_resources_time,
-                )
+        if rule:
+            return Quotas.check_rule(rule, rl_quotas, *self.counter(complete_key))
 
         return (True, "quotas ok", "", 0)
 
@@ -753,20 +825,36 @@ class Quotas(object):
         job_nb_resources: int,
         duration: int,
     ):
-        # loop over slot_set
-        slots_quotas: dict[int, Quotas] = {}
+        """
+        Check that `job` can be added to the slots from `sid_left` to `sid_right` without exceeding
+        the quotas. For each set of rules, only the counter of the rule applying to the job is
+        combined along the slots (maximum of resources and jobs, sum of resources time).
+        """
+        nb_resources, duration = Quotas.job_usage(job, job_nb_resources, duration)
+        job_indices, _ = Quotas.job_counter_indices(job)
+
+        # quotas_rules_id -> [rule, rule key, counter index, nb resources, nb jobs, resources time]
+        slots_counters = {}
 
         sid = sid_left
         while True:
             slot = slots[sid]
 
-            if slot.quotas_rules_id not in slots_quotas:
-                slots_quotas[slot.quotas_rules_id] = Quotas(slots[sid].quotas.rules)
-
-            quotas = slots_quotas[slot.quotas_rules_id]
-
-            # slot.quotas.show_counters('check_slots_quotas, b e: ' + str(slot.b) + ' ' + str(slot.e))
-            quotas.combine(slot.quotas)
+            combined = slots_counters.get(slot.quotas_rules_id)
+            if combined is None:
+                (rule, complete_key, rl_quotas) = slot.quotas.find_applicable_rule(job)
+                index = Quotas.counter_indices.get(complete_key) if rule else None
+                combined = [rule, rl_quotas, index, 0, 0, 0]
+                slots_counters[slot.quotas_rules_id] = combined
+
+            index = combined[2]
+            if index is not None:
+                counters = slot.quotas.counters
+                i = 3 * index
+                if i < len(counters):
+                    combined[3] = max(combined[3], counters[i])
+                    combined[4] = max(combined[4], counters[i + 1])
+                    combined[5] += counters[i + 2]
 
             if sid == sid_right:
                 break
@@ -777,13 +865,29 @@ class Quotas(object):
                 ):
                     logger.debug("job on two different quotas periods")
 
-        for id, quotas in slots_quotas.items():
-            quotas.update(job, job_nb_resources, duration)
-            res = quotas.check(job)
+        res = (True, "quotas ok", "", 0)
+        for (
+            rule,
+            rl_quotas,
+            index,
+            nb_res,
+            nb_jobs,
+            resources_time,
+        ) in slots_counters.values():
+            if index is None:
+                continue
+            # add the job itself
+            nb = job_indices.count(index)
+            res = Quotas.check_rule(
+                rule,
+                rl_quotas,
+                nb_res + nb * nb_resources,
+                nb_jobs + nb,
+                resources_time + nb * nb_resources * duration,
+            )
             if not res[0]:
                 return res
 
-        # return last one that should be a success anyway
         return res
 
     def set_rules(self, rules_id):
@@ -0,0 +1,149 @@
+# coding: utf-8
+"""
+Profiling of a meta scheduling round.
+
+:class:`RoundProfiler` measures, for each phase of :func:`oar.kao.meta_sched.meta_schedule`,
+its duration, the number of SQL queries it sends and the number of rows they return or modify.
+When ``SCHEDULER_ROUND_PROFILE_FILE`` is set, one record per round is appended to this file as
+a JSON line, for example:
+
+.. code-block:: JSON
+
+    {"date": 1700000000, "duration": 0.214, "queries": 42, "rows": 1250,
+     "phases": {"gantt_init_with_running_jobs": {"duration": 0.05, "queries": 6, "rows": 320}, ...},
+     "queues": [{"queues": ["default"], "phases": {"get_data_jobs": {...}, ...}}, ...]}
+
+Phases of the scheduling of queues (``get_data_jobs``, ``sorting``, ``scheduling``,
+``save_assigns``...) are summed in ``phases`` and detailed by group of queues in ``queues``.
+The number of rows is the one reported by the database driver (``cursor.rowcount``), drivers
+which do not report it for ``SELECT`` queries (as sqlite) only count modified rows.
+
+The last records are served by the REST API (``GET /scheduler/rounds``).
+"""
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from oar.lib.globals import get_logger
+
+logger = get_logger("oar.kao.round_profiler")
+
+
+class RoundProfiler(object):
+    """
+    Collect the per phase timings and SQL statistics of a meta scheduling round.
+
+    A disabled profiler (the default when ``SCHEDULER_ROUND_PROFILE_FILE`` is not set) does not
+    listen to SQL queries and its phases cost nothing.
+    """
+
+    def __init__(self, config=None, enabled=None):
+        self.path = ""
+        if config is not None:
+            self.path = config.get("SCHEDULER_ROUND_PROFILE_FILE", "")
+        self.enabled = bool(self.path) if enabled is None else enabled
+        self.engine = None
+        self.queries = 0
+        self.rows = 0
+        self.start_time = None
+        self.record = None
+        self.queues = None
+
+    def _after_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        self.queries += 1
+        if cursor.rowcount > 0:
+            self.rows += cursor.rowcount
+
+    def start(self, session):
+        """Begin the round, SQL queries sent through the session's engine are counted."""
+        if not self.enabled:
+            return
+        if self.engine is not None:
+            # The previous round did not stop (it failed)
+            event.remove(
+                self.engine, "after_cursor_execute", self._after_cursor_execute
+            )
+        self.queries = 0
+        self.rows = 0
+        self.queues = None
+        self.record = {"date": int(time.time()), "phases": {}, "queues": []}
+        self.engine = session.get_bind().engine
+        event.listen(self.engine, "after_cursor_execute", self._after_cursor_execute)
+        self.start_time = time.time()
+
+    def stop(self):
+        """End the round, write its record if a file is configured and return it."""
+        if not self.enabled or self.record is None:
+            return None
+        self.record["duration"] = time.time() - self.start_time
+        self.record["queries"] = self.queries
+        self.record["rows"] = self.rows
+        event.remove(self.engine, "after_cursor_execute", self._after_cursor_execute)
+        self.engine = None
+
+        record = self.record
+        self.record = None
+        if self.path:
+            write_round_profile(self.path, record)
+        return record
+
+    def start_queue_group(self, queues):
+        """
+        Detail the next phases for the given group of queues (until the next group,
+        or None at the end of the scheduling of queues).
+        """
+        if not self.enabled or self.record is None:
+            return
+        if queues is None:
+            self.queues = None
+        else:
+            self.queues = {"queues": list(queues), "phases": {}}
+            self.record["queues"].append(self.queues)
+
+    @contextmanager
+    def phase(self, name):
+        """Measure the block as the phase `name`, a phase run several times is summed."""
+        if not self.enabled or self.record is None:
+            yield
+            return
+        queries = self.queries
+        rows = self.rows
+        start = time.time()
+        try:
+            yield
+        finally:
+            measure = (time.time() - start, self.queries - queries, self.rows - rows)
+            add_phase_measure(self.record["phases"], name, measure)
+            if self.queues is not None:
+                add_phase_measure(self.queues["phases"], name, measure)
+
+
+def add_phase_measure(phases, name, measure):
+    duration, queries, rows = measure
+    if name not in phases:
+        phases[name] = {"duration": 0.0, "queries": 0, "rows": 0}
+    phase = phases[name]
+    phase["duration"] += duration
+    phase["queries"] += queries
+    phase["rows"] += rows
+
+
+def write_round_profile(path, record):
+    """Append the record of a round as a JSON line."""
+    try:
+        with open(path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    except Exception as e:  # pragma: no cover - best effort, never break scheduling
+        logger.warning("could not write round profile to %s: %s", path, e)
+
+
+def read_round_profiles(path, limit=None):
+    """Return the `limit` last records of the round profile file (all if `limit` is None)."""
+    with open(path, "r") as f:
+        lines = deque(f, maxlen=limit)
+    return [json.loads(line) for line in lines if line.strip()]
@@ -10,9 +10,9 @@ from procset import ProcSet
 
 from oar.kao.helpers import job_scheduling_record, write_scheduling_timing_yaml
 from oar.kao.quotas import Quotas
-from oar.kao.slot import Slot, SlotSet, intersec_itvs_slots, intersec_ts_ph_itvs_slots
+from oar.kao.slot import Slot, SlotSet, WindowIntersection, enough_free_resources_slots
 from oar.lib.globals import get_logger, init_oar
-from oar.lib.hierarchy import find_resource_hierarchies_scattered
+from oar.lib.hierarchy import HierarchyLevel, find_resource_hierarchies_scattered
 from oar.lib.job_handling import ALLOW, JobPseudo
 from oar.lib.models import Job
 
@@ -23,6 +23,13 @@ config, db = init_oar(no_db=True)
 logger = get_logger("oar.kamelot", forward_stderr=True)
 
 
+def slot_set_class_of(slots_sets):
+    """Container slot sets use the same :class:`SlotSet` implementation as the default one."""
+    if "default" in slots_sets:
+        return type(slots_sets["default"])
+    return SlotSet
+
+
 def set_slots_with_prev_scheduled_jobs(
     slots_sets,
     jobs,
@@ -51,7 +58,7 @@ def set_slots_with_prev_scheduled_jobs(
                 logger.debug("container:" + ss_name)
 
                 if ss_name not in slots_sets:
-                    slots_sets[ss_name] = SlotSet((ProcSet(), 1))
+                    slots_sets[ss_name] = slot_set_class_of(slots_sets)((ProcSet(), 1))
 
                 if job.start_time < now:
                     start_time = now
@@ -118,6 +125,31 @@ def find_resource_hierarchies_job(itvs_slots, hy_res_rqts, hy):
     return result
 
 
+def min_nb_resources_job(job, hy_res_rqts, hy):
+    """
+    Return a lower bound of the number of resources of an allocation found by
+    :func:`find_resource_hierarchies_job` for the request `hy_res_rqts`, or 0 if it is unknown.
+
+    Blocks of levels built from resources (see :class:`oar.lib.hierarchy.HierarchyLevel`) are
+    disjoint, so at least the product of the numbers of requested blocks are needed.
+    Nothing is known with a specific find function or when the job can share resources
+    (the available resources are not only the slots' free ones).
+    """
+    if job.find or job.ts or (job.ph == ALLOW):
+        return 0
+
+    nb_min = 0
+    for hy_level_nbs, _ in hy_res_rqts:
+        nb = 1
+        for l_name, n in hy_level_nbs:
+            if not isinstance(hy[l_name], HierarchyLevel):
+                return 0
+            # ALL, BEST and HALF_BEST need at least one block
+            nb *= max(n, 1)
+        nb_min = max(nb_min, nb)
+    return nb_min
+
+
 def find_first_suitable_contiguous_slots_quotas(
     slots_set: SlotSet, job, res_rqt: Tuple[int, int, Any], hy, min_start_time: int
 ):
@@ -153,6 +185,13 @@ def find_first_suitable_contiguous_slots_quotas(
     else:
         sid_left = slots_set.slot_id_at(min_start_time)
 
+    # Time windows with not enough free resources are skipped without searching resources
+    nb_min_res = min_nb_resources_job(job, hy_res_rqts, hy)
+    # Intersection of the slots' resources maintained along the windows
+    window_itvs = WindowIntersection(
+        slots, job if (job.ts or (job.ph == ALLOW)) else None
+    )
+
     sid_right = sid_left
     for slot_begin, slot_end in slots_set.traverse_with_width(
         walltime, start_id=sid_left
@@ -179,10 +218,12 @@ def find_first_suitable_contiguous_slots_quotas(
                     slot_end, quotas_rules_id, remaining_duration
                 )
 
-        if job.ts or (job.ph == ALLOW):
-            itvs_avail = intersec_ts_ph_itvs_slots(slots, sid_left, sid_right, job)
-        else:
-            itvs_avail = intersec_itvs_slots(slots, sid_left, sid_right)
+        if nb_min_res and not enough_free_resources_slots(
+            slots, sid_left, sid_right, nb_min_res
+        ):
+            continue
+
+        itvs_avail = window_itvs.itvs(sid_left, sid_right)
 
         if job.find:
             beginning_slotset = (
@@ -261,6 +302,13 @@ def find_first_suitable_contiguous_slots_no_quotas(
     else:
         sid_left = slots_set.slot_id_at(min_start_time)
 
+    # Time windows with not enough free resources are skipped without searching resources
+    nb_min_res = min_nb_resources_job(job, hy_res_rqts, hy)
+    # Intersection of the slots' resources maintained along the windows
+    window_itvs = WindowIntersection(
+        slots, job if (job.ts or (job.ph == ALLOW)) else None
+    )
+
     sid_right = sid_left
     for slot_begin, slot_end in slots_set.traverse_with_width(
         walltime, start_id=sid_left
@@ -268,12 +316,12 @@ def find_first_suitable_contiguous_slots_no_quotas(
         sid_left = slot_begin.id
         sid_right = slot_end.id
 
-        if job.ts or (job.ph == ALLOW):
-            itvs_avail = intersec_ts_ph_itvs_slots(
-                slots, slot_begin.id, slot_end.id, job
-            )
-        else:
-            itvs_avail = intersec_itvs_slots(slots, slot_begin.id, slot_end.id)
+        if nb_min_res and not enough_free_resources_slots(
+            slots, sid_left, sid_right, nb_min_res
+        ):
+            continue
+
+        itvs_avail = window_itvs.itvs(sid_left, sid_right)
 
         if job.find:
             itvs = job.find_func(
@@ -529,7 +577,7 @@ def schedule_id_jobs_ct(slots_sets, jobs, hy, id_jobs, job_security_time):
                         job.start_time + job.walltime - job_security_time,
                     )
                     # slot.show()
-                    slots_sets[ss_name] = SlotSet(slot)
+                    slots_sets[ss_name] = slot_set_class_of(slots_sets)(slot)
 
         if job_sched_start:
             elapsed_ms = (time.perf_counter() - job_sched_start) * 1000
@@ -4,6 +4,7 @@ This module contains the base scheduling structures :class:`SlotSet` and :class:
 """
 
 import copy
+from bisect import bisect_left, bisect_right
 from typing import Dict, Generator, List, Optional, Tuple
 
 from procset import ProcSet
@@ -11,6 +12,7 @@ from rich import box, print
 from rich.table import Table
 
 from oar.kao.quotas import Quotas
+from oar.lib.exceptions import InvalidConfiguration
 from oar.lib.job_handling import ALLOW, NO_PLACEHOLDER, PLACEHOLDER
 from oar.lib.models import Job
 from oar.lib.utils import dict_ps_copy
@@ -69,6 +71,8 @@ class Slot(object):
             self.itvs = itvs
         else:
             self.itvs = ProcSet(*itvs)
+        # number of free resources, maintained along with itvs
+        self.nb_free = len(self.itvs)
         self.b = b
         self.e = e
         # timesharing ts_itvs: [user] * [job_name] * itvs
@@ -148,6 +152,57 @@ def intersec_itvs_slots(
     return itvs_acc
 
 
+def enough_free_resources_slots(
+    slots: Dict[int, Slot], sid_left: int, sid_right: int, nb_resources: int
+) -> bool:
+    """
+    Return `False` if one of the slots from `sid_left` to `sid_right` has less than `nb_resources`
+    free resources, and then their intersection (see :func:`intersec_itvs_slots`) too.
+    Only the slots' counters of free resources are compared, no :class:`ProcSet` operation is done.
+
+    Examples:
+        >>> s1 = Slot(1, 0, 2, ProcSet(*[(1, 32)]), 1, 10)
+        >>> s2 = Slot(2, 1, 0, ProcSet(*[(1, 8)]), 11, 20)
+        >>> slots = {1: s1, 2: s2}
+        >>> enough_free_resources_slots(slots, 1, 2, 16)
+            False
+    """
+    sid = sid_left
+    while True:
+        slot = slots[sid]
+        if slot.nb_free < nb_resources:
+            return False
+        if sid == sid_right:
+            return True
+        sid = slot.next
+
+
+def ts_ph_itvs_slot(slot: Slot, job: Job) -> ProcSet:
+    """
+    Return the resources of `slot` available for `job`: the free ones and, depending on the `job`
+    configuration, the ones it can share with other jobs (time sharing or placeholder, see :class:`Slot`).
+    """
+    itvs = slot.itvs
+
+    if job.ts:
+        if "*" in slot.ts_itvs:  # slot.ts_itvs[user][name]
+            if "*" in slot.ts_itvs["*"]:
+                itvs = itvs | slot.ts_itvs["*"]["*"]
+            elif job.name in slot.ts_itvs["*"]:
+                itvs = itvs | slot.ts_itvs["*"][job.name]
+        elif job.user in slot.ts_itvs:
+            if "*" in slot.ts_itvs[job.user]:
+                itvs = itvs | slot.ts_itvs[job.user]["*"]
+            elif job.name in slot.ts_itvs[job.user]:
+                itvs = itvs | slot.ts_itvs[job.user][job.name]
+
+    if job.ph == ALLOW:
+        if job.ph_name in slot.ph_itvs:
+            itvs = itvs | slot.ph_itvs[job.ph_name]
+
+    return itvs
+
+
 def intersec_ts_ph_itvs_slots(
     slots: Dict[int, Slot], sid_left: int, sid_right: int, job: Job
 ) -> ProcSet:
@@ -156,37 +211,104 @@ def intersec_ts_ph_itvs_slots(
     More precisely, if `job.ts` is `True`, it gathers resources from slot `sid_left` to `sid_right` depending on the slot time sharing configuration (see :class:`Slot`).
     """
     sid = sid_left
-    itvs_acc: ProcSet = ProcSet()
-    while True:
-        slot = slots[sid]
-        itvs = slot.itvs
+    itvs_acc = ts_ph_itvs_slot(slots[sid], job)
 
-        if job.ts:
-            if "*" in slot.ts_itvs:  # slot.ts_itvs[user][name]
-                if "*" in slot.ts_itvs["*"]:
-                    itvs = itvs | slot.ts_itvs["*"]["*"]
-                elif job.name in slot.ts_itvs["*"]:
-                    itvs = itvs | slot.ts_itvs["*"][job.name]
-            elif job.user in slot.ts_itvs:
-                if "*" in slot.ts_itvs[job.user]:
-                    itvs = itvs | slot.ts_itvs[job.user]["*"]
-                elif job.name in slot.ts_itvs[job.user]:
-                    itvs = itvs | slot.ts_itvs[job.user][job.name]
+    while sid != sid_right:
+        sid = slots[sid].next
+        itvs_acc = itvs_acc & ts_ph_itvs_slot(slots[sid], job)
 
-        if job.ph == ALLOW:
-            if job.ph_name in slot.ph_itvs:
-                itvs = itvs | slot.ph_itvs[job.ph_name]
+    return itvs_acc
 
-        if not itvs_acc:
-            itvs_acc = itvs
+
+class WindowIntersection(object):
+    """
+    Intersection of the resources of the slots of a time window sliding forward, as the windows
+    yielded by :meth:`SlotSet.traverse_with_width`.
+
+    The window is kept as a queue made of two stacks holding partial intersections: the back stack
+    holds the intersection of its slots, the front one, for each slot, the intersection from this slot
+    to the end of the front stack. Advancing the window costs (amortized) a constant number of
+    :class:`ProcSet` intersections instead of one per slot of the window.
+
+    :param dict slots: Dict containing the :class:`Slot` indexed by id.
+    :param job: \
+        If given, resources which can be shared by the `job` are also considered (see :func:`ts_ph_itvs_slot`).
+    """
+
+    def __init__(self, slots: Dict[int, Slot], job: Optional[Job] = None):
+        self.slots = slots
+        self.job = job
+        # [(sid, intersection from sid to the end of front)], the last is the leftmost slot
+        self.front: List[Tuple[int, ProcSet]] = []
+        self.back: List[int] = []
+        self.back_itvs = ProcSet()
+        self.sid_right = 0
+
+    def slot_itvs(self, sid: int) -> ProcSet:
+        if self.job is None:
+            return self.slots[sid].itvs
+        return ts_ph_itvs_slot(self.slots[sid], self.job)
+
+    def reset(self, sid: int):
+        self.front = []
+        self.back = [sid]
+        self.back_itvs = self.slot_itvs(sid)
+        self.sid_right = sid
+
+    def push(self, sid: int):
+        if self.back:
+            self.back_itvs = self.back_itvs & self.slot_itvs(sid)
         else:
-            itvs_acc = itvs_acc & itvs
+            self.back_itvs = self.slot_itvs(sid)
+        self.back.append(sid)
+        self.sid_right = sid
+
+    def pop(self):
+        if not self.front:
+            # Move back stack to front stack, computing the intersections from the right
+            itvs_acc = None
+            for sid in reversed(self.back):
+                itvs = self.slot_itvs(sid)
+                itvs_acc = itvs if itvs_acc is None else itvs & itvs_acc
+                self.front.append((sid, itvs_acc))
+            self.back = []
+            self.back_itvs = ProcSet()
+        self.front.pop()
+
+    def sid_left(self) -> int:
+        if self.front:
+            return self.front[-1][0]
+        return self.back[0]
+
+    def itvs(self, sid_left: int, sid_right: int) -> ProcSet:
+        """
+        Return the intersection of resources of the slots from `sid_left` to `sid_right`,
+        (see :func:`intersec_itvs_slots` and :func:`intersec_ts_ph_itvs_slots`).
+        The window is moved from the previous one, or rebuilt if it does not move forward.
+        """
+        slots = self.slots
+        b_left = slots[sid_left].b
+
+        if (
+            (self.sid_right == 0)
+            or (b_left > slots[self.sid_right].b)
+            or (slots[sid_right].b < slots[self.sid_right].b)
+            or (b_left < slots[self.sid_left()].b)
+        ):
+            self.reset(sid_left)
 
-        if sid == sid_right:
-            break
-        sid = slots[sid].next
+        while self.sid_right != sid_right:
+            self.push(slots[self.sid_right].next)
 
-    return itvs_acc
+        while slots[self.sid_left()].b < b_left:
+            self.pop()
+
+        if self.front and self.back:
+            return self.front[-1][1] & self.back_itvs
+        elif self.front:
+            return self.front[-1][1]
+        else:
+            return self.back_itvs
 
 
 class SlotSet:
@@ -243,6 +365,8 @@ class SlotSet:
             self.begin = slots.b
             self.end = slots.e
 
+        self.build_index()
+
         # cache the last sid_left given for by walltime => not used
         # cache the last sid_left given for same previous job
         #  (same requested resources w/ constraintes)
@@ -319,6 +443,77 @@ class SlotSet:
     def show_slots(self):
         print("%s" % self)
 
+    def build_index(self):
+        """Hook called once the initial slots are set, before any split.
+        The linked :class:`SlotSet` does not maintain any index.
+        """
+        pass
+
+    def copy(self) -> "SlotSet":
+        """Return a copy of the slot set which can be modified (by scheduling)
+        without altering this one.
+
+        :return SlotSet: a slot set of the same class with copied slots.
+        """
+        slot_set = self.__class__.__new__(self.__class__)
+        slot_set.slots = {}
+        for sid, slot in self.slots.items():
+            slot_copy = Slot(
+                sid,
+                slot.prev,
+                slot.next,
+                slot.itvs,
+                slot.b,
+                slot.e,
+                dict_ps_copy(slot.ts_itvs),
+                dict_ps_copy(slot.ph_itvs),
+            )
+            if hasattr(slot, "quotas"):
+                slot_copy.quotas = Quotas(slot.quotas.rules)
+                slot_copy.quotas.deepcopy_from(slot.quotas)
+                slot_copy.quotas_rules_id = slot.quotas_rules_id
+            slot_set.slots[sid] = slot_copy
+
+        slot_set.last_id = self.last_id
+        slot_set.begin = self.begin
+        slot_set.end = self.end
+        slot_set.cache = {}
+        slot_set.build_index()
+        return slot_set
+
+    def trim_before(self, date: int):
+        """Drop the part of the slot set which is before `date`, the slot set begins at `date` afterward.
+        Slots are renumbered in time order, the first slot having identifier one.
+
+        :param int date: new beginning of the slot set
+        """
+        if date <= self.begin:
+            return
+        assert date <= self.end
+
+        slot = self.first()
+        while slot.e < date:
+            slot = self.slots[slot.next]
+        slot.b = date
+
+        ordered_slots = [slot]
+        while slot.next != 0:
+            slot = self.slots[slot.next]
+            ordered_slots.append(slot)
+
+        nb_slots = len(ordered_slots)
+        self.slots = {}
+        for sid, slot in enumerate(ordered_slots, start=1):
+            slot.id = sid
+            slot.prev = sid - 1
+            slot.next = sid + 1 if sid < nb_slots else 0
+            self.slots[sid] = slot
+
+        self.last_id = nb_slots
+        self.begin = date
+        self.cache = {}
+        self.build_index()
+
     def new_id(self) -> int:
         """Get a new Id for constructing new slots.
 
@@ -586,6 +781,7 @@ class SlotSet:
         slot_to = self.slots[id_slot_to]
 
         slot_to.itvs = copy.copy(slot_from.itvs)
+        slot_to.nb_free = slot_from.nb_free
         slot_to.ts_itvs = dict_ps_copy(slot_from.ts_itvs)
         slot_to.ph_itvs = dict_ps_copy(slot_from.ph_itvs)
 
@@ -597,6 +793,7 @@ class SlotSet:
     # Transform given slot to B slot (substract job resources)
     def sub_slot_during_job(self, slot: Slot, job: Job):
         slot.itvs = slot.itvs - job.res_set
+        slot.nb_free = len(slot.itvs)
         if job.ts:
             if job.ts_user not in slot.ts_itvs:
                 slot.ts_itvs[job.ts_user] = {}
@@ -619,6 +816,7 @@ class SlotSet:
     def add_slot_during_job(self, slot: Slot, job: Job):
         if (not job.ts) and (job.ph == NO_PLACEHOLDER):
             slot.itvs = slot.itvs | job.res_set
+            slot.nb_free = len(slot.itvs)
         if job.ts:
             if job.ts_user not in slot.ts_itvs:
                 slot.ts_itvs[job.ts_user] = {}
@@ -724,3 +922,108 @@ class SlotSet:
 
                 # for next iteration
                 slot = b_slot
+
+
+class ArraySlotSet(SlotSet):
+    """
+    :class:`SlotSet` variant which keeps, beside the linked slots, the slots ids and their
+    begin times in two time-ordered arrays.
+
+    Slots are contiguous and their begin times are strictly increasing, so locating the slot
+    at a given date is a bisection on the begin times instead of a walk through the linked list.
+    :meth:`first` and :meth:`last` are constant time. The linked structure (``prev``/``next``) is
+    still maintained, so the slots can be used by all the functions working on :class:`SlotSet`.
+
+    It is selected with ``SCHEDULER_SLOTSET_ENGINE="array"`` in oar.conf (see :func:`get_slot_set_class`).
+    """
+
+    def build_index(self):
+        """Build the time-ordered arrays of slot ids and begin times from the linked slots."""
+        self.sids: List[int] = []
+        self.begins: List[int] = []
+
+        slot = [s for s in self.slots.values() if s.prev == 0][0]
+        while True:
+            self.sids.append(slot.id)
+            self.begins.append(slot.b)
+            if slot.next == 0:
+                break
+            slot = self.slots[slot.next]
+
+    def index_of(self, slot: Slot) -> int:
+        """Return the position of `slot` in the time-ordered arrays."""
+        return bisect_left(self.begins, slot.b)
+
+    def first(self) -> Optional[Slot]:
+        if self.sids:
+            return self.slots[self.sids[0]]
+
+    def last(self) -> Optional[Slot]:
+        if self.sids:
+            return self.slots[self.sids[-1]]
+
+    def slot_id_at(self, date: int, starting_id=0) -> int:
+        assert starting_id == 0 or starting_id in self.slots
+
+        if starting_id != 0 and self.slots[starting_id].b > date:
+            return 0
+
+        i = bisect_right(self.begins, date) - 1
+        if i < 0:
+            return 0
+
+        slot = self.slots[self.sids[i]]
+        if slot.e < date:
+            return 0
+
+        return slot.id
+
+    def split_at_before(self, slot_id: int, insertion_date: int) -> Tuple[int, int]:
+        i = self.index_of(self.slots[slot_id])
+        (new_id, sid) = super().split_at_before(slot_id, insertion_date)
+        if new_id != sid:
+            # The new slot takes the place of the splitted one which is shifted after it
+            self.sids.insert(i, new_id)
+            self.begins.insert(i + 1, self.slots[sid].b)
+        return (new_id, sid)
+
+    def split_at_after(self, slot_id: int, insertion_date: int) -> Tuple[int, int]:
+        i = self.index_of(self.slots[slot_id])
+        (sid, new_id) = super().split_at_after(slot_id, insertion_date)
+        if new_id != sid:
+            self.sids.insert(i + 1, new_id)
+            self.begins.insert(i + 1, self.slots[new_id].b)
+        return (sid, new_id)
+
+    def get_encompassing_range(self, start: int, end: int) -> Tuple[int, int]:
+        assert start <= end
+        return (self.slot_id_at(start), self.slot_id_at(end))
+
+    def get_encompassing_slots(
+        self, t_begin: int, t_end: int, first_id=None
+    ) -> Tuple[int, int]:
+        i_first = self.index_of(self.slots[first_id]) if first_id else 0
+        i_last = len(self.sids) - 1
+
+        i_left = max(i_first, bisect_right(self.begins, t_begin) - 1)
+        i_right = min(max(i_left, bisect_right(self.begins, t_end) - 1), i_last)
+
+        return (self.sids[i_left], self.sids[i_right])
+
+
+SLOTSET_ENGINES = {"linked": SlotSet, "array": ArraySlotSet}
+
+
+def get_slot_set_class(config) -> type:
+    """
+    Return the :class:`SlotSet` implementation selected by ``SCHEDULER_SLOTSET_ENGINE``
+    in oar.conf: ``linked`` (default) or ``array`` (:class:`ArraySlotSet`).
+    """
+    engine = config.get("SCHEDULER_SLOTSET_ENGINE", "linked")
+    if engine not in SLOTSET_ENGINES:
+        raise InvalidConfiguration(
+            "unknown SCHEDULER_SLOTSET_ENGINE: {} (expected one of: {})".format(
+                engine, ", ".join(SLOTSET_ENGINES)
+            )
+        )
+    return SLOTSET_ENGINES[engine]
@@ -1,11 +1,13 @@
 # -*- coding: utf-8 -*-
-from typing import Any
+from typing import Any, Dict, Iterator, Tuple
 
-from sqlalchemy import func, or_, text
+from sqlalchemy import delete, func, insert, literal, or_, select, text
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
 from oar.lib.models import (
     Accounting,
+    AccountingUsage,
     AssignedResource,
     Job,
     MoldableJobDescription,
@@ -16,6 +18,9 @@ from oar.lib.models import (
 # get_sum_accounting_for_param() -> see Karma.py
 # get_sum_accounting_window() -> see Karma.py
 
+# Number of jobs marked as accounted by one statement
+ACCOUNTED_JOBS_CHUNK_SIZE = 10000
+
 
 def get_accounting_summary(
     session: Session,
@@ -120,6 +125,26 @@ def update_accounting(
     """Insert accounting data in table accounting
     # params : start date in second, stop date in second, window size, user, queue, type(ASKED or USED)
     """
+    for window_start, window_stop, consumption in accounting_windows(
+        start_time, stop_time, window_size, nb_resources
+    ):
+        add_accounting_row(
+            session,
+            window_start,
+            window_stop,
+            user,
+            project,
+            queue_name,
+            c_type,
+            consumption,
+        )
+
+
+def accounting_windows(
+    start_time: int, stop_time: int, window_size: int, nb_resources: int
+) -> Iterator[Tuple[int, int, int]]:
+    """Split the consumption of nb_resources between start_time and stop_time
+    by accounting window, yield (window_start, window_stop, consumption)."""
     nb_windows = int(start_time / window_size)
     window_start = nb_windows * window_size
     window_stop = window_start + window_size - 1
@@ -132,20 +157,82 @@ def update_accounting(
         else:
             consumption = window_stop - start_time + 1
 
-        consumption = consumption * nb_resources
-        add_accounting_row(
-            session,
+        yield window_start, window_stop, consumption * nb_resources
+        window_start = window_stop + 1
+        start_time = window_start
+        window_stop += window_size
+
+
+def add_accounting_consumptions(
+    consumptions: Dict[Tuple[int, int, str, str, str, str], int],
+    start_time: int,
+    stop_time: int,
+    window_size: int,
+    user: str,
+    project: str,
+    queue_name: str,
+    c_type: str,
+    nb_resources: int,
+):
+    """Same as update_accounting but sum the consumptions in memory, in
+    consumptions indexed by (window_start, window_stop, user, project, queue_name, c_type).
+    """
+    for window_start, window_stop, consumption in accounting_windows(
+        start_time, stop_time, window_size, nb_resources
+    ):
+        key = (window_start, window_stop, user, project, queue_name, c_type)
+        consumptions[key] = consumptions.get(key, 0) + consumption
+
+
+def add_accounting_rows(
+    session: Session, consumptions: Dict[Tuple[int, int, str, str, str, str], int]
+):
+    """Add the consumptions to the accounting windows, creating the missing ones.
+
+    On PostgreSQL and SQLite the windows are written with a single
+    ``INSERT ... ON CONFLICT DO UPDATE`` statement, otherwise row by row with add_accounting_row.
+    """
+    if not consumptions:
+        return
+
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        insert = postgresql.insert
+    elif dialect == "sqlite":
+        insert = sqlite.insert
+    else:
+        for key, consumption in consumptions.items():
+            add_accounting_row(session, *key, consumption)
+        return
+
+    rows = [
+        {
+            "window_start": window_start,
+            "window_stop": window_stop,
+            "accounting_user": user,
+            "accounting_project": project,
+            "queue_name": queue_name,
+            "consumption_type": c_type,
+            "consumption": consumption,
+        }
+        for (
             window_start,
             window_stop,
             user,
             project,
             queue_name,
             c_type,
-            consumption,
-        )
-        window_start = window_stop + 1
-        start_time = window_start
-        window_stop += window_size
+        ), consumption in consumptions.items()
+    ]
+
+    table = Accounting.__table__
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[c.name for c in table.primary_key.columns],
+        set_={"consumption": table.c.consumption + stmt.excluded.consumption},
+    )
+    # Executed with many parameters sets, the statement is compiled once
+    session.execute(stmt, rows)
 
 
 def add_accounting_row(
@@ -269,6 +356,8 @@ def check_accounting_update(session: Session, window_size: int):
         .all()
     )
 
+    consumptions = {}
+    job_ids = []
     for job_accounting_info in result:
         (
             start_time,
@@ -281,9 +370,9 @@ def check_accounting_update(session: Session, window_size: int):
             project,
         ) = job_accounting_info
         max_stop_time = start_time + walltime
-        print("[ACCOUNTING] Treate job " + str(job_id))
-        update_accounting(
-            session,
+        job_ids.append(job_id)
+        add_accounting_consumptions(
+            consumptions,
             start_time,
             stop_time,
             window_size,
@@ -293,8 +382,8 @@ def check_accounting_update(session: Session, window_size: int):
             "USED",
             nb_resources,
         )
-        update_accounting(
-            session,
+        add_accounting_consumptions(
+            consumptions,
             start_time,
             max_stop_time,
             window_size,
@@ -305,9 +394,19 @@ def check_accounting_update(session: Session, window_size: int):
             nb_resources,
         )
 
-        session.query(Job).filter(Job.accounted == "NO").update(
-            {Job.accounted: "YES"}, synchronize_session=False
-        )
+    print(
+        "[ACCOUNTING] Treate "
+        + str(len(job_ids))
+        + " jobs, update "
+        + str(len(consumptions))
+        + " windows"
+    )
+    add_accounting_rows(session, consumptions)
+
+    for i in range(0, len(job_ids), ACCOUNTED_JOBS_CHUNK_SIZE):
+        session.query(Job).filter(
+            Job.id.in_(job_ids[i : i + ACCOUNTED_JOBS_CHUNK_SIZE])
+        ).update({Job.accounted: "YES"}, synchronize_session=False)
 
     session.commit()
 
@@ -329,6 +428,64 @@ def delete_accounting_windows_before(session: Session, window_stop: int):
     session.commit()
 
 
+def accounting_usage_range(
+    now: int, fairsharing_window_size: int, window_size: int, inclusive: bool = False
+) -> Tuple[int, int]:
+    """Return the start of the first and the stop of the last accounting windows
+    (of window_size seconds) which are in the fairsharing window before now:
+    window_start >= now - fairsharing_window_size and window_stop < now (<= now if inclusive).
+    """
+    first_window_start = (
+        -(-(now - fairsharing_window_size) // window_size) * window_size
+    )
+    last_window_stop = ((now + int(inclusive)) // window_size) * window_size - 1
+    return int(first_window_start), int(last_window_stop)
+
+
+def update_accounting_usage(
+    session: Session, now: int, fairsharing_window_size: int, window_size: int
+):
+    """Sum, by queue, user, project and type, the accounting windows in the fairsharing
+    window before now into the accounting_usage table. The karma then reads these sums
+    instead of aggregating the accounting windows at each scheduling round
+    (see SCHEDULER_FAIRSHARING_USAGE_SUMMARY)."""
+    window_start, window_stop = accounting_usage_range(
+        now, fairsharing_window_size, window_size
+    )
+    session.execute(delete(AccountingUsage))
+    session.execute(
+        insert(AccountingUsage).from_select(
+            [
+                "window_start",
+                "window_stop",
+                "accounting_user",
+                "accounting_project",
+                "queue_name",
+                "consumption_type",
+                "consumption",
+            ],
+            select(
+                literal(window_start),
+                literal(window_stop),
+                Accounting.user,
+                Accounting.project,
+                Accounting.queue_name,
+                Accounting.consumption_type,
+                func.sum(Accounting.consumption),
+            )
+            .where(Accounting.window_start >= window_start)
+            .where(Accounting.window_stop <= window_stop)
+            .group_by(
+                Accounting.user,
+                Accounting.project,
+                Accounting.queue_name,
+                Accounting.consumption_type,
+            ),
+        )
+    )
+    session.commit()
+
+
 def get_last_project_karma(session: Session, user: str, project: str, date: int):
     """Get the last project Karma of user at a given date
     params: user, project, date"""
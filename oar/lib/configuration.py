@@ -32,8 +32,11 @@ class Configuration(dict):
         "APPENDICE_SERVER_PORT": "6670",
         "BIPBIP_COMMANDER_SERVER": "localhost",
         "BIPBIP_COMMANDER_PORT": "6671",
+        "BIPBIP_LAUNCH_POOL_SIZE": "0",
+        "BIPBIP_COMMANDER_WORKERS": "0",
         "LEON_SOFT_WALLTIME": 20,
         "LEON_WALLTIME": 300,
+        "SARKO_SWEEP": "no",
         "TIMEOUT_SSH": 120,
         "SERVER_PROLOGUE_EPILOGUE_TIMEOUT": 60,
         "SERVER_PROLOGUE_EXEC_FILE": None,
@@ -62,18 +65,30 @@ class Configuration(dict):
         "DEPLOY_HOSTNAME": "127.0.0.1",
         "OPENSSH_CMD": "/usr/bin/ssh -p 6667",
         "OAREXEC_DEBUG_MODE": "1",
+        "PINGCHECKER_STREAMING": "no",
+        "PINGCHECKER_SHARD_SIZE": "500",
         "GRETA_SERVER": "localhost",
         "GRETA_PORT": 6672,
         # kao
         "METASCHEDULER_MODE": "internal",
         # Tell the metascheduler that it runs into an oar2 installation.
         "METASCHEDULER_OAR3_WITH_OAR2": "no",
+        "METASCHEDULER_RESIDENT": "no",
+        "METASCHEDULER_SERVER": "localhost",
+        "METASCHEDULER_PORT": "6673",
+        "METASCHEDULER_TIMEOUT": "600",
         "HIERARCHY_LABELS": "resource_id,network_address",
         "MAX_JOB_PER_QUEUES_GROUP_SCHEDULING_ROUND": "1000",
         "SCHEDULER_RESOURCE_ORDER": "resource_id ASC",
         "SCHEDULER_JOB_SECURITY_TIME": "60",  # TODO should be int
         "SCHEDULER_LOG_JOB_SCHEDULING_TIME": "no",
         "SCHEDULER_JOB_SCHEDULING_TIME_YAML": "",
+        "SCHEDULER_ROUND_PROFILE_FILE": "",
+        "SCHEDULER_SLOTSET_ENGINE": "linked",
+        "SCHEDULER_GANTT_FULL_REBUILD_ROUNDS": "100",
+        "SCHEDULER_HIERARCHY_BITSET": "no",
+        "SCHEDULER_SAVE_ASSIGNS_BULK": "no",
+        "SCHEDULER_GANTT_WRITE_DIFF": "no",
         "SCHEDULER_AVAILABLE_SUSPENDED_RESOURCE_TYPE": "default",
         "FAIRSHARING_ENABLED": "no",
         "SCHEDULER_FAIRSHARING_MAX_JOB_PER_USER": "30",
@@ -92,6 +107,7 @@ class Configuration(dict):
         "WALLTIME_CHANGE_APPLY_TIME": 0.0,
         "WALLTIME_INCREMENT": 0.0,
         "SCHEDULER_FAIRSHARING_WINDOW_SIZE": 3600 * 30 * 24,
+        "SCHEDULER_FAIRSHARING_USAGE_SUMMARY": "no",
         "SCHEDULER_FAIRSHARING_PROJECT_TARGETS": "{default => 21.0}",
         "SCHEDULER_FAIRSHARING_USER_TARGETS": "{default => 22.0}",
         "SCHEDULER_FAIRSHARING_COEF_PROJECT": "0",
@@ -127,6 +143,8 @@ class Configuration(dict):
         "ENERGY_SAVING_NODE_MANAGER_WAKEUP_TIMEOUT": 900,
         "ENERGY_MAX_CYCLES_UNTIL_REFRESH": 5000,
         "ENERGY_SAVING_NODES_KEEPALIVE": "type='default':0",
+        "ENERGY_SAVING_COMMAND_BATCH_SIZE": 0,
+        "ENERGY_SAVING_WAKEUP_RATE": 0,
     }
 
     def __init__(self, defaults=None):
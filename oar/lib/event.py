@@ -1,6 +1,6 @@
 # coding: utf-8
 
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from sqlalchemy import desc, func
 from sqlalchemy.orm import Session
@@ -24,6 +24,27 @@ def add_new_event(
     session.commit()
 
 
+def add_new_events(session: Session, events: List[Tuple[str, int, str]]):
+    """Add new entries (type, job id, description) in event_log table at once"""
+    if not events:
+        return
+    date = tools.get_date(session)
+    session.execute(
+        EventLog.__table__.insert(),
+        [
+            {
+                "type": ev_type,
+                "job_id": job_id,
+                "date": date,
+                "description": description[:255],
+                "to_check": "YES",
+            }
+            for (ev_type, job_id, description) in events
+        ],
+    )
+    session.commit()
+
+
 def add_new_event_with_host(
     session: Session, ev_type: str, job_id: int, description: str, hostnames: List[str]
 ):
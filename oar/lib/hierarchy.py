@@ -11,18 +11,104 @@ from typing import List
 from procset import ProcSet
 
 
+def procset_to_bits(itvs: ProcSet) -> int:
+    """
+    Return the bitmap of `itvs`: the bit `i` is set if `i` is in `itvs`.
+
+    Examples:
+        >>> bin(procset_to_bits(ProcSet((1, 3), 6)))
+            '0b1001110'
+    """
+    bits = 0
+    for itv in itvs.intervals():
+        bits |= ((1 << (itv.sup - itv.inf + 1)) - 1) << itv.inf
+    return bits
+
+
+def bits_to_procset(bits: int) -> ProcSet:
+    """
+    Return the :class:`ProcSet` of the bits set in `bits` (see :func:`procset_to_bits`).
+
+    Examples:
+        >>> bits_to_procset(0b1001110)
+            ProcSet((1, 3), 6)
+    """
+    intervals = []
+    while bits:
+        inf = (bits & -bits).bit_length() - 1
+        shifted = bits >> inf
+        # number of consecutive set bits from inf
+        length = (~shifted & (shifted + 1)).bit_length() - 1
+        intervals.append((inf, inf + length - 1))
+        bits ^= ((1 << length) - 1) << inf
+    return ProcSet(*intervals)
+
+
+class HierarchyLevel(list):
+    """
+    List of the :class:`ProcSet` blocks of a hierarchy level.
+
+    It also holds, for the other levels of the hierarchy, the indices of the blocks intersecting
+    each of its blocks (`children`, see :func:`index_hierarchy`), and optionally its blocks as
+    bitmaps of resources (`masks`, see :func:`procset_to_bits`).
+    When all the requested levels are :class:`HierarchyLevel`,
+    :func:`find_resource_hierarchies_scattered` uses them instead of scanning the levels.
+    """
+
+    def __init__(self, blocks, label=None, bitset=False):
+        super().__init__(blocks)
+        self.label = label
+        # label of an other level -> for each block, indices of the intersecting blocks
+        self.children = {}
+        self.masks = [procset_to_bits(block) for block in self] if bitset else None
+
+    def children_ids(self, i, sub_level):
+        """Return the indices of the blocks of `sub_level` intersecting the block `i`."""
+        children = self.children.get(sub_level.label)
+        if children is not None:
+            return children[i]
+        block = self[i]
+        return [j for j, sub in enumerate(sub_level) if not block.isdisjoint(sub)]
+
+
+def index_hierarchy(hy):
+    """
+    Index, for each pair of levels of the hierarchy `hy` (a dict of :class:`HierarchyLevel`), the
+    blocks of a level intersecting each block of the other one.
+    Each resource must belong to only one block of a level (as levels built from resources' labels).
+    """
+    roids = {}
+    owners = {}
+    for label, level in hy.items():
+        roids[label] = [list(block) for block in level]
+        owner = {}
+        for j, block_roids in enumerate(roids[label]):
+            for roid in block_roids:
+                owner[roid] = j
+        owners[label] = owner
+
+    for label, level in hy.items():
+        for sub_label, owner in owners.items():
+            if sub_label != label:
+                level.children[sub_label] = [
+                    sorted({owner[roid] for roid in block_roids if roid in owner})
+                    for block_roids in roids[label]
+                ]
+
+
 class Hierarchy(object):
     # TODO extract hierarchy from ressources table
 
-    def __init__(
-        self,
-        hy=None,
-        hy_rid=None,
-    ):
+    def __init__(self, hy=None, hy_rid=None, bitset=False):
         if hy_rid:
             self.hy = {}
             for hy_label, hy_level_roids in hy_rid.items():
-                self.hy[hy_label] = [ProcSet(*ids) for k, ids in hy_level_roids.items()]
+                self.hy[hy_label] = HierarchyLevel(
+                    [ProcSet(*ids) for k, ids in hy_level_roids.items()],
+                    hy_label,
+                    bitset,
+                )
+            index_hierarchy(self.hy)
         else:
             if hy:
                 self.hy = hy
@@ -207,6 +293,17 @@ def find_resource_hierarchies_scattered(itvs, hy, rqts):
             ProcSet()
     """
 
+    if all(isinstance(level, HierarchyLevel) for level in hy):
+        if all(level.masks is not None for level in hy):
+            bits = find_resource_hierarchies_scattered_bits(
+                procset_to_bits(itvs), hy, rqts
+            )
+            return bits_to_procset(bits)
+        elif len(hy) > 1:
+            return find_resource_n_h_indexed(
+                itvs, hy, rqts, range(len(hy[0])), 0, len(hy)
+            )
+
     l_hy = len(hy)
     #    print "find itvs: ", itvs, rqts[0]
     if l_hy == 1:
@@ -296,6 +393,170 @@ def find_resource_n_h(itvs, hy, rqts, top, h, h_bottom):
                 return ProcSet()
 
 
+def find_resource_n_h_indexed(itvs, hy, rqts, top_ids, h, h_bottom):
+    """
+    Same as :func:`find_resource_n_h` on :class:`HierarchyLevel`, the children of a block are
+    taken from the index of the level instead of scanning the next level.
+
+    :param [Integer] top_ids: Indices of the blocks of `hy[h]` to consider
+    """
+    level = hy[h]
+    sub_level = hy[h + 1]
+    avail_ids = [i for i in top_ids if not itvs.isdisjoint(level[i])]
+
+    if len(avail_ids) < rqts[h]:
+        # not enough scattered blocks
+        return ProcSet()
+
+    itvs_acc = ProcSet()
+    nb_r = 0
+    for i in avail_ids:
+        if nb_r == rqts[h]:
+            break
+        block = level[i]
+        # Only the available resources of the block matter below it
+        block_itvs = itvs & block
+        if h == h_bottom - 2:
+            # reach last level hierarchy of requested resource
+            avail_sub_bks = [
+                block & sub_level[j] for j in level.children_ids(i, sub_level)
+            ]
+            r = extract_n_scattered_block_itv(block_itvs, avail_sub_bks, rqts[h + 1])
+        else:
+            # intermediate hierarchy level, select children of this block
+            children_ids = [
+                j
+                for j in level.children_ids(i, sub_level)
+                if sub_level[j].issubset(block)
+            ]
+            r = find_resource_n_h_indexed(
+                block_itvs, hy, rqts, children_ids, h + 1, h_bottom
+            )
+        if len(r) != 0:
+            # win for this top_block
+            itvs_acc = itvs_acc | r
+            nb_r += 1
+
+    if nb_r == rqts[h]:
+        return itvs_acc
+    else:
+        return ProcSet()
+
+
+#
+# Same functions working on bitmaps of resources: the blocks of a hierarchy level
+# are bitmaps (see HierarchyLevel), intersections and "block fully free" tests are
+# bitwise operations.
+#
+
+
+def extract_n_scattered_block_bits(bits: int, masks: List[int], n: int) -> int:
+    """Same as :func:`extract_n_scattered_block_itv` on bitmaps."""
+    acc = 0
+    for mask in masks:
+        if n == 0:
+            break
+        # Check that all the resources of the block are free
+        if mask & bits == mask:
+            acc |= mask
+            n -= 1
+
+    if n == 0:
+        return acc
+    else:
+        return 0
+
+
+def extract_all_best_half_scattered_block_bits(
+    bits: int, masks: List[int], n: int
+) -> int:
+    """Same as :func:`extract_all_best_half_scattered_block_itv` on bitmaps."""
+    free_masks = [mask for mask in masks if mask & bits == mask]
+    if (n == -1) and (len(free_masks) == len(masks)):  # ALL
+        acc = 0
+        for mask in free_masks:
+            acc |= mask
+        return acc
+    elif n == -2:  # BEST
+        acc = 0
+        for mask in free_masks:
+            acc |= mask
+        return acc
+    elif n == -3:  # HALF_BEST
+        acc = 0
+        for mask in free_masks[: len(free_masks) // 2]:
+            acc |= mask
+        return acc
+    else:
+        return 0
+
+
+def find_resource_hierarchies_scattered_bits(
+    bits: int, hy: List[HierarchyLevel], rqts: List[int]
+) -> int:
+    """Same as :func:`find_resource_hierarchies_scattered` on bitmaps."""
+    l_hy = len(hy)
+    if l_hy == 1:
+        if rqts[0] > 0:
+            return extract_n_scattered_block_bits(bits, hy[0].masks, rqts[0])
+        else:
+            return extract_all_best_half_scattered_block_bits(
+                bits, hy[0].masks, rqts[0]
+            )
+    else:
+        return find_resource_n_h_bits(bits, hy, rqts, range(len(hy[0])), 0, l_hy)
+
+
+def find_resource_n_h_bits(
+    bits: int,
+    hy: List[HierarchyLevel],
+    rqts: List[int],
+    top_ids: List[int],
+    h: int,
+    h_bottom: int,
+) -> int:
+    """Same as :func:`find_resource_n_h_indexed` on bitmaps."""
+    level = hy[h]
+    sub_level = hy[h + 1]
+    masks = level.masks
+    sub_masks = sub_level.masks
+    avail_ids = [i for i in top_ids if masks[i] & bits]
+
+    if len(avail_ids) < rqts[h]:
+        # not enough scattered blocks
+        return 0
+
+    acc = 0
+    nb_r = 0
+    for i in avail_ids:
+        if nb_r == rqts[h]:
+            break
+        mask = masks[i]
+        if h == h_bottom - 2:
+            # reach last level hierarchy of requested resource
+            avail_sub_bks = [
+                mask & sub_masks[j] for j in level.children_ids(i, sub_level)
+            ]
+            r = extract_n_scattered_block_bits(bits, avail_sub_bks, rqts[h + 1])
+        else:
+            # intermediate hierarchy level, select children of this block
+            children_ids = [
+                j
+                for j in level.children_ids(i, sub_level)
+                if sub_masks[j] & mask == sub_masks[j]
+            ]
+            r = find_resource_n_h_bits(bits, hy, rqts, children_ids, h + 1, h_bottom)
+        if r:
+            # win for this top_block
+            acc |= r
+            nb_r += 1
+
+    if nb_r == rqts[h]:
+        return acc
+    else:
+        return 0
+
+
 # def G(Y):
 #    if one h level:
 #        extract
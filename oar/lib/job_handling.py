@@ -7,7 +7,7 @@ import re
 from typing import List
 
 from procset import ProcSet
-from sqlalchemy import Null, distinct, func, insert, null, text
+from sqlalchemy import delete, distinct, exists, func, insert, text
 from sqlalchemy.orm import aliased
 from sqlalchemy.orm.session import make_transient
 from sqlalchemy.sql import case
@@ -15,7 +15,12 @@ from sqlalchemy.sql.expression import select
 
 import oar.lib.tools as tools
 from oar.kao.helpers import extract_find_assign_args
-from oar.lib.event import add_new_event, add_new_event_with_host, is_an_event_exists
+from oar.lib.event import (
+    add_new_event,
+    add_new_event_with_host,
+    add_new_events,
+    is_an_event_exists,
+)
 
 # from oar.lib.utils import render_query
 from oar.lib.globals import get_logger
@@ -40,6 +45,7 @@ from oar.lib.resource_handling import (
     get_current_resources_with_suspended_job,
     update_current_scheduler_priority,
 )
+from oar.lib.resource_properties import UnsupportedExpression
 from oar.lib.tools import (
     TimeoutExpired,
     format_ssh_pub_key,
@@ -76,6 +82,13 @@ NO_PLACEHOLDER = 0
 PLACEHOLDER = 1
 ALLOW = 2
 
+# Number of constraints evaluated by a query on resources (one column each)
+RESOURCES_CONSTRAINTS_CHUNK_SIZE = 500
+
+# Number of rows of the multi-row INSERT statements of save_assigns_bulk
+# (sqlite allows 999 parameters by statement before 3.32)
+SAVE_ASSIGNS_BULK_CHUNK_SIZE = 450
+
 
 class JobPseudo(object):
     """Define a simple job class without database counter part"""
@@ -107,7 +120,7 @@ class JobPseudo(object):
         - j.simple_req(('node', 2), 60, [(1, 32)])
         - j.simple_req([('node', 2), ('core', 4)], 600, [(1, 64)])
         """
-        if type(resources_req) == tuple:
+        if isinstance(resources_req, tuple):
             res_req = [resources_req]
         else:
             res_req = resources_req
@@ -206,6 +219,65 @@ def set_jobs_cache_keys(session, jobs):
                 job.key_cache[int(moldable_id)] = str(walltime) + str(hy_res_rqts)
 
 
+def resources_constraints_sql(j_properties, jrg_grp_property):
+    """
+    Return the SQL constraints on resources of a job's resource group,
+    None when the group asks for the default resources.
+    """
+    if j_properties == "" and (
+        jrg_grp_property == "" or jrg_grp_property == "type = 'default'"
+    ):
+        return None
+
+    and_sql = ""
+    if j_properties and jrg_grp_property:
+        and_sql = " AND "
+    if j_properties is None:
+        j_properties = ""
+    if jrg_grp_property is None:
+        jrg_grp_property = ""
+
+    return j_properties + and_sql + jrg_grp_property
+
+
+def get_resources_constraints(session, resource_set, sql_constraints_list):
+    """
+    Evaluate SQL constraints on resources and return a dict which gives, for each
+    of them, the ProcSet of the resources' order ids which satisfy it.
+
+    Constraints are evaluated in memory by the resource set's properties evaluator
+    (see :mod:`oar.lib.resource_properties`). For the others, instead of a query per
+    constraint, the resources table is read once (by chunk of
+    RESOURCES_CONSTRAINTS_CHUNK_SIZE constraints) with a CASE column per constraint.
+    """
+    constraints = {}
+    evaluator = getattr(resource_set, "properties_evaluator", None)
+    if evaluator is not None:
+        db_sql_constraints_list = []
+        for sql_constraints in sql_constraints_list:
+            try:
+                constraints[sql_constraints] = evaluator.evaluate(sql_constraints)
+            except UnsupportedExpression:
+                db_sql_constraints_list.append(sql_constraints)
+        sql_constraints_list = db_sql_constraints_list
+
+    sql_constraints_list = list(sql_constraints_list)
+    for i in range(0, len(sql_constraints_list), RESOURCES_CONSTRAINTS_CHUNK_SIZE):
+        chunk = sql_constraints_list[i : i + RESOURCES_CONSTRAINTS_CHUNK_SIZE]
+        # An empty constraint does not filter any resource
+        columns = [case((text("(" + (c or "1 = 1") + ")"), 1), else_=0) for c in chunk]
+        roids = [[] for _ in chunk]
+        for row in session.query(Resource.id, *columns).order_by(Resource.id):
+            roid = resource_set.rid_i2o[int(row[0])]
+            for k, satisfied in enumerate(row[1:]):
+                if satisfied:
+                    roids[k].append(roid)
+        for sql_constraints, c_roids in zip(chunk, roids):
+            constraints[sql_constraints] = ProcSet(*c_roids)
+
+    return constraints
+
+
 def get_data_jobs(
     session, jobs, jids, resource_set, job_security_time, besteffort_duration=0
 ):
@@ -257,7 +329,12 @@ def get_data_jobs(
     #            .join(JobResourceGroup)\
     #            .join(JobResourceDescription)\
 
-    cache_constraints = {}
+    # All the distinct resources constraints are evaluated at once
+    cache_constraints = get_resources_constraints(
+        session,
+        resource_set,
+        {resources_constraints_sql(x[1], x[5]) for x in result} - {None},
+    )
 
     first_job = True
     prev_j_id = 0
@@ -341,31 +418,11 @@ def get_data_jobs(
             #
             # determine resource constraints
             #
-            if j_properties == "" and (
-                jrg_grp_property == "" or jrg_grp_property == "type = 'default'"
-            ):
+            sql_constraints = resources_constraints_sql(j_properties, jrg_grp_property)
+            if sql_constraints is None:
                 res_constraints = copy.copy(resource_set.default_itvs)
             else:
-                and_sql = ""
-                if j_properties and jrg_grp_property:
-                    and_sql = " AND "
-                if j_properties is None:
-                    j_properties = ""
-                if jrg_grp_property is None:
-                    jrg_grp_property = ""
-
-                sql_constraints = j_properties + and_sql + jrg_grp_property
-                if sql_constraints in cache_constraints:
-                    res_constraints = cache_constraints[sql_constraints]
-                else:
-                    request_constraints = (
-                        session.query(Resource.id).filter(text(sql_constraints)).all()
-                    )
-                    roids = [
-                        resource_set.rid_i2o[int(y[0])] for y in request_constraints
-                    ]
-                    res_constraints = ProcSet(*roids)
-                    cache_constraints[sql_constraints] = res_constraints
+                res_constraints = cache_constraints[sql_constraints]
         else:
             # add next res_type , res_value
             jr_descriptions.append((res_type, res_value))
@@ -419,6 +476,28 @@ def get_job_suspended_sum_duration(session, jid, now):
     return suspended_duration
 
 
+def get_jobs_suspended_sum_duration(session, job_ids, now):
+    """Return get_job_suspended_sum_duration of each job, with a single query"""
+    suspended_durations = {job_id: 0 for job_id in job_ids}
+    if not job_ids:
+        return suspended_durations
+    for job_id, date_start, date_stop in session.query(
+        JobStateLog.job_id, JobStateLog.date_start, JobStateLog.date_stop
+    ).filter(
+        JobStateLog.job_id.in_(job_ids),
+        JobStateLog.job_state.in_(("Suspended", "Resuming")),
+    ):
+        if date_stop == 0:
+            res_time = now - date_start
+        else:
+            res_time = date_stop - date_start
+
+        if res_time > 0:
+            suspended_durations[job_id] += res_time
+
+    return suspended_durations
+
+
 # TODO available_suspended_res_itvs, now
 def extract_scheduled_jobs(session, result, resource_set, job_security_time, now):
     jids = []
@@ -638,7 +717,14 @@ def job_message(session, job, nb_resources=None):
     return message
 
 
-def save_assigns(session, jobs, resource_set):
+def save_assigns(session, jobs, resource_set, config=None):
+    """
+    Save the start time and resources of the scheduled jobs into the gantt tables
+    (and their messages). With SCHEDULER_SAVE_ASSIGNS_BULK="yes" in the configuration,
+    the assignments are written by :func:`save_assigns_bulk`. With
+    SCHEDULER_GANTT_WRITE_DIFF="yes", resources already in the gantt for a moldable
+    are kept if they are the same (see :func:`gantt_resources_diff`).
+    """
     # http://docs.sqlalchemy.org/en/rel_0_9/core/dml.html#sqlalchemy.sql.expression.Insert.values
     if len(jobs) > 0:
         logger.debug("nb job to save: " + str(len(jobs)))
@@ -646,22 +732,14 @@ def save_assigns(session, jobs, resource_set):
         mld_id_rid_s = []
         message_updates = {}
 
+        rid_o2i = resource_set.rid_o2i
         for j in jobs.values() if isinstance(jobs, dict) else jobs:
             if j.start_time > -1:
                 logger.debug("job_id to save: " + str(j.id))
-                mld_id_start_time_s.append(
-                    {"moldable_job_id": j.moldable_id, "start_time": j.start_time}
-                )
+                mld_id_start_time_s.append((j.moldable_id, j.start_time))
                 riods = list(j.res_set)
-                mld_id_rid_s.extend(
-                    [
-                        {
-                            "moldable_job_id": j.moldable_id,
-                            "resource_id": resource_set.rid_o2i[rid],
-                        }
-                        for rid in riods
-                    ]
-                )
+                moldable_id = j.moldable_id
+                mld_id_rid_s.extend([(moldable_id, rid_o2i[rid]) for rid in riods])
                 msg = job_message(session, j, nb_resources=len(riods))
                 message_updates[j.id] = msg
 
@@ -678,43 +756,117 @@ def save_assigns(session, jobs, resource_set):
             )
 
         logger.info("save assignements")
-        session.execute(GanttJobsPrediction.__table__.insert(), mld_id_start_time_s)
-        session.execute(GanttJobsResource.__table__.insert(), mld_id_rid_s)
+        if gantt_write_diff(config):
+            mld_id_rid_s = gantt_resources_diff(
+                session, [mld_id for mld_id, _ in mld_id_start_time_s], mld_id_rid_s
+            )
+
+        if config is not None and config.get("SCHEDULER_SAVE_ASSIGNS_BULK") == "yes":
+            save_assigns_bulk(session, mld_id_start_time_s, mld_id_rid_s)
+        else:
+            if mld_id_start_time_s:
+                session.execute(
+                    GanttJobsPrediction.__table__.insert(),
+                    [
+                        {"moldable_job_id": mld_id, "start_time": start_time}
+                        for mld_id, start_time in mld_id_start_time_s
+                    ],
+                )
+            if mld_id_rid_s:
+                session.execute(
+                    GanttJobsResource.__table__.insert(),
+                    [
+                        {"moldable_job_id": mld_id, "resource_id": rid}
+                        for mld_id, rid in mld_id_rid_s
+                    ],
+                )
         session.commit()
 
 
-# flake8: noqa: (TODO: write an equivalent, benchmark it)
-def save_assigns_bulk(session, jobs, resource_set):  # pragma: no cover
-    if len(jobs) > 0:
-        logger.debug("nb job to save: " + str(len(jobs)))
-        mld_id_start_time_s = []
-        mld_id_rid_s = []
-        for j in jobs.values():
-            if j.start_time > -1:
-                logger.debug("job_id  to save: " + str(j.id))
-                mld_id_start_time_s.append((j.moldable_id, j.start_time))
-                riods = list(j.res_set)
-                mld_id_rid_s.extend(
-                    [(j.moldable_id, resource_set.rid_o2i[rid]) for rid in riods]
-                )
+def gantt_write_diff(config):
+    return config is not None and config.get("SCHEDULER_GANTT_WRITE_DIFF") == "yes"
 
-        logger.info("save assignements")
 
-        with session.engine.connect() as to_conn:
-            cursor = to_conn.connection.cursor()
-            pg_bulk_insert(
-                cursor,
-                db["gantt_jobs_predictions"],
-                mld_id_start_time_s,
-                ("moldable_job_id", "start_time"),
-                binary=True,
-            )
-            pg_bulk_insert(
-                cursor,
-                db["queues"],
-                mld_id_rid_s,
-                ("moldable_job_id", "resource_id"),
-                binary=True,
+def gantt_resources_diff(session, moldable_ids, mld_id_rid_s):
+    """
+    Return the (moldable_job_id, resource_id) rows to insert in gantt_jobs_resources
+    to assign `mld_id_rid_s` to the moldables `moldable_ids`.
+
+    In SCHEDULER_GANTT_WRITE_DIFF mode, :func:`gantt_flush_tables` only deletes the
+    predictions of the moldables: the resources rows of the previous round are kept
+    (hidden as they have no prediction). The rows of a moldable whose resources are
+    unchanged are kept as they are, those of the other moldables are deleted.
+    """
+    previous_rids = {}
+    for mld_id, rid in session.query(
+        GanttJobsResource.moldable_id, GanttJobsResource.resource_id
+    ).filter(GanttJobsResource.moldable_id.in_(moldable_ids)):
+        previous_rids.setdefault(mld_id, set()).add(rid)
+
+    rids = {}
+    for mld_id, rid in mld_id_rid_s:
+        rids.setdefault(mld_id, set()).add(rid)
+
+    kept_mld_ids = {
+        mld_id for mld_id in previous_rids if rids.get(mld_id) == previous_rids[mld_id]
+    }
+    changed_mld_ids = [mld_id for mld_id in previous_rids if mld_id not in kept_mld_ids]
+    if changed_mld_ids:
+        session.query(GanttJobsResource).filter(
+            GanttJobsResource.moldable_id.in_(changed_mld_ids)
+        ).delete(synchronize_session=False)
+
+    logger.debug(
+        "gantt resources: {} moldables kept, {} changed".format(
+            len(kept_mld_ids), len(changed_mld_ids)
+        )
+    )
+    return [(mld_id, rid) for mld_id, rid in mld_id_rid_s if mld_id not in kept_mld_ids]
+
+
+def save_assigns_bulk(session, mld_id_start_time_s, mld_id_rid_s):
+    """
+    Insert the (moldable_job_id, start_time) and (moldable_job_id, resource_id) rows of
+    the gantt tables in bulk, in the session's transaction: with a binary COPY on
+    PostgreSQL (psycopg2), with multi-row INSERT statements of
+    SAVE_ASSIGNS_BULK_CHUNK_SIZE rows otherwise.
+    """
+    connection = session.connection()
+    tables_rows = [
+        (
+            GanttJobsPrediction.__table__,
+            ("moldable_job_id", "start_time"),
+            mld_id_start_time_s,
+        ),
+        (
+            GanttJobsResource.__table__,
+            ("moldable_job_id", "resource_id"),
+            mld_id_rid_s,
+        ),
+    ]
+
+    if connection.dialect.driver == "psycopg2":
+        from oar.lib.psycopg2 import pg_bulk_insert
+
+        cursor = connection.connection.driver_connection.cursor()
+        for table, columns, rows in tables_rows:
+            if rows:
+                pg_bulk_insert(cursor, table, rows, columns, binary=True)
+        return
+
+    placeholder = "?" if connection.dialect.paramstyle == "qmark" else "%s"
+    for table, columns, rows in tables_rows:
+        row_values = "(" + ", ".join([placeholder] * len(columns)) + ")"
+        for i in range(0, len(rows), SAVE_ASSIGNS_BULK_CHUNK_SIZE):
+            chunk = rows[i : i + SAVE_ASSIGNS_BULK_CHUNK_SIZE]
+            connection.exec_driver_sql(
+                "INSERT INTO %s (%s) VALUES %s"
+                % (
+                    table.name,
+                    ", ".join(columns),
+                    ", ".join([row_values] * len(chunk)),
+                ),
+                tuple(value for row in chunk for value in row),
             )
 
 
@@ -1229,9 +1381,14 @@ def get_waiting_moldable_of_reservations_already_scheduled(
 
 
 # TODO MOVE TO GANTT_HANDLING
-def gantt_flush_tables(session, reservations_to_keep_mld_ids=[]):
-    """Flush gantt tables but keep accepted advance reservations"""
+def gantt_flush_tables(session, reservations_to_keep_mld_ids=[], config=None):
+    """
+    Flush gantt tables but keep accepted advance reservations.
 
+    With SCHEDULER_GANTT_WRITE_DIFF="yes", only predictions are deleted, resources rows
+    are kept for :func:`gantt_resources_diff` until :func:`gantt_delete_orphan_resources`.
+    """
+    flush_resources = not gantt_write_diff(config)
     if reservations_to_keep_mld_ids != []:
         logger.debug(
             "reservations_to_keep_mld_ids[0]: " + str(reservations_to_keep_mld_ids[0])
@@ -1239,16 +1396,30 @@ def gantt_flush_tables(session, reservations_to_keep_mld_ids=[]):
         session.query(GanttJobsPrediction).filter(
             ~GanttJobsPrediction.moldable_id.in_(tuple(reservations_to_keep_mld_ids))
         ).delete(synchronize_session=False)
-        session.query(GanttJobsResource).filter(
-            ~GanttJobsResource.moldable_id.in_(tuple(reservations_to_keep_mld_ids))
-        ).delete(synchronize_session=False)
+        if flush_resources:
+            session.query(GanttJobsResource).filter(
+                ~GanttJobsResource.moldable_id.in_(tuple(reservations_to_keep_mld_ids))
+            ).delete(synchronize_session=False)
     else:
         session.query(GanttJobsPrediction).delete(synchronize_session=False)
-        session.query(GanttJobsResource).delete(synchronize_session=False)
+        if flush_resources:
+            session.query(GanttJobsResource).delete(synchronize_session=False)
 
     session.commit()
 
 
+def gantt_delete_orphan_resources(session):
+    """Delete the resources rows of the moldables without prediction in the gantt."""
+    session.execute(
+        delete(GanttJobsResource).where(
+            ~exists().where(
+                GanttJobsPrediction.moldable_id == GanttJobsResource.moldable_id
+            )
+        )
+    )
+    session.commit()
+
+
 def get_jobs_in_multiple_states(session, states, resource_set):
     result = (
         session.query(Job, AssignedResource.moldable_id, AssignedResource.resource_id)
@@ -1540,6 +1711,56 @@ def frag_job(session, job_id, user=None):
         return -1
 
 
+def frag_jobs(session, job_ids, user=None):
+    """
+    Set, as frag_job does for each job but at once, the flag 'ToFrag' of the jobs to
+    'Yes'. Return the ids of the jobs fragged (not already fragged and allowed to user).
+    """
+    if not user:
+        if "OARDO_USER" in os.environ:
+            user = os.environ["OARDO_USER"]
+        else:
+            user = os.environ["USER"]
+
+    if not job_ids:
+        return []
+
+    already_fragged = {
+        job_id
+        for (job_id,) in session.query(FragJob.job_id).filter(
+            FragJob.job_id.in_(job_ids)
+        )
+    }
+    fragged_job_ids = [
+        job_id
+        for (job_id, job_user) in session.query(Job.id, Job.user)
+        .filter(Job.id.in_(job_ids))
+        .order_by(Job.id)
+        if job_id not in already_fragged and user in (job_user, "oar", "root")
+    ]
+    if not fragged_job_ids:
+        return []
+
+    date = tools.get_date(session)
+    session.execute(
+        insert(FragJob),
+        [{"job_id": job_id, "date": date} for job_id in fragged_job_ids],
+    )
+    session.commit()
+    add_new_events(
+        session,
+        [
+            (
+                "FRAG_JOB_REQUEST",
+                job_id,
+                "User %s requested to frag the job %s" % (user, str(job_id)),
+            )
+            for job_id in fragged_job_ids
+        ],
+    )
+    return fragged_job_ids
+
+
 def ask_checkpoint_signal_job(session, job_id, signal=None, user=None):
     """Verify if the user is able to checkpoint the job
     returns : 0 if all is good, 1 if the user cannot do this,
@@ -1705,7 +1926,7 @@ def set_job_state(session, config, jid, state):
     ]
     try:
         states.remove(state)
-    except:
+    except ValueError:
         pass
 
     result = (
@@ -2083,6 +2304,16 @@ def job_leon_exterminate(session, job_id):
     session.commit()
 
 
+def set_jobs_frag_state(session, job_ids, frag_state):
+    """Set the frag state of the jobs (job_fragged, job_refrag... for several jobs)"""
+    if not job_ids:
+        return
+    session.query(FragJob).filter(FragJob.job_id.in_(job_ids)).update(
+        {FragJob.state: frag_state}, synchronize_session=False
+    )
+    session.commit()
+
+
 def get_frag_date(session, job_id):
     """Get the date of the frag of a job"""
     res = session.query(FragJob.date).filter(FragJob.job_id == job_id).one()
@@ -2658,6 +2889,45 @@ def get_timer_armed_job(
     return res
 
 
+def get_timer_armed_jobs_frag_date(session):
+    """Return the id, state and frag date of the jobs with their frag state to TIMER_ARMED"""
+    return (
+        session.query(Job.id, Job.state, FragJob.date)
+        .filter(FragJob.state == "TIMER_ARMED")
+        .filter(Job.id == FragJob.job_id)
+        .all()
+    )
+
+
+def get_running_jobs_deadlines(session, date):
+    """
+    Return, with a single query, the running jobs (id, start time, walltime of the
+    current moldable, suspended and checkpoint) whose walltime or checkpoint date is
+    reached at date. Suspended jobs are all returned, as their walltime depends on
+    their suspended durations (see get_jobs_suspended_sum_duration).
+    """
+    end_time = Job.start_time + MoldableJobDescription.walltime
+    return (
+        session.query(
+            Job.id,
+            Job.start_time,
+            MoldableJobDescription.walltime,
+            Job.suspended,
+            Job.checkpoint,
+        )
+        .filter(Job.state == "Running")
+        .filter(MoldableJobDescription.id == Job.assigned_moldable_job)
+        .filter(MoldableJobDescription.index == "CURRENT")
+        .filter(
+            (Job.suspended == "YES")
+            | (end_time < date)
+            | ((Job.checkpoint > 0) & (end_time - Job.checkpoint <= date))
+        )
+        .order_by(Job.id)
+        .all()
+    )
+
+
 def archive_some_moldable_job_nodes(session, config, moldable_id, hosts):
     """Sets the index fields to LOG in the table assigned_resources"""
     # import pdb; psession.set_trace()
@@ -120,6 +120,23 @@ class Accounting(Model):
     consumption = Column(BigInteger, server_default="0")
 
 
+class AccountingUsage(Model):
+    """Consumptions of the accounting windows between window_start and window_stop,
+    summed by queue, user, project and type (maintained by oaraccounting)."""
+
+    __tablename__ = "accounting_usage"
+
+    window_start = Column(BigInteger, primary_key=True, autoincrement=False)
+    window_stop = Column(BigInteger, primary_key=True, autoincrement=False)
+    user = Column("accounting_user", String(255), primary_key=True, server_default="")
+    project = Column(
+        "accounting_project", String(255), primary_key=True, server_default=""
+    )
+    queue_name = Column(String(100), primary_key=True, server_default="")
+    consumption_type = Column(String(5), primary_key=True, server_default="ASKED")
+    consumption = Column(BigInteger, server_default="0")
+
+
 class AdmissionRule(Model):
     __tablename__ = "admission_rules"
 
@@ -144,6 +144,40 @@ def get_last_wake_up_date_of_node(session: Session, hostname: str):
     return result
 
 
+def get_next_job_date_on_nodes(
+    session: Session, hostnames: List[str]
+) -> dict[str, int]:
+    """Same as get_next_job_date_on_node for several nodes at once, nodes without
+    job in the gantt are not in the returned dict"""
+    result = (
+        session.query(
+            Resource.network_address, func.min(GanttJobsPrediction.start_time)
+        )
+        .filter(Resource.network_address.in_(tuple(hostnames)))
+        .filter(GanttJobsResource.resource_id == Resource.id)
+        .filter(GanttJobsPrediction.moldable_id == GanttJobsResource.moldable_id)
+        .group_by(Resource.network_address)
+        .all()
+    )
+    return dict(result)
+
+
+def get_last_wake_up_date_of_nodes(
+    session: Session, hostnames: List[str]
+) -> dict[str, int]:
+    """Same as get_last_wake_up_date_of_node for several nodes at once, nodes never
+    woken up are not in the returned dict"""
+    result = (
+        session.query(EventLogHostname.hostname, func.max(EventLog.date))
+        .filter(EventLogHostname.event_id == EventLog.id)
+        .filter(EventLogHostname.hostname.in_(tuple(hostnames)))
+        .filter(EventLog.type == "WAKEUP_NODE")
+        .group_by(EventLogHostname.hostname)
+        .all()
+    )
+    return dict(result)
+
+
 def get_alive_nodes_with_jobs(
     session: Session,
 ):
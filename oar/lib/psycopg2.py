@@ -0,0 +1,87 @@
+# coding: utf-8
+"""
+Bulk insertion of rows in a PostgreSQL table with ``COPY ... FROM STDIN`` (psycopg2 cursor).
+
+The binary format is used when asked and when all the columns are integers or strings,
+the text format otherwise.
+"""
+import io
+import struct
+
+from sqlalchemy import BigInteger, Integer, SmallInteger, String, Text
+
+PG_COPY_BINARY_HEADER = b"PGCOPY\n\377\r\n\0" + struct.pack("!ii", 0, 0)
+PG_COPY_BINARY_TRAILER = struct.pack("!h", -1)
+
+PG_COPY_TEXT_ESCAPES = str.maketrans(
+    {"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"}
+)
+
+
+def binary_encoder(column_type):
+    """Return the function which encodes a value of the column (length and data)."""
+    if isinstance(column_type, BigInteger):
+        return lambda v: struct.pack("!iq", 8, v)
+    if isinstance(column_type, SmallInteger):
+        return lambda v: struct.pack("!ih", 2, v)
+    if isinstance(column_type, Integer):
+        return lambda v: struct.pack("!ii", 4, v)
+    if isinstance(column_type, (String, Text)):
+
+        def encode_string(v):
+            data = v.encode("utf-8")
+            return struct.pack("!i", len(data)) + data
+
+        return encode_string
+    return None
+
+
+def pg_copy_binary_data(rows, encoders):
+    nb_fields = struct.pack("!h", len(encoders))
+    null = struct.pack("!i", -1)
+    data = io.BytesIO()
+    data.write(PG_COPY_BINARY_HEADER)
+    for row in rows:
+        data.write(nb_fields)
+        for encode, value in zip(encoders, row):
+            data.write(null if value is None else encode(value))
+    data.write(PG_COPY_BINARY_TRAILER)
+    data.seek(0)
+    return data
+
+
+def pg_copy_text_value(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return str(value).translate(PG_COPY_TEXT_ESCAPES)
+
+
+def pg_copy_text_data(rows):
+    data = io.StringIO()
+    for row in rows:
+        data.write("\t".join(pg_copy_text_value(value) for value in row))
+        data.write("\n")
+    data.seek(0)
+    return data
+
+
+def pg_bulk_insert(cursor, table, rows, columns, binary=False):
+    """
+    Insert rows (sequences of values in the order of columns) into the table
+    (:class:`sqlalchemy.Table`) with a COPY on the psycopg2 cursor.
+    """
+    column_names = ", ".join('"%s"' % c for c in columns)
+    sql = 'COPY "%s" (%s) FROM STDIN' % (table.name, column_names)
+
+    encoders = None
+    if binary:
+        encoders = [binary_encoder(table.columns[c].type) for c in columns]
+        if None in encoders:
+            encoders = None
+
+    if encoders is not None:
+        cursor.copy_expert(sql + " WITH BINARY", pg_copy_binary_data(rows, encoders))
+    else:
+        cursor.copy_expert(sql, pg_copy_text_data(rows))
@@ -7,6 +7,7 @@ from sqlalchemy import text
 
 from oar.lib.hierarchy import Hierarchy
 from oar.lib.models import Resource
+from oar.lib.resource_properties import PropertiesEvaluator
 
 MAX_NB_RESOURCES = 100000
 
@@ -121,7 +122,10 @@ class ResourceSet(object):
             del hy_roid["id"]
 
         # create hierarchy
-        self.hierarchy = Hierarchy(hy_rid=hy_roid).hy
+        self.hierarchy = Hierarchy(
+            hy_rid=hy_roid,
+            bitset=(config.get("SCHEDULER_HIERARCHY_BITSET", "no") == "yes"),
+        ).hy
 
         # transform available_upto
         for k, v in available_upto.items():
@@ -130,6 +134,13 @@ class ResourceSet(object):
         #
         self.suspendable_roid_itvs = ProcSet(*suspendable_roids)
 
+        # columnar copy of resources to evaluate jobs' properties
+        self.properties_evaluator = PropertiesEvaluator(
+            self.resources_db,
+            [self.rid_i2o[int(r.id)] for r in self.resources_db],
+            like_case_sensitive=(session.get_bind().dialect.name != "sqlite"),
+        )
+
         default_roids = [self.rid_i2o[i] for i in default_rids]
         self.default_itvs = ProcSet(*default_roids)
         ResourceSet.default_itvs = self.default_itvs  # for Quotas
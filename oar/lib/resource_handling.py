@@ -99,6 +99,43 @@ def set_resource_state(session, resource_id, state, finaud_decision):
     session.execute(ins)
 
 
+def set_resources_state(session, resource_ids, state, finaud_decision):
+    """Set, as set_resource_state does for each resource but at once, the state field of
+    resources"""
+    if not resource_ids:
+        return
+    session.query(Resource).filter(Resource.id.in_(resource_ids)).update(
+        {
+            Resource.state: state,
+            Resource.finaud_decision: finaud_decision,
+            Resource.state_num: State_to_num[state],
+        },
+        synchronize_session=False,
+    )
+
+    date = tools.get_date(session)
+
+    session.query(ResourceLog).filter(ResourceLog.date_stop == 0).filter(
+        ResourceLog.attribute == "state"
+    ).filter(ResourceLog.resource_id.in_(resource_ids)).update(
+        {ResourceLog.date_stop: date}, synchronize_session=False
+    )
+
+    session.execute(
+        ResourceLog.__table__.insert(),
+        [
+            {
+                "resource_id": resource_id,
+                "attribute": "state",
+                "value": state,
+                "date_start": date,
+                "finaud_decision": finaud_decision,
+            }
+            for resource_id in resource_ids
+        ],
+    )
+
+
 def set_resource_nextState(session, resource_id, next_state):
     """Set the nextState field of a resource identified by its resource_id"""
     session.query(Resource).filter(Resource.id == resource_id).update(
@@ -444,6 +481,34 @@ def get_resource_job_to_frag(session, r_id):
     return [r[0] for r in res]
 
 
+def get_resources_jobs_to_frag(session, resource_ids):
+    """Same as get_resource_job_to_frag but for several resources at once, return the
+    (resource_id, job_id) pairs"""
+    if not resource_ids:
+        return []
+    subq = (
+        session.query(JobType.job_id)
+        .filter(or_(JobType.type == "cosystem", JobType.type == "noop"))
+        .filter(JobType.types_index == "CURRENT")
+    )
+
+    res = (
+        session.query(AssignedResource.resource_id, Job.id)
+        .filter(AssignedResource.index == "CURRENT")
+        .filter(MoldableJobDescription.index == "CURRENT")
+        .filter(AssignedResource.resource_id.in_(resource_ids))
+        .filter(AssignedResource.moldable_id == MoldableJobDescription.id)
+        .filter(MoldableJobDescription.job_id == Job.id)
+        .filter(Job.state != "Terminated")
+        .filter(Job.state != "Error")
+        .filter(~Job.id.in_(subq))
+        .order_by(AssignedResource.resource_id, Job.id)
+        .all()
+    )
+
+    return [(r[0], r[1]) for r in res]
+
+
 def get_resources_with_given_sql(session, sql):
     """Returns the resource ids with specified properties parameters : where SQL constraints."""
     results = session.query(Resource.id).filter(text(sql)).order_by(Resource.id).all()
@@ -0,0 +1,295 @@
+# coding: utf-8
+"""
+In memory evaluation of the properties of jobs (``oarsub -p``) and of their resource groups.
+
+Properties are SQL conditions on the ``resources`` table. Instead of sending a query to the
+database for each of them, :class:`PropertiesEvaluator` keeps a columnar copy of the resources
+(a list of values per column) and evaluates the following subset of SQL:
+
+- comparisons of a column with a literal (``=``, ``<>``, ``!=``, ``<``, ``<=``, ``>``, ``>=``),
+  ordering comparisons are limited to numerical columns,
+- ``[NOT] IN (literal, ...)``, ``[NOT] LIKE 'pattern'`` and ``IS [NOT] NULL``,
+- ``AND``, ``OR``, ``NOT`` and parentheses, with the SQL three-valued logic for NULL values.
+
+For example ``gpu = 'YES' and mem > 64`` or ``network_address IN ('node1', 'node2')``.
+Expressions outside of this subset (functions, sub-queries, unknown columns...) raise
+:class:`UnsupportedExpression` and must be evaluated by the database.
+"""
+import operator
+import re
+
+from procset import ProcSet
+
+from oar.lib.models import Resource
+
+# Columns which change without the resources being considered as modified between
+# scheduling rounds (see oar.modules.kao_server), they are always evaluated by the database.
+VOLATILE_COLUMNS = ("last_job_date",)
+
+TOKEN_REGEX = re.compile(
+    r"\s*(?:(?P<string>'(?:[^']|'')*')"
+    r"|(?P<number>\d+(?:\.\d*)?|\.\d+)"
+    r"|(?P<op><=|>=|<>|!=|=|<|>|\(|\)|,|-)"
+    r"|(?P<word>[A-Za-z_][A-Za-z0-9_]*))"
+)
+
+KEYWORDS = ("and", "or", "not", "in", "like", "is", "null")
+
+COMPARISONS = {
+    "=": operator.eq,
+    "<>": operator.ne,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+# Comparisons obtained by swapping the operands (literal op column -> column op literal)
+SWAPPED_COMPARISONS = {"<": ">", "<=": ">=", ">": "<", ">=": "<="}
+
+
+class UnsupportedExpression(Exception):
+    """The expression is not in the subset of SQL evaluated in memory."""
+
+
+def tokenize(expression):
+    tokens = []
+    pos = 0
+    expression = expression.rstrip()
+    while pos < len(expression):
+        m = TOKEN_REGEX.match(expression, pos)
+        if not m or m.end() == pos:
+            raise UnsupportedExpression(expression[pos:])
+        pos = m.end()
+        kind = m.lastgroup
+        value = m.group(kind)
+        if kind == "string":
+            value = value[1:-1].replace("''", "'")
+        elif kind == "number":
+            value = float(value) if "." in value else int(value)
+        elif kind == "word":
+            value = value.lower()
+            if value in KEYWORDS:
+                kind = "keyword"
+        tokens.append((kind, value))
+    return tokens
+
+
+def and3(a, b):
+    if a is False or b is False:
+        return False
+    if a is None or b is None:
+        return None
+    return True
+
+
+def or3(a, b):
+    if a is True or b is True:
+        return True
+    if a is None or b is None:
+        return None
+    return False
+
+
+def not3(a):
+    return None if a is None else not a
+
+
+def like_regex(pattern, case_sensitive):
+    regex = ""
+    for c in pattern:
+        if c == "%":
+            regex += ".*"
+        elif c == "_":
+            regex += "."
+        elif c == "\\":
+            # Escape characters differ between databases
+            raise UnsupportedExpression(pattern)
+        else:
+            regex += re.escape(c)
+    return re.compile(regex, re.DOTALL if case_sensitive else re.DOTALL | re.I)
+
+
+class PropertiesEvaluator(object):
+    """
+    Evaluate properties on a columnar copy of resources.
+
+    :param resources: the resources (:class:`oar.lib.models.Resource`)
+    :param roids: the order id, for the scheduler, of each resource
+    :param like_case_sensitive: if ``LIKE`` is case sensitive (``False`` for sqlite)
+    """
+
+    def __init__(self, resources, roids, like_case_sensitive=True):
+        self.roids = list(roids)
+        self.like_case_sensitive = like_case_sensitive
+        self.columns = {}
+        self.columns_type = {}
+        for column in Resource.__table__.columns:
+            if column.name in VOLATILE_COLUMNS:
+                continue
+            try:
+                python_type = column.type.python_type
+            except NotImplementedError:  # pragma: no cover
+                continue
+            if python_type not in (int, float, str):
+                continue
+            key = Resource.__mapper__.get_property_by_column(column).key
+            self.columns[column.name] = [getattr(r, key) for r in resources]
+            self.columns_type[column.name] = python_type
+        self.cache = {}
+
+    def evaluate(self, expression):
+        """
+        Return the ProcSet of the order ids of the resources which satisfy the expression,
+        raise :class:`UnsupportedExpression` if it cannot be evaluated in memory.
+        """
+        if expression in self.cache:
+            if self.cache[expression] is None:
+                raise UnsupportedExpression(expression)
+            return self.cache[expression]
+
+        try:
+            if expression.strip() == "":
+                values = [True] * len(self.roids)
+            else:
+                self.tokens = tokenize(expression)
+                self.pos = 0
+                values = self.parse_or()
+                if self.pos != len(self.tokens):
+                    raise UnsupportedExpression(expression)
+        except UnsupportedExpression:
+            self.cache[expression] = None
+            raise
+
+        itvs = ProcSet(*[roid for roid, v in zip(self.roids, values) if v is True])
+        self.cache[expression] = itvs
+        return itvs
+
+    #
+    # Recursive descent parser, each rule returns the list of the (three-valued) values
+    # of the expression for each resource.
+    #
+    def peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return (None, None)
+
+    def next(self):
+        token = self.peek()
+        if token[0] is None:
+            raise UnsupportedExpression("unexpected end of expression")
+        self.pos += 1
+        return token
+
+    def expect(self, kind, value):
+        if self.next() != (kind, value):
+            raise UnsupportedExpression("%s expected" % value)
+
+    def parse_or(self):
+        values = self.parse_and()
+        while self.peek() == ("keyword", "or"):
+            self.pos += 1
+            values = list(map(or3, values, self.parse_and()))
+        return values
+
+    def parse_and(self):
+        values = self.parse_not()
+        while self.peek() == ("keyword", "and"):
+            self.pos += 1
+            values = list(map(and3, values, self.parse_not()))
+        return values
+
+    def parse_not(self):
+        if self.peek() == ("keyword", "not"):
+            self.pos += 1
+            return [not3(v) for v in self.parse_not()]
+        if self.peek() == ("op", "("):
+            self.pos += 1
+            values = self.parse_or()
+            self.expect("op", ")")
+            return values
+        return self.parse_predicate()
+
+    def parse_literal(self):
+        kind, value = self.next()
+        if (kind, value) == ("op", "-"):
+            kind, value = self.next()
+            if kind != "number":
+                raise UnsupportedExpression("number expected")
+            value = -value
+        elif kind not in ("string", "number"):
+            raise UnsupportedExpression("literal expected")
+        return value
+
+    def parse_column(self):
+        kind, name = self.next()
+        if kind != "word" or name not in self.columns:
+            raise UnsupportedExpression("unknown column %s" % name)
+        return name
+
+    def check_literal(self, column, literal, ordering=False):
+        python_type = self.columns_type[column]
+        if python_type is str:
+            if not isinstance(literal, str) or ordering:
+                # Implicit casts and collations are left to the database
+                raise UnsupportedExpression("%s: %s" % (column, literal))
+        elif isinstance(literal, str):
+            raise UnsupportedExpression("%s: %s" % (column, literal))
+
+    def parse_predicate(self):
+        if self.peek()[0] == "word":
+            column = self.parse_column()
+            kind, value = self.next()
+        else:
+            # literal op column
+            literal = self.parse_literal()
+            kind, op = self.next()
+            if kind != "op" or op not in COMPARISONS:
+                raise UnsupportedExpression("comparison expected")
+            column = self.parse_column()
+            return self.comparison(column, SWAPPED_COMPARISONS.get(op, op), literal)
+
+        values = self.columns[column]
+
+        if kind == "op" and value in COMPARISONS:
+            return self.comparison(column, value, self.parse_literal())
+
+        if (kind, value) == ("keyword", "is"):
+            negate = self.peek() == ("keyword", "not")
+            if negate:
+                self.pos += 1
+            self.expect("keyword", "null")
+            return [(v is None) != negate for v in values]
+
+        negate = (kind, value) == ("keyword", "not")
+        if negate:
+            kind, value = self.next()
+
+        if (kind, value) == ("keyword", "in"):
+            self.expect("op", "(")
+            literals = [self.parse_literal()]
+            while self.peek() == ("op", ","):
+                self.pos += 1
+                literals.append(self.parse_literal())
+            self.expect("op", ")")
+            for literal in literals:
+                self.check_literal(column, literal)
+            literals = set(literals)
+            return [None if v is None else (v in literals) != negate for v in values]
+
+        if (kind, value) == ("keyword", "like"):
+            pattern = self.parse_literal()
+            self.check_literal(column, pattern)
+            regex = like_regex(pattern, self.like_case_sensitive)
+            return [
+                None if v is None else bool(regex.fullmatch(v)) != negate
+                for v in values
+            ]
+
+        raise UnsupportedExpression("predicate expected on %s" % column)
+
+    def comparison(self, column, op, literal):
+        self.check_literal(column, literal, ordering=op not in ("=", "<>", "!="))
+        func = COMPARISONS[op]
+        return [None if v is None else func(v, literal) for v in self.columns[column]]
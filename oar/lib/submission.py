@@ -28,6 +28,7 @@ from oar.lib.models import (
     Resource,
 )
 from oar.lib.resource import ResourceSet
+from oar.lib.resource_properties import UnsupportedExpression
 from oar.lib.tools import sql_to_duration  # noqa
 from oar.lib.tools import (
     PIPE,
@@ -834,23 +835,32 @@ def estimate_job_nb_resources(
                 sql_constraints = j_properties + and_sql + jrg_grp_property
 
                 try:
-                    request_constraints = (
-                        session.query(Resource.id).filter(text(sql_constraints)).all()
+                    constraints = resource_set.properties_evaluator.evaluate(
+                        sql_constraints
                     )
-                except exc.SQLAlchemyError:
-                    error_code = -5
-                    error_msg = (
-                        "Bad resource SQL constraints request:"
-                        + sql_constraints
-                        + "\n"
-                        + "SQLAlchemyError: "
-                        + str(exc)
-                    )
-                    error = (error_code, error_msg)
-                    return (error, None, None)
+                except UnsupportedExpression:
+                    try:
+                        request_constraints = (
+                            session.query(Resource.id)
+                            .filter(text(sql_constraints))
+                            .all()
+                        )
+                    except exc.SQLAlchemyError:
+                        error_code = -5
+                        error_msg = (
+                            "Bad resource SQL constraints request:"
+                            + sql_constraints
+                            + "\n"
+                            + "SQLAlchemyError: "
+                            + str(exc)
+                        )
+                        error = (error_code, error_msg)
+                        return (error, None, None)
 
-                roids = [resource_set.rid_i2o[int(y[0])] for y in request_constraints]
-                constraints = ProcSet(*roids)
+                    roids = [
+                        resource_set.rid_i2o[int(y[0])] for y in request_constraints
+                    ]
+                    constraints = ProcSet(*roids)
 
             hy_levels = []
             hy_nbs = []
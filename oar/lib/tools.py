@@ -1,3 +1,4 @@
+import asyncio
 import os
 import random
 import re
@@ -6,13 +7,18 @@ import re
 import signal
 import socket
 import string
+import threading
 import time
-from multiprocessing import Process  # noqa use via tools.getpass (simplify mocking)
+from multiprocessing import (  # noqa use via tools.getpass (simplify mocking)
+    Pipe,
+    Process,
+)
 from pwd import getpwnam  # noqa use via tools.getpass (simplify mocking)
 from socket import gethostname
 
 # run, call use via tools.run, tools.call (simplify mocking)
 from subprocess import (  # noqa
+    DEVNULL,
     PIPE,
     STDOUT,
     CalledProcessError,
@@ -42,6 +48,7 @@ tools_logger = get_logger("oar.lib.tools", forward_stderr=True)
 
 zmq_context = None
 almighty_socket = None
+almighty_socket_lock = threading.Lock()
 bipbip_commander_socket = None
 oar2_almighty_socket = None
 
@@ -133,6 +140,10 @@ def create_almighty_socket(server_hostname: str, server_port: str):  # pragma: n
     if not zmq_context:
         zmq_context = zmq.Context()
 
+    # The meta scheduler can be long-lived and creates the socket at each round
+    if almighty_socket:
+        almighty_socket.close()
+
     almighty_socket = zmq_context.socket(zmq.PUSH)
     almighty_socket.connect("tcp://" + server_hostname + ":" + server_port)
 
@@ -141,11 +152,6 @@ def create_almighty_socket(server_hostname: str, server_port: str):  # pragma: n
 def notify_almighty(
     cmd: str, job_id: Optional[int] = None, args: Optional[List[str]] = None
 ) -> bool:  # pragma: no cover
-    if not almighty_socket:
-        create_almighty_socket(
-            config["SERVER_HOSTNAME"], config["APPENDICE_SERVER_PORT"]
-        )
-
     message = {"cmd": cmd}
     if job_id:
         message["job_id"] = job_id
@@ -153,10 +159,16 @@ def notify_almighty(
         message["args"] = args
 
     completed = True
-    try:
-        almighty_socket.send_json(message)
-    except zmq.ZMQError:
-        completed = False
+    # zmq sockets must not be used concurrently (bipbip launches jobs in threads)
+    with almighty_socket_lock:
+        if not almighty_socket:
+            create_almighty_socket(
+                config["SERVER_HOSTNAME"], config["APPENDICE_SERVER_PORT"]
+            )
+        try:
+            almighty_socket.send_json(message)
+        except zmq.ZMQError:
+            completed = False
     return completed
 
 
@@ -224,6 +236,29 @@ def notify_tcp_socket(addr, port, message):  # pragma: no cover
 
 def pingchecker(hosts):  # pragma: no cover
     """Check compute nodes remotely accordindly to method specified in oar.conf"""
+    if config["PINGCHECKER_STREAMING"] == "yes":
+        (pingcheck, bad_hosts, _) = pingchecker_stream(hosts)
+        return (pingcheck, bad_hosts)
+
+    (cmd, filter_output, ip2hostname, pipe_hosts, add_bad_hosts) = pingchecker_command(
+        hosts
+    )
+    return pingchecker_exec_command(
+        cmd, hosts, filter_output, ip2hostname, pipe_hosts, add_bad_hosts
+    )
+
+
+def pingchecker_no_output(line, _):
+    return None
+
+
+def pingchecker_command(hosts):
+    """
+    Return the command which checks the hosts, accordindly to method specified in
+    oar.conf, with the function which extracts a host from a line of its output, the
+    mapping of ip addresses to hosts, the hosts to send on its standard input and if
+    the hosts extracted from the output are the bad ones.
+    """
     cmd = ""
     ip2hostname = {}
     pipe_hosts = None
@@ -290,10 +325,9 @@ def pingchecker(hosts):  # pragma: no cover
 
     else:
         tools_logger.debug("[PingChecker] no PINGCHECKER configuration found")
+        filter_output = pingchecker_no_output
 
-    return pingchecker_exec_command(
-        cmd, hosts, filter_output, ip2hostname, pipe_hosts, add_bad_hosts
-    )
+    return (cmd, filter_output, ip2hostname, pipe_hosts, add_bad_hosts)
 
 
 def pingchecker_exec_command(
@@ -338,6 +372,112 @@ def pingchecker_exec_command(
         return (1, list(bad_hosts.keys()))
 
 
+async def pingchecker_stream_shard(hosts, timeout, log=tools_logger):
+    """
+    Check hosts with one checker process whose output is read line by line.
+    On timeout, the checker (and its children) is killed and the hosts which have not
+    answered are bad ones.
+
+    :return: the bad hosts and, for the others, the seconds taken to get their answer
+    """
+    (cmd, filter_output, ip2hostname, pipe_hosts, add_bad_hosts) = pingchecker_command(
+        hosts
+    )
+    log.debug("[PingChecker] command to run : {}".format(cmd))
+
+    env = os.environ.copy()
+    env["ENV"] = ""
+    env["IFS"] = ""
+
+    hosts_set = set(hosts)
+    start = time.monotonic()
+    answers = {}
+    p = await asyncio.create_subprocess_shell(
+        cmd,
+        stdin=PIPE,
+        stdout=PIPE,
+        stderr=DEVNULL,
+        env=env,
+        start_new_session=True,
+    )
+
+    async def read_answers():
+        if pipe_hosts:
+            p.stdin.write(pipe_hosts)
+        p.stdin.close()
+        async for line in p.stdout:
+            host = filter_output(line.decode().rstrip("\n"), ip2hostname)
+            if host in hosts_set and host not in answers:
+                answers[host] = time.monotonic() - start
+        await p.wait()
+
+    timed_out = False
+    try:
+        await asyncio.wait_for(read_answers(), timeout)
+    except asyncio.TimeoutError:
+        timed_out = True
+        log.debug(
+            "[PingChecker] TimeoutExpired, {} hosts on {} answered".format(
+                len(answers), len(hosts)
+            )
+        )
+        try:
+            os.killpg(p.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await p.wait()
+
+    if not add_bad_hosts:
+        return ([h for h in hosts if h not in answers], answers)
+
+    # Only bad hosts are printed by the checker
+    if timed_out:
+        return (list(hosts), {})
+    duration = time.monotonic() - start
+    return (
+        [h for h in hosts if h in answers],
+        {h: duration for h in hosts if h not in answers},
+    )
+
+
+def pingchecker_stream(hosts, log=tools_logger):
+    """
+    Check compute nodes like :func:`pingchecker`, but the hosts are split in shards of
+    PINGCHECKER_SHARD_SIZE hosts checked by concurrent processes, whose outputs are read
+    as they arrive. A checker which times out only makes bad the hosts of its shard
+    which have not answered (all the hosts of its shard for sentinelle, fping and
+    generic commands, which only print bad hosts).
+
+    :return: (1, bad hosts, seconds taken to get the answer of each good host)
+    """
+    hosts = list(dict.fromkeys(hosts))
+    shard_size = max(1, int(config["PINGCHECKER_SHARD_SIZE"]))
+    shards = [hosts[i : i + shard_size] for i in range(0, len(hosts), shard_size)]
+    timeout = 2 * config["TIMEOUT_SSH"]
+
+    async def check_shards():
+        return await asyncio.gather(
+            *[pingchecker_stream_shard(shard, timeout, log) for shard in shards]
+        )
+
+    bad_hosts = []
+    latencies = {}
+    if shards:
+        for shard_bad_hosts, shard_latencies in asyncio.run(check_shards()):
+            bad_hosts += shard_bad_hosts
+            latencies.update(shard_latencies)
+
+    slowest_hosts = sorted(latencies.items(), key=lambda x: x[1], reverse=True)[:5]
+    log.debug(
+        "[PingChecker] {} bad hosts on {}, slowest answers: {}".format(
+            len(bad_hosts),
+            len(hosts),
+            ", ".join("{}: {:.3f}s".format(h, t) for h, t in slowest_hosts),
+        )
+    )
+    return (1, bad_hosts, latencies)
+
+
 def send_log_by_email(title, message):  # pragma: no cover
     # raise NotImplementedError("TODO")
     return
@@ -483,7 +623,7 @@ def get_default_suspend_resume_file():
     raise NotImplementedError("TODO")
 
 
-def launch_oarexec(cmd, data_str, oarexec_files):  # pragma: no cover
+def launch_oarexec(cmd, data_str, oarexec_files, env=None):  # pragma: no cover
     """
     Start oarexec
 
@@ -493,6 +633,8 @@ def launch_oarexec(cmd, data_str, oarexec_files):  # pragma: no cover
         data to send to oarexec formated as perl dict (see :mod:`oar.tools.limited_dict2hash_perl`).
     :param str oarexec_files: \
         perl to read and send the content to oarexec # TODO check if this is accurate
+    :param dict env: \
+        environment of the ssh command (the one of the process if None).
     """
     # Prepare string to transfer to perl interpreter on head node
     str_to_transfer = ""
@@ -502,7 +644,7 @@ def launch_oarexec(cmd, data_str, oarexec_files):  # pragma: no cover
     str_to_transfer += "__END__\n" + data_str
 
     # Launch perl interpreter on remote
-    p = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE, shell=True)
+    p = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE, shell=True, env=env)
 
     try:
         out, err = p.communicate(
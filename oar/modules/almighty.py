@@ -56,6 +56,7 @@ nodeChangeState_command = os.path.join(binpath, "oar-node-change-state")
 proxy_appendice_command = os.path.join(binpath, "oar-appendice-proxy")
 bipbip_commander = os.path.join(binpath, "oar-bipbip-commander")
 greta_command = os.path.join(binpath, "oar-greta")
+kao_server_command = os.path.join(binpath, "oar-kao-server")
 
 # This timeout is used to slowdown the main automaton when the
 # command queue is empty, it correspond to a blocking read of
@@ -233,6 +234,10 @@ class Almighty(object):
             "FINAUD_FREQUENCY": "300",
             "LOG_FILE": "/var/log/oar.log",
             "ENERGY_SAVING_INTERNAL": "no",
+            "METASCHEDULER_RESIDENT": "no",
+            "METASCHEDULER_SERVER": "localhost",
+            "METASCHEDULER_PORT": "6673",
+            "METASCHEDULER_TIMEOUT": "600",
         }
 
         config.setdefault_config(DEFAULT_CONFIG)
@@ -254,15 +259,52 @@ class Almighty(object):
         self.config = config
 
     def meta_scheduler(self):
-        """Start :mod:`oar.kao.meta_sched`"""
-        return launch_command(self.meta_sched_command)
+        """Start :mod:`oar.kao.meta_sched`, or request :mod:`oar.modules.kao_server` if it is resident"""
+        if not self.kao_server:
+            return launch_command(self.meta_sched_command)
+
+        try:
+            self.kao_server_socket.send_json({"cmd": "SCHEDULE"})
+            answer = self.kao_server_socket.recv_json()
+            return answer["exit_code"]
+        except zmq.ZMQError as e:
+            logger.error(
+                "Resident meta scheduler does not answer, restart it: " + str(e)
+            )
+            self.kao_server.kill()
+            self.start_kao_server()
+            return launch_command(self.meta_sched_command)
+
+    def start_kao_server(self):
+        """Start :mod:`oar.modules.kao_server` and connect to it"""
+        self.kao_server = tools.Popen(kao_server_command)
+
+        if self.kao_server_socket:
+            self.kao_server_socket.close()
+        self.kao_server_socket = self.context.socket(zmq.REQ)
+        self.kao_server_socket.setsockopt(zmq.LINGER, 0)
+        self.kao_server_socket.RCVTIMEO = (
+            int(self.config["METASCHEDULER_TIMEOUT"]) * 1000
+        )
+        self.kao_server_socket.connect(
+            "tcp://"
+            + self.config["METASCHEDULER_SERVER"]
+            + ":"
+            + self.config["METASCHEDULER_PORT"]
+        )
 
     def start_companions(self):
-        """Start appendice :mod:`oar.modules.appendice_proxy` and :mod:`oar.modules.bipbip_commander` commander processes"""
+        """Start appendice :mod:`oar.modules.appendice_proxy` and :mod:`oar.modules.bipbip_commander` commander processes,
+        and :mod:`oar.modules.kao_server` if the meta scheduler is resident"""
 
         self.appendice_proxy = tools.Popen(proxy_appendice_command)
         self.bipbip_commander = tools.Popen(bipbip_commander)
 
+        self.kao_server = None
+        self.kao_server_socket = None
+        if self.config["METASCHEDULER_RESIDENT"] == "yes":
+            self.start_kao_server()
+
     def time_update(self):
         current = tools.get_time()  # ---> TODO my $current = time; -> ???
 
@@ -10,6 +10,9 @@ import os
 import re
 import socket
 import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 from sqlalchemy.orm import scoped_session, sessionmaker
 
@@ -44,9 +47,11 @@ from oar.lib.tools import (
 
 
 class BipBip(object):
-    def __init__(self, args, config):
+    def __init__(self, args, config, pingchecker=None):
         self.job_id = None
         self.logger = get_logger("oar.modules.bipbip", forward_stderr=True)
+        # Node check of the job (tools.pingchecker if None), see RoundPingChecker
+        self.pingchecker = pingchecker
 
         if not args:
             self.exit_code = 1
@@ -337,7 +342,8 @@ class BipBip(object):
                 self.logger.debug("[" + str(job.id) + "] Check nodes: " + str(hosts))
                 event_type = "PING_CHECKER_NODE_SUSPECTED"
 
-                (pingcheck, bad) = tools.pingchecker(hosts)
+                pingchecker = self.pingchecker or tools.pingchecker
+                (pingcheck, bad) = pingchecker(hosts)
                 if not pingcheck:
                     bad = hosts
                     reason = "timeout triggered"
@@ -484,6 +490,9 @@ class BipBip(object):
 
         # timeout = pro_epi_timeout + config['BIPBIP_OAREXEC_HASHTABLE_SEND_TIMEOUT'] + config['TIMEOUT_SSH']
         cmd = openssh_cmd
+        # The environment is given to the ssh command rather than set in the process
+        # as several jobs can be launched concurrently (see launch_jobs)
+        oarexec_env = dict(os.environ)
         if (
             cpuset_full_path
             and ("cosystem" not in job_types.keys())
@@ -491,10 +500,10 @@ class BipBip(object):
             and (len(hosts) > 0)
         ):
             # for oarsh_shell connection
-            os.environ["OAR_CPUSET"] = cpuset_full_path
+            oarexec_env["OAR_CPUSET"] = cpuset_full_path
             cmd = cmd + " -oSendEnv=OAR_CPUSET "
         else:
-            os.environ["OAR_CPUSET"] = ""
+            oarexec_env["OAR_CPUSET"] = ""
 
         cmd = cmd + " -x" + " -T " + head_node + " perl - " + str(job_id) + " OAREXEC"
 
@@ -535,7 +544,9 @@ class BipBip(object):
             return
 
         # ssh-oarexec exist error
-        if tools.launch_oarexec(cmd, data_to_transfer_str, oarexec_files):
+        if tools.launch_oarexec(
+            cmd, data_to_transfer_str, oarexec_files, env=oarexec_env
+        ):
             set_job_state(session, config, job_id, "Running")
 
             # Notify interactive oarsub
@@ -640,6 +651,88 @@ class BipBip(object):
             return 0
 
 
+class RoundPingChecker(object):
+    """
+    Node check of the jobs of a launching round: the nodes of all the jobs are checked by
+    a single call to :func:`oar.lib.tools.pingchecker` (one fan-out) at the first check,
+    then each job gets the result for its own nodes. If the round check timed out, each
+    job checks its own nodes, so that only the nodes of the jobs whose check times out
+    are suspected.
+
+    :param hosts: nodes of the jobs of the round
+    """
+
+    def __init__(self, hosts):
+        self.hosts = set(hosts)
+        self.pingcheck = None
+        self.bad_hosts = None
+        self.lock = threading.Lock()
+
+    def __call__(self, hosts):
+        if not self.hosts.issuperset(hosts):
+            return tools.pingchecker(hosts)
+        with self.lock:
+            if self.bad_hosts is None:
+                (self.pingcheck, bad_hosts) = tools.pingchecker(sorted(self.hosts))
+                self.bad_hosts = set(bad_hosts)
+        if not self.pingcheck:
+            return tools.pingchecker(hosts)
+        return (self.pingcheck, [h for h in hosts if h in self.bad_hosts])
+
+
+def get_round_hosts(session, job_ids):
+    """Return the nodes, to check, of the jobs to launch."""
+    hosts = []
+    for job_id in job_ids:
+        job = get_job(session, job_id)
+        if not job or job.state != "toLaunch":
+            continue
+        job_types = get_job_types(session, job_id)
+        if ("deploy" in job_types.keys()) or ("cosystem" in job_types.keys()):
+            continue
+        hosts += get_job_current_hostnames(session, job_id)
+    return hosts
+
+
+def launch_jobs(session_factory, config, job_ids, pool_size=1):
+    """
+    Launch the jobs scheduled in the same round (``oar-bipbip --round``), as BipBip does
+    for one job, except that the nodes of all the jobs are checked at once
+    (:class:`RoundPingChecker`) and that the jobs are launched (cpuset initialization,
+    prologue, oarexec) by a pool of pool_size threads, each one with its own session.
+
+    :return: the exit code of BipBip for each job id
+    """
+    logger = get_logger("oar.modules.bipbip", forward_stderr=True)
+
+    session = session_factory()
+    pingchecker = RoundPingChecker(get_round_hosts(session, job_ids))
+    session.close()
+
+    def launch_job(job_id):
+        bipbip = BipBip([job_id], config, pingchecker=pingchecker)
+        session = session_factory()
+        try:
+            bipbip.run(session, config)
+        except Exception as ex:
+            logger.error(
+                "Bipbip.run trouble on job {}: {}\n{}".format(
+                    job_id, ex, traceback.format_exc()
+                )
+            )
+        finally:
+            session.close()
+        return bipbip.exit_code
+
+    if pool_size <= 1:
+        exit_codes = [launch_job(job_id) for job_id in job_ids]
+    else:
+        with ThreadPoolExecutor(max_workers=pool_size) as executor:
+            exit_codes = list(executor.map(launch_job, job_ids))
+
+    return dict(zip(job_ids, exit_codes))
+
+
 def main():  # pragma: no cover
     config, engine = init_oar()
 
@@ -653,13 +746,20 @@ def main():  # pragma: no cover
 
     logger = get_logger("oar.modules.bipbip", forward_stderr=True)
 
-    if len(sys.argv) > 1:
+    if len(sys.argv) > 2 and sys.argv[1] == "--round":
+        # Jobs of a scheduling round, grouped by the bipbip commander
+        exit_codes = launch_jobs(
+            scoped,
+            config,
+            [int(job_id) for job_id in sys.argv[2:]],
+            int(config["BIPBIP_LAUNCH_POOL_SIZE"]),
+        )
+        return max(exit_codes.values())
+    elif len(sys.argv) > 1:
         bipbip = BipBip(sys.argv[1:], config)
         try:
             bipbip.run(session, config)
         except Exception as ex:
-            import traceback
-
             logger.error(
                 "Bipbip.run trouble on job {}: {}\n{}".format(
                     sys.argv[1], ex, traceback.format_exc()
@@ -31,12 +31,16 @@ Example:
 
 import os
 import socket
+import traceback
 from typing import Any
 
 import zmq
+from sqlalchemy.orm import scoped_session, sessionmaker
 
 import oar.lib.tools as tools
-from oar.lib.globals import get_logger, init_config
+from oar.lib.globals import get_logger, init_config, init_oar
+from oar.modules.bipbip import BipBip, launch_jobs
+from oar.modules.leon import Leon
 
 
 def launch_command(command, logger):
@@ -78,6 +82,130 @@ def bipbip_leon_executor(
     # tools.call(cmd_arg)
 
 
+def bipbip_round_executor(job_ids: list[int], bipbip_command: str, logger):
+    """Launch the jobs of a scheduling round with a single bipbip (see oar.modules.bipbip.launch_jobs)"""
+    logger.info(f"executing jobs: {job_ids}")
+
+    cmd_arg = [bipbip_command, "--round"] + [str(job_id) for job_id in job_ids]
+
+    logger.debug("Launching: " + str(cmd_arg))
+
+    launch_command(" ".join(cmd_arg), logger)
+
+
+def execute_bipbip_leon_command(
+    command: dict[str, Any], config, session_factory, logger
+):
+    """Run in-process the BipBip or Leon of the command, return its exit code"""
+    job_id = command["job_id"]
+    logger.info(f"executing job: {job_id}")
+
+    if "job_ids" in command:
+        # Jobs of a round (see bipbip_round_executor)
+        exit_codes = launch_jobs(
+            session_factory,
+            config,
+            command["job_ids"],
+            int(config["BIPBIP_LAUNCH_POOL_SIZE"]),
+        )
+        return max(exit_codes.values())
+
+    if command["cmd"] == "LEONEXTERMINATE":
+        executor = Leon(config, logger, [str(job_id)])
+    else:
+        executor = BipBip([job_id] + command["args"], config)
+
+    session = session_factory()
+    try:
+        if command["cmd"] == "LEONEXTERMINATE":
+            executor.run(session)
+        else:
+            executor.run(session, config)
+    except Exception as ex:
+        logger.error(
+            "{} trouble on job {}: {}\n{}".format(
+                command["cmd"], job_id, ex, traceback.format_exc()
+            )
+        )
+    finally:
+        session.close()
+    return executor.exit_code
+
+
+def bipbip_leon_worker(
+    worker_id, commands, notification_url, config
+):  # pragma: no cover
+    """
+    Warm worker process: receive the commands from the bipbip commander (pipe),
+    run them in-process and report their completion to the commander (zmq).
+    """
+    logger = get_logger("oar.modules.bipbip_commander", forward_stderr=True)
+    logger.info(f"Start bipbip/leon worker {worker_id}")
+
+    # The engine and the zmq context of the commander are not shared with its workers
+    config, engine = init_oar(config)
+    session_factory = scoped_session(sessionmaker(bind=engine))
+    context = zmq.Context()
+    notification = context.socket(zmq.PUSH)
+    notification.connect(notification_url)
+
+    while True:
+        command = commands.recv()
+        exit_code = execute_bipbip_leon_command(
+            command, config, session_factory, logger
+        )
+        notification.send_json(
+            {
+                "job_id": command["job_id"],
+                "cmd": "WORKER_DONE",
+                "worker_id": worker_id,
+                "exit_code": exit_code,
+            }
+        )
+
+
+class BipbipLeonTask(object):
+    """Command executed by a worker, tracked as executor by the bipbip commander"""
+
+    def __init__(self, worker):
+        self.worker = worker
+        self.exitcode = None
+        self.done = False
+
+    def is_alive(self):
+        return (not self.done) and self.worker.process.is_alive()
+
+
+class BipbipLeonWorker(object):
+    """Warm worker process which runs BipBip and Leon in-process (see bipbip_leon_worker)"""
+
+    def __init__(self, worker_id, notification_url, config):
+        self.worker_id = worker_id
+        self.task = None
+        reader, self.commands = tools.Pipe(duplex=False)
+        self.process = tools.Process(
+            target=bipbip_leon_worker,
+            args=(worker_id, reader, notification_url, config),
+            kwargs={},
+        )
+        self.process.daemon = True
+        self.process.start()
+
+    def is_idle(self):
+        return self.task is None and self.process.is_alive()
+
+    def execute(self, command):
+        self.task = BipbipLeonTask(self)
+        self.commands.send(command)
+        return self.task
+
+    def done(self, exit_code):
+        if self.task:
+            self.task.exitcode = exit_code
+            self.task.done = True
+        self.task = None
+
+
 class BipbipCommander(object):
     def __init__(self, config=None):
         if not config:
@@ -91,6 +219,8 @@ class BipbipCommander(object):
             "BIPBIP_COMMANDER_PORT": "6671",
             "MAX_CONCURRENT_JOBS_STARTING_OR_TERMINATING": "25",
             "DETACH_JOB_FROM_SERVER": "1",
+            "BIPBIP_LAUNCH_POOL_SIZE": "0",
+            "BIPBIP_COMMANDER_WORKERS": "0",
             "LOG_FILE": "/var/log/oar.log",
         }
 
@@ -101,6 +231,9 @@ class BipbipCommander(object):
             config["MAX_CONCURRENT_JOBS_STARTING_OR_TERMINATING"]
         )
         self.Detach_oarexec = config["DETACH_JOB_FROM_SERVER"]
+        # Size of the threads pool of a bipbip launching the jobs of a round (0: a bipbip
+        # process per job)
+        self.launch_pool_size = int(config["BIPBIP_LAUNCH_POOL_SIZE"])
 
         # Maximum duration a a bipbip process (after that time the process is killed)
         self.Max_bipbip_process_duration = 30 * 60
@@ -136,28 +269,90 @@ class BipbipCommander(object):
         self.notification = self.context.socket(
             zmq.PULL
         )  # receive zmq formatted OAREXEC / OARRUNJOB / LEONEXTERMINATE
-        self.notification.bind(
+        self.notification_url = (
             "tcp://" + ip_addr_bipbip_commander + ":" + config["BIPBIP_COMMANDER_PORT"]
         )
+        self.notification.bind(self.notification_url)
 
         self.bipbip_leon_commands_to_run = []
         self.bipbip_leon_commands_to_requeue = []
         self.bipbip_leon_executors = {}
 
+        # Warm workers running BipBip and Leon in-process (none: a process per command)
+        self.config = config
+        self.workers = [
+            BipbipLeonWorker(worker_id, self.notification_url, config)
+            for worker_id in range(int(config["BIPBIP_COMMANDER_WORKERS"]))
+        ]
+
     def set_notification_timeout(self, timeout):
         """Set timeout for zmq notification socket"""
         self.notification.RCVTIMEO = timeout
 
+    def queue_command(self, command):
+        """Queue a received command, or release the worker which reports its completion"""
+        self.logger.debug("bipbip commander received notification:" + str(command))
+        if command["cmd"] == "WORKER_DONE":
+            self.workers[command["worker_id"]].done(command["exit_code"])
+        else:
+            self.bipbip_leon_commands_to_run.append(command)
+
+    def receive_pending_commands(self):
+        """Queue the commands already received, without waiting (i.e. a round of jobs to launch)"""
+        while True:
+            try:
+                command = self.notification.recv_json(zmq.NOBLOCK)
+            except zmq.error.Again:
+                return
+            self.queue_command(command)
+
+    def idle_worker(self):
+        """Return an idle worker, None if all are busy"""
+        for worker in self.workers:
+            if worker.is_idle():
+                return worker
+        return None
+
+    def restart_dead_workers(self):
+        for worker_id, worker in enumerate(self.workers):
+            if not worker.process.is_alive():
+                self.logger.error(
+                    "bipbip/leon worker " + str(worker_id) + " died, restart it"
+                )
+                self.workers[worker_id] = BipbipLeonWorker(
+                    worker_id, self.notification_url, self.config
+                )
+
+    def pop_round_job_ids(self, job_ids, nb_max):
+        """
+        Remove from the queue the jobs to launch (OARRUN), without running executor, to
+        launch them with the ones of job_ids (at most nb_max jobs in the round).
+        """
+        job_ids = list(job_ids)
+        commands_to_keep = []
+        for command in self.bipbip_leon_commands_to_run:
+            job_id = command["job_id"]
+            if (
+                len(job_ids) < nb_max
+                and command["cmd"] == "OARRUN"
+                and job_id not in self.bipbip_leon_executors
+                and job_id not in job_ids
+            ):
+                job_ids.append(job_id)
+            else:
+                commands_to_keep.append(command)
+        self.bipbip_leon_commands_to_run = commands_to_keep
+        return job_ids
+
     def run(self, loop=True):
         # TODO: add a shutdown procedure
         while True:
             # add_timeout if bipbip_leon_commands_to_run is not empty
             try:
                 command = self.notification.recv_json()
-                self.logger.debug(
-                    "bipbip commander received notification:" + str(command)
-                )
-                self.bipbip_leon_commands_to_run.append(command)
+                self.queue_command(command)
+                if self.launch_pool_size > 0:
+                    self.receive_pending_commands()
 
             except zmq.error.Again as e:
                 self.logger.debug("Timeout on notification:" + str(e))
@@ -175,6 +370,7 @@ class BipbipCommander(object):
             while (
                 len(self.bipbip_leon_commands_to_run) > 0
                 and len(self.bipbip_leon_executors.keys()) <= self.Max_bipbip_processes
+                and (not self.workers or self.idle_worker())
             ):
                 self.logger.debug("some job to run!")
                 command = self.bipbip_leon_commands_to_run.pop(0)
@@ -195,7 +391,35 @@ class BipbipCommander(object):
                         )
                         self.bipbip_leon_commands_to_requeue.append(command)
 
-                if flag_exec:
+                if (
+                    flag_exec
+                    and self.launch_pool_size > 0
+                    and command["cmd"] == "OARRUN"
+                ):
+                    job_ids = self.pop_round_job_ids(
+                        [job_id],
+                        self.Max_bipbip_processes - len(self.bipbip_leon_executors),
+                    )
+                    if self.workers:
+                        self.logger.info("a worker executes a round")
+                        executor = self.idle_worker().execute(
+                            {"job_id": job_id, "cmd": "OARRUN", "job_ids": job_ids}
+                        )
+                    else:
+                        self.logger.info("starting a new bipbip executor for a round")
+                        executor = tools.Process(
+                            target=bipbip_round_executor,
+                            args=(job_ids, self.bipbip_command, self.logger),
+                            kwargs={},
+                        )
+                        executor.start()
+                    for round_job_id in job_ids:
+                        self.bipbip_leon_executors[round_job_id] = executor
+                elif flag_exec and self.workers:
+                    self.logger.info("a worker executes the command")
+                    executor = self.idle_worker().execute(command)
+                    self.bipbip_leon_executors[job_id] = executor
+                elif flag_exec:
                     # exec
                     self.logger.info("starting a new bl executor")
                     executor = tools.Process(
@@ -224,6 +448,8 @@ class BipbipCommander(object):
                     )
                     del self.bipbip_leon_executors[job_id]
 
+            self.restart_dead_workers()
+
             if self.bipbip_leon_commands_to_run == []:
                 self.set_notification_timeout(-1)
             else:
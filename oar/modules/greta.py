@@ -38,10 +38,14 @@ Example of received message:
 import os
 import os.path
 import pickle
+import queue
 import re
+import shlex
 import socket
 import sys
+import time
 import traceback
+from collections import deque
 from multiprocessing import Pool, TimeoutError
 from typing import List, Union
 
@@ -179,6 +183,8 @@ class Greta(object):
         # Load state if exists
         self.nodes_list_command_running = {}
         self.nodes_list_to_remind = {}
+        # Nodes held back by the wake up rate of the BatchForker before the restart
+        wakeup_nodes = []
         self.greta_status_dump_name = (
             config["OAR_RUNTIME_DIRECTORY"] + "greta_status.dump"
         )
@@ -189,6 +195,7 @@ class Greta(object):
                     "nodes_list_running"
                 ]
                 self.nodes_list_to_remind = greta_status_dump["nodes_list_to_remind"]
+                wakeup_nodes = greta_status_dump.get("wakeup_nodes", [])
 
                 # with open('obj/'+ name + '.pkl', 'wb') as f:
                 #
@@ -225,12 +232,26 @@ class Greta(object):
                     return
                 self.keepalive[properties] = {"nodes": [], "min": int(nb_nodes)}
                 logger.debug("Keepalive(" + properties + ") => " + nb_nodes)
-        self.window_forker = WindowForker(
-            config["ENERGY_SAVING_WINDOW_FORKER_SIZE"],
-            config["ENERGY_SAVING_WINDOW_TIMEOUT"],
-            config,
-            logger,
-        )
+        if int(config["ENERGY_SAVING_COMMAND_BATCH_SIZE"]) > 0:
+            self.window_forker = BatchForker(
+                config["ENERGY_SAVING_WINDOW_FORKER_SIZE"],
+                config["ENERGY_SAVING_WINDOW_TIMEOUT"],
+                config,
+                logger,
+            )
+        else:
+            self.window_forker = WindowForker(
+                config["ENERGY_SAVING_WINDOW_FORKER_SIZE"],
+                config["ENERGY_SAVING_WINDOW_TIMEOUT"],
+                config,
+                logger,
+            )
+        if isinstance(self.window_forker, BatchForker):
+            self.window_forker.wakeup_nodes.extend(wakeup_nodes)
+        else:
+            # Their wake up command was never launched, they can be requested again
+            for node in wakeup_nodes:
+                self.nodes_list_command_running.pop(node, None)
         # TODO
         # my $count_cycles;
         #
@@ -458,6 +479,8 @@ class Greta(object):
                 if cmd == "WAKEUP":
                     # Save the timeout for the nodes to be processed.
                     cmd_info["timeout"] = tools.get_date(session) + timeout
+                    # Used to restart the timeout if the wake up is held back (see BatchForker)
+                    cmd_info["timeout_duration"] = timeout
                     logger.debug(f"wakeup timeout: '{timeout}'")
                     command_toLaunch.append(("WAKEUP", node))
                 elif cmd == "HALT":
@@ -535,6 +558,9 @@ class Greta(object):
                     greta_status_dump = {
                         "nodes_list_running": nodes_list_command_running,
                         "nodes_list_to_remind": nodes_list_to_remind,
+                        "wakeup_nodes": list(
+                            getattr(self.window_forker, "wakeup_nodes", [])
+                        ),
                     }
                     pickle.dump(greta_status_dump, dump_file, pickle.HIGHEST_PROTOCOL)
                 logger.debug("Max cycles reached: suicide. bye bye.")
@@ -663,6 +689,170 @@ class WindowForker(object):
             del self.executors[executor]
 
 
+def batch_command_executor(command, nodes, config, logger):
+    """Execute the sleep or wake up command once for several nodes, their hostnames are
+    put on its STDIN (one hostname by line)."""
+    command_to_exec = (
+        "printf '%s\\n' " + " ".join(shlex.quote(n) for n in nodes) + " | "
+    )
+    if command == "HALT":
+        if "ENERGY_SAVING_NODE_MANAGER_SLEEP_CMD" not in config:
+            logger.error("ENERGY_SAVING_NODE_MANAGER_SLEEP_CMD is undefined")
+        command_to_exec += config["ENERGY_SAVING_NODE_MANAGER_SLEEP_CMD"]
+    else:
+        if "ENERGY_SAVING_NODE_MANAGER_WAKE_UP_CMD" not in config:
+            logger.error("ENERGY_SAVING_NODE_MANAGER_WAKE_UP_CMD is undefined")
+        command_to_exec += config["ENERGY_SAVING_NODE_MANAGER_WAKE_UP_CMD"]
+
+    logger.debug(f"Start batch executor command: {command_to_exec}")
+    result = tools.run(command_to_exec, shell=True, capture_output=True)
+
+    logger.debug(f"called: {result}")
+
+    return result.returncode
+
+
+class BatchForker(object):
+    """
+    Same interface as :class:`WindowForker`, but the nodes of a command are grouped in
+    batches of ENERGY_SAVING_COMMAND_BATCH_SIZE nodes, each batch being one execution of
+    the command (see :func:`batch_command_executor`).
+
+    Nodes to wake up are launched at most ENERGY_SAVING_WAKEUP_RATE per minute (0 for
+    no limit), the remaining ones wait for the next checks, their wake up timeout only
+    starts when they are launched. Completions are received from the pool callbacks,
+    timeouts use a monotonic clock.
+    """
+
+    def __init__(self, window_size, timeout, config, logger):
+        self.config = config
+        self.timeout = timeout
+        self.logger = logger
+        self.pool = Pool(processes=window_size)
+        self.batch_size = int(config["ENERGY_SAVING_COMMAND_BATCH_SIZE"])
+        self.wakeup_rate = int(config["ENERGY_SAVING_WAKEUP_RATE"])
+        # batch id => (nodes, cmd, launching time)
+        self.executors = {}
+        self.batch_id = 0
+        # (batch id, exit status) put by the pool callbacks
+        self.results = queue.SimpleQueue()
+        self.wakeup_nodes = deque()
+        # (launching time, number of nodes) of the wake up batches of the last minute
+        self.wakeup_launches = deque()
+
+    def add_commands_toLaunch(self, session, commands):
+        halt_nodes = []
+        for cmd, node in commands:
+            if cmd == "HALT":
+                halt_nodes.append(node)
+            else:  # cmd == 'WAKEUP'
+                self.wakeup_nodes.append(node)
+
+        for i in range(0, len(halt_nodes), self.batch_size):
+            self.launch_batch(session, "HALT", halt_nodes[i : i + self.batch_size])
+        self.launch_wakeup_batches(session)
+
+    def launch_batch(self, session, cmd, nodes):
+        if cmd == "HALT":
+            add_new_event_with_host(
+                session, "HALT_NODE", 0, f"{len(nodes)} nodes halt request", nodes
+            )
+        else:
+            add_new_event_with_host(
+                session, "WAKEUP_NODE", 0, f"{len(nodes)} nodes wake-up request", nodes
+            )
+
+        self.batch_id += 1
+        batch_id = self.batch_id
+        self.executors[batch_id] = (nodes, cmd, time.monotonic())
+        self.pool.apply_async(
+            batch_command_executor,
+            (cmd, nodes, self.config, self.logger),
+            callback=lambda exit_status: self.results.put((batch_id, exit_status)),
+            error_callback=lambda error: self.results.put((batch_id, error)),
+        )
+
+    def launch_wakeup_batches(self, session, nodes_list_running=None):
+        now = time.monotonic()
+        while self.wakeup_launches and (now - self.wakeup_launches[0][0] >= 60):
+            self.wakeup_launches.popleft()
+
+        launched_nodes = []
+        while self.wakeup_nodes:
+            nb_nodes = min(self.batch_size, len(self.wakeup_nodes))
+            if self.wakeup_rate > 0:
+                nb_nodes = min(
+                    nb_nodes,
+                    self.wakeup_rate - sum(nb for _, nb in self.wakeup_launches),
+                )
+                if nb_nodes <= 0:
+                    self.logger.debug(
+                        f"Wake up rate reached, {len(self.wakeup_nodes)} nodes wait"
+                    )
+                    break
+            nodes = [self.wakeup_nodes.popleft() for _ in range(nb_nodes)]
+            self.wakeup_launches.append((now, nb_nodes))
+            self.launch_batch(session, "WAKEUP", nodes)
+            launched_nodes.extend(nodes)
+
+        # The wake up timeout of a node starts when its batch is launched, so it is
+        # restarted for the nodes just launched and for the ones still held back
+        if nodes_list_running and (launched_nodes or self.wakeup_nodes):
+            date = tools.get_date(session)
+            for node in launched_nodes + list(self.wakeup_nodes):
+                cmd_info = nodes_list_running.get(node)
+                if isinstance(cmd_info, dict) and ("timeout_duration" in cmd_info):
+                    cmd_info["timeout"] = date + cmd_info["timeout_duration"]
+
+    def suspect_nodes(self, session, config, nodes, message):
+        for node in nodes:
+            change_node_state(session, node, "Suspected", config)
+            add_new_event_with_host(
+                session,
+                "LOG_SUSPECTED",
+                0,
+                "Node " + node + " was suspected because " + message,
+                [node],
+            )
+
+    def check_executors(self, session, config, nodes_list_running):
+        while True:
+            try:
+                batch_id, exit_status = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if batch_id not in self.executors:
+                # Already removed on timeout
+                continue
+            nodes, cmd, _ = self.executors.pop(batch_id)
+            if exit_status != 0:
+                self.suspect_nodes(
+                    session,
+                    config,
+                    nodes,
+                    "an error occurred with a command launched by Greta",
+                )
+            elif cmd == "HALT":  # WAKEUP case is addressed in main run loop
+                for node in nodes:
+                    nodes_list_running.pop(node, None)
+
+        now = time.monotonic()
+        for batch_id, (nodes, cmd, launching_time) in list(self.executors.items()):
+            if now - launching_time > self.timeout:
+                del self.executors[batch_id]
+                if cmd == "HALT":  # WAKEUP case is addressed in main run loop
+                    self.suspect_nodes(
+                        session,
+                        config,
+                        nodes,
+                        "shutdown command launched by Greta timeouted",
+                    )
+                    for node in nodes:
+                        nodes_list_running.pop(node, None)
+
+        self.launch_wakeup_batches(session, nodes_list_running)
+
+
 def main():  # pragma: no cover
     config = init_config()
 
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Resident meta scheduler. Instead of launching the ``META_SCHED_CMD`` command at each
+scheduling round, :mod:`oar.modules.almighty` requests this server on a zmq REQ/REP socket
+(when ``METASCHEDULER_RESIDENT="yes"``). The server runs :func:`oar.kao.meta_sched.meta_schedule`
+and answers with its exit code (0, 1 or 2, as the ``kao`` command).
+
+Between rounds it keeps the configuration, the database engine (and its pool of connections),
+the :class:`oar.lib.resource.ResourceSet` (as long as resources do not change), the quotas rules
+(as long as ``QUOTAS_CONF_FILE`` is not modified) and the gantt
+(see :class:`oar.kao.incremental_gantt.IncrementalGantt`).
+
+Example of exchanged messages:
+
+.. code-block:: JSON
+
+    {"cmd": "SCHEDULE"}
+    {"exit_code": 0}
+"""
+import os
+import socket
+import sys
+import traceback
+
+import zmq
+from sqlalchemy import text
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+import oar.kao.meta_sched as meta_sched
+from oar.kao.incremental_gantt import IncrementalGantt
+from oar.kao.platform import Platform
+from oar.kao.quotas import Quotas
+from oar.kao.round_profiler import RoundProfiler
+from oar.lib.globals import get_logger, init_oar
+from oar.lib.models import Resource
+from oar.lib.resource import ResourceSet
+from oar.lib.resource_properties import VOLATILE_COLUMNS
+
+logger = get_logger("oar.modules.kao_server", forward_stderr=True)
+
+
+def resources_fingerprint(session, config):
+    """
+    Return the resources' fields, in scheduling order, from which a :class:`ResourceSet` is built.
+
+    All the columns are taken as they are also used to evaluate jobs' properties, except
+    the volatile ones (see :mod:`oar.lib.resource_properties`).
+    """
+    columns = [
+        column
+        for column in Resource.__table__.columns
+        if column.name not in VOLATILE_COLUMNS
+    ]
+    return [
+        tuple(row)
+        for row in session.query(*columns)
+        .order_by(text(config["SCHEDULER_RESOURCE_ORDER"]))
+        .all()
+    ]
+
+
+class ResidentPlatform(Platform):
+    """
+    :class:`Platform` which keeps the resource set and the quotas rules between scheduling rounds.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.resources_fingerprint = None
+        self.cached_resource_set = None
+        self.quotas_rules_key = None
+
+    def new_round(self, session, config):
+        """Forget the resource set if resources have changed since the previous round."""
+        fingerprint = resources_fingerprint(session, config)
+        if fingerprint != self.resources_fingerprint:
+            self.resources_fingerprint = fingerprint
+            self.cached_resource_set = None
+
+    def reset(self):
+        self.resources_fingerprint = None
+        self.cached_resource_set = None
+        self.quotas_rules_key = None
+
+    def resource_set(self, session=None, config=None):
+        if self.cached_resource_set is None:
+            self.cached_resource_set = ResourceSet(session, config)
+        return self.cached_resource_set
+
+    def enable_quotas(self, config, resource_set):
+        quotas_rules_filename = config["QUOTAS_CONF_FILE"]
+        quotas_rules_key = (
+            quotas_rules_filename,
+            os.path.getmtime(quotas_rules_filename),
+            resource_set.nb_resources_default,
+            resource_set.nb_resources_default_not_dead,
+        )
+        if quotas_rules_key != self.quotas_rules_key:
+            Quotas.calendar = None
+            Quotas.default_rules = {}
+            Quotas.job_types = ["*"]
+            Quotas.enable(config, resource_set)
+            self.quotas_rules_key = quotas_rules_key
+        else:
+            Quotas.enabled = True
+
+
+class KaoServer(object):
+    def __init__(self, config, scoped):
+        self.config = config
+        self.scoped = scoped
+
+        self.plt = ResidentPlatform()
+        self.gantt = IncrementalGantt(config)
+        self.profiler = RoundProfiler(config)
+
+        # Initialize zeromq context
+        self.context = zmq.Context()
+        # IP addr is required when bind function is used on zmq socket
+        ip_addr_server = socket.gethostbyname(config["METASCHEDULER_SERVER"])
+        self.socket = self.context.socket(zmq.REP)
+        self.socket.bind(
+            "tcp://" + ip_addr_server + ":" + str(config["METASCHEDULER_PORT"])
+        )
+
+    def schedule(self):
+        """Run a meta scheduling round and return its exit code."""
+        session = self.scoped()
+        # The jobs to launch are notified once per round
+        meta_sched.to_launch_jobs_already_treated.clear()
+        try:
+            self.plt.new_round(session, self.config)
+            exit_code = meta_sched.meta_schedule(
+                session,
+                self.config,
+                self.config["METASCHEDULER_MODE"],
+                self.plt,
+                self.gantt,
+                self.profiler,
+            )
+        except Exception as err:
+            logger.error(
+                f"Meta scheduling round failed: {err=}; {traceback.format_exc()}"
+            )
+            session.rollback()
+            # Start again from scratch at next round
+            self.plt.reset()
+            self.gantt.reset()
+            exit_code = 1
+        finally:
+            # Give back the connection to the pool until next round
+            session.close()
+
+        return exit_code
+
+    def run(self, loop=True):
+        while True:
+            request = self.socket.recv_json()
+            logger.debug("kao server received: " + str(request))
+
+            if request and request.get("cmd") == "SCHEDULE":
+                exit_code = self.schedule()
+            else:
+                logger.error("Unknown request: " + str(request))
+                exit_code = -1
+
+            self.socket.send_json({"exit_code": exit_code})
+
+            if not loop:
+                break
+
+
+def main():  # pragma: no cover
+    config, engine = init_oar()
+
+    session_factory = sessionmaker(bind=engine)
+    scoped = scoped_session(session_factory)
+
+    kao_server = KaoServer(config, scoped)
+    kao_server.run()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
@@ -24,6 +24,7 @@ from oar.lib.event import (
 from oar.lib.globals import get_logger, init_oar
 from oar.lib.job_handling import (
     frag_job,
+    frag_jobs,
     get_cpuset_values,
     get_job,
     get_job_cpuset_name,
@@ -37,11 +38,11 @@ from oar.lib.job_handling import (
 from oar.lib.node import get_all_resources_on_node, set_node_state
 from oar.lib.queue import stop_all_queues
 from oar.lib.resource_handling import (
-    get_resource,
-    get_resource_job_to_frag,
     get_resources_change_state,
-    set_resource_nextState,
-    set_resource_state,
+    get_resources_from_ids,
+    get_resources_jobs_to_frag,
+    set_resources_nextState,
+    set_resources_state,
 )
 
 
@@ -333,13 +334,18 @@ class NodeChangeState(object):
         debug_info = {}
         if resources_to_change:
             self.exit_code = 1
-            for r_id, next_state in resources_to_change.items():
-                resource = get_resource(session, r_id)
+            # Resources are grouped by target state (and finaud decision) to update
+            # them, and log their state, with one statement per group
+            to_change_groups = {}
+            for resource in get_resources_from_ids(
+                session, list(resources_to_change.keys())
+            ):
+                r_id = resource.id
+                next_state = resources_to_change[r_id]
                 if resource.state != next_state:
-                    set_resource_state(
-                        session, r_id, next_state, resource.next_finaud_decision
-                    )
-                    set_resource_nextState(session, r_id, "UnChanged")
+                    to_change_groups.setdefault(
+                        (next_state, resource.next_finaud_decision), []
+                    ).append(resource)
 
                     if resource.network_address not in debug_info:
                         debug_info[resource.network_address] = {}
@@ -349,18 +355,6 @@ class NodeChangeState(object):
                         self.resources_to_heal.append(
                             str(r_id) + " " + resource.network_address
                         )
-
-                    if (next_state == "Dead") or (next_state == "Absent"):
-                        job_ids = get_resource_job_to_frag(session, r_id)
-                        for job_id in job_ids:
-                            logger.debug(
-                                resource.network_address
-                                + ": must kill job "
-                                + str(job_id)
-                            )
-                            frag_job(session, job_id)
-                            self.exit_code = 2
-
                 else:
                     logger.debug(
                         "("
@@ -371,7 +365,31 @@ class NodeChangeState(object):
                         + next_state
                         + " state"
                     )
-                    set_resource_nextState(session, r_id, "UnChanged")
+
+            to_frag_resources = {}
+            for (next_state, finaud_decision), resources in to_change_groups.items():
+                set_resources_state(
+                    session, [r.id for r in resources], next_state, finaud_decision
+                )
+                if (next_state == "Dead") or (next_state == "Absent"):
+                    to_frag_resources.update({r.id: r for r in resources})
+            # Commits the state changes
+            set_resources_nextState(session, resources_to_change.keys(), "UnChanged")
+
+            job_ids = []
+            for r_id, job_id in get_resources_jobs_to_frag(
+                session, list(to_frag_resources.keys())
+            ):
+                logger.debug(
+                    to_frag_resources[r_id].network_address
+                    + ": must kill job "
+                    + str(job_id)
+                )
+                if job_id not in job_ids:
+                    job_ids.append(job_id)
+            if job_ids:
+                frag_jobs(session, job_ids)
+                self.exit_code = 2
 
         email = None
         for network_address, rid_next_state in debug_info.items():
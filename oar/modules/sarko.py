@@ -18,20 +18,25 @@ import sys
 from sqlalchemy.orm import scoped_session, sessionmaker
 
 import oar.lib.tools as tools
-from oar.lib.event import add_new_event, add_new_event_with_host
+from oar.lib.event import add_new_event, add_new_event_with_host, add_new_events
 from oar.lib.globals import get_logger, init_oar
 from oar.lib.job_handling import (
     frag_job,
+    frag_jobs,
     get_current_moldable_job,
     get_frag_date,
     get_job_current_hostnames,
     get_job_suspended_sum_duration,
     get_job_types,
     get_jobs_in_state,
+    get_jobs_suspended_sum_duration,
+    get_running_jobs_deadlines,
     get_timer_armed_job,
+    get_timer_armed_jobs_frag_date,
     job_fragged,
     job_leon_exterminate,
     job_refrag,
+    set_jobs_frag_state,
 )
 from oar.lib.resource_handling import (
     get_absent_suspected_resources_for_a_timeout,
@@ -90,6 +95,14 @@ class Sarko(object):
 
         date = tools.get_date(session)
 
+        if config["SARKO_SWEEP"] == "yes":
+            self.sweep_leon_timers(session, date, leon_soft_walltime, leon_walltime)
+            self.sweep_walltimes(
+                session, date, cosystem_hostname, deploy_hostname, openssh_cmd
+            )
+            self.check_resources(session)
+            return
+
         # Look at leon timers
         # Decide if OAR must retry to delete the job or just change values in the database
         for job in get_timer_armed_job(session):
@@ -156,49 +169,15 @@ class Sarko(object):
             elif (job.checkpoint > 0) and (
                 date >= (start_time + max_time - job.checkpoint)
             ):
-                # OAR must notify the job to checkpoint itself
-                logger.debug("Send checkpoint signal to the job:" + str(job.id))
-                # Retrieve node names used by the job
-                hosts = get_job_current_hostnames(session, job.id)
-                job_types = get_job_types(session, job.id)
-                head_host = None
-                # deploy, cosystem and no host part
-                if ("cosystem" in job_types.keys()) or (len(hosts) == 0):
-                    head_host = cosystem_hostname
-                elif "deploy" in job_types.keys():
-                    head_host = deploy_hostname
-                elif len(hosts) != 0:
-                    head_host = hosts[0]
-
-                add_new_event(
-                    session,
-                    "CHECKPOINT",
-                    job.id,
-                    "User oar (sarko) requested a checkpoint on the job:"
-                    + str(job.id)
-                    + " on "
-                    + head_host,
+                self.checkpoint_job(
+                    session, job.id, cosystem_hostname, deploy_hostname, openssh_cmd
                 )
 
-                comment = tools.signal_oarexec(
-                    head_host, job.id, "SIGUSR2", 1, openssh_cmd
-                )
-                if comment:
-                    logger.warning(comment)
-                    add_new_event(
-                        session, "CHECKPOINT_ERROR", job.id, "[Sarko]" + comment
-                    )
-                else:
-                    comment = (
-                        "The job "
-                        + str(job.id)
-                        + " was notified to checkpoint itself on the node "
-                        + head_host
-                    )
-                    logger.debug(comment)
-                    add_new_event(
-                        session, "CHECKPOINT_SUCCESSFULL", job.id, "[Sarko]" + comment
-                    )
+        self.check_resources(session)
+
+    def check_resources(self, session):
+        config = self.conf
+        logger = self.logger
 
         # Retrieve nodes with expiry_dates in the past
         # special for Desktop computing (UNUSED ?)
@@ -236,6 +215,116 @@ class Sarko(object):
             if notify:
                 tools.notify_almighty("ChState")
 
+    def sweep_leon_timers(self, session, date, leon_soft_walltime, leon_walltime):
+        """Look at leon timers, as the run loop does, for all the jobs at once"""
+        logger = self.logger
+        frag_states = {"FRAGGED": [], "LEON": [], "LEON_EXTERMINATE": []}
+        for job_id, state, frag_date in get_timer_armed_jobs_frag_date(session):
+            if state in ["Terminated", "Error", "Finishing"]:
+                frag_states["FRAGGED"].append(job_id)
+            elif (date > (frag_date + leon_soft_walltime)) and (
+                date <= (frag_date + leon_walltime)
+            ):
+                frag_states["LEON"].append(job_id)
+            elif date > (frag_date + leon_walltime):
+                frag_states["LEON_EXTERMINATE"].append(job_id)
+
+        if frag_states["LEON"] or frag_states["LEON_EXTERMINATE"]:
+            self.guilty_found = 1
+        for frag_state, job_ids in frag_states.items():
+            if job_ids:
+                logger.debug("Set frag state to " + frag_state + ": " + str(job_ids))
+                set_jobs_frag_state(session, job_ids, frag_state)
+
+    def sweep_walltimes(
+        self, session, date, cosystem_hostname, deploy_hostname, openssh_cmd
+    ):
+        """
+        Look at job walltimes, as the run loop does, from the deadlines of all the
+        running jobs retrieved at once: only the jobs whose walltime or checkpoint date
+        is reached are treated, and expired jobs are fragged together.
+        """
+        logger = self.logger
+        jobs = get_running_jobs_deadlines(session, date)
+        suspended_durations = get_jobs_suspended_sum_duration(
+            session, [job.id for job in jobs if job.suspended == "YES"], date
+        )
+
+        walltime_events = []
+        for job_id, start_time, walltime, suspended, checkpoint in jobs:
+            max_time = walltime
+            if suspended == "YES":
+                max_time = suspended_durations[job_id]
+
+            msg = (
+                "Job: "
+                + str(job_id)
+                + " from "
+                + str(start_time)
+                + " with "
+                + str(max_time)
+                + "; current time="
+                + str(date)
+            )
+            logger.debug(msg)
+
+            if date > (start_time + max_time):
+                logger.debug("--> walltime reached")
+                walltime_events.append(("WALLTIME", job_id, msg + " (Elapsed)"))
+            elif (checkpoint > 0) and (date >= (start_time + max_time - checkpoint)):
+                self.checkpoint_job(
+                    session, job_id, cosystem_hostname, deploy_hostname, openssh_cmd
+                )
+
+        if walltime_events:
+            self.guilty_found = 1
+            frag_jobs(session, [job_id for (_, job_id, _) in walltime_events])
+            add_new_events(session, walltime_events)
+
+    def checkpoint_job(
+        self, session, job_id, cosystem_hostname, deploy_hostname, openssh_cmd
+    ):
+        logger = self.logger
+        # OAR must notify the job to checkpoint itself
+        logger.debug("Send checkpoint signal to the job:" + str(job_id))
+        # Retrieve node names used by the job
+        hosts = get_job_current_hostnames(session, job_id)
+        job_types = get_job_types(session, job_id)
+        head_host = None
+        # deploy, cosystem and no host part
+        if ("cosystem" in job_types.keys()) or (len(hosts) == 0):
+            head_host = cosystem_hostname
+        elif "deploy" in job_types.keys():
+            head_host = deploy_hostname
+        elif len(hosts) != 0:
+            head_host = hosts[0]
+
+        add_new_event(
+            session,
+            "CHECKPOINT",
+            job_id,
+            "User oar (sarko) requested a checkpoint on the job:"
+            + str(job_id)
+            + " on "
+            + head_host,
+        )
+
+        comment = tools.signal_oarexec(head_host, job_id, "SIGUSR2", 1, openssh_cmd)
+        if comment:
+            logger.warning(comment)
+            add_new_event(session, "CHECKPOINT_ERROR", job_id, "[Sarko]" + comment)
+        else:
+            comment = (
+                "The job "
+                + str(job_id)
+                + " was notified to checkpoint itself on the node "
+                + head_host
+            )
+            logger.debug(comment)
+            add_new_event(
+                session, "CHECKPOINT_SUCCESSFULL", job_id, "[Sarko]" + comment
+            )
+
 
 def main():  # pragma: no cover
     config, engine = init_oar()
@@ -71,6 +71,7 @@ setup(
     oar-bipbip-commander=oar.modules.bipbip_commander:main
     oar-appendice-proxy=oar.modules.appendice_proxy:main
     oar-greta=oar.modules.greta:main
+    oar-kao-server=oar.modules.kao_server:main
     .oarsub=oar.cli.oarsub:cli
     .oarstat=oar.cli.oarstat:cli
     .oardel=oar.cli.oardel:cli
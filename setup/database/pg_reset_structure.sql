@@ -24,5 +24,6 @@ DROP TABLE files;
 DROP TABLE event_logs;
 DROP TABLE event_log_hostnames;
 DROP TABLE accounting;
+DROP TABLE accounting_usage;
 DROP TABLE job_dependencies;
 
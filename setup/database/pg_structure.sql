@@ -21,6 +21,17 @@ CREATE INDEX accounting_project ON accounting (accounting_project);
 CREATE INDEX accounting_queue ON accounting (queue_name);
 CREATE INDEX accounting_type ON accounting (consumption_type);
 
+CREATE TABLE accounting_usage (
+  window_start bigint NOT NULL ,
+  window_stop bigint NOT NULL ,
+  accounting_user varchar(255) NOT NULL default '',
+  accounting_project varchar(255) NOT NULL default '',
+  queue_name varchar(100) NOT NULL default '',
+  consumption_type varchar(5) check (consumption_type in ('ASKED','USED')) NOT NULL default 'ASKED',
+  consumption bigint NOT NULL default '0',
+  PRIMARY KEY  (window_start,window_stop,accounting_user,accounting_project,queue_name,consumption_type)
+);
+
 
 CREATE TABLE admission_rules (
   id bigserial,
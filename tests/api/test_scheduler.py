@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+import json
+
+
+def test_scheduler_rounds_not_enabled(client, monkeypatch, setup_config):
+    config, _ = setup_config
+    monkeypatch.setitem(config, "SCHEDULER_ROUND_PROFILE_FILE", "")
+    res = client.get("/scheduler/rounds")
+
+    assert res.status_code == 404
+
+
+def test_scheduler_rounds(client, monkeypatch, tmp_path, setup_config):
+    config, _ = setup_config
+    profile_file = tmp_path / "rounds.jsonl"
+    monkeypatch.setitem(config, "SCHEDULER_ROUND_PROFILE_FILE", str(profile_file))
+
+    res = client.get("/scheduler/rounds")
+    assert res.status_code == 200
+    assert res.json()["items"] == []
+
+    with open(profile_file, "w") as f:
+        for date in range(5):
+            record = {"date": date, "duration": 0.1, "queries": 3, "rows": 10}
+            f.write(json.dumps(record) + "\n")
+
+    res = client.get("/scheduler/rounds?limit=2")
+    assert res.status_code == 200
+    assert res.json()["total"] == 2
+    assert [r["date"] for r in res.json()["items"]] == [3, 4]
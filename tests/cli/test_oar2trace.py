@@ -1,14 +1,20 @@
 # coding: utf-8
+import gzip
+import os
+
 import pytest
 from click.testing import CliRunner
 from sqlalchemy.orm import scoped_session, sessionmaker
 
+import oar.cli.oar2trace
 from oar.cli.oar2trace import cli
 from oar.kao.meta_sched import meta_schedule
 from oar.lib.database import ephemeral_session
 from oar.lib.job_handling import insert_job, set_job_state
 from oar.lib.models import Job, Resource
 
+from ..helpers import insert_terminated_jobs
+
 NB_NODES = 5
 
 
@@ -29,7 +35,7 @@ def minimal_db_initialization(request, setup_config):
 def test_oar2trace_void(minimal_db_initialization, setup_config):
     config, _ = setup_config
     runner = CliRunner()
-    result = runner.invoke(cli, ["-p"])
+    result = runner.invoke(cli, ["-p"], obj=(minimal_db_initialization, config))
     assert result.exit_code == 1
 
 
@@ -48,3 +54,105 @@ def test_oar2trace_simple(minimal_db_initialization, setup_config):
     runner = CliRunner()
     result = runner.invoke(cli, ["-p"])
     assert result.exit_code == 0
+
+
+def trace_lines(filename, opener=open):
+    with opener(filename, "rt") as f:
+        # The extraction UUID differs between exports
+        return [line for line in f if "Extraction UUDI" not in line]
+
+
+@pytest.fixture(scope="function")
+def terminated_jobs(minimal_db_initialization):
+    job_ids = insert_terminated_jobs(
+        minimal_db_initialization, update_accounting=False, nb_jobs=4
+    )
+    # Not traced
+    insert_job(minimal_db_initialization, res=[(100, [("resource_id=1", "")])])
+    minimal_db_initialization.query(Job).filter(Job.id == job_ids[1]).update(
+        {Job.state: "Error"}, synchronize_session=False
+    )
+    job_ids += insert_terminated_jobs(
+        minimal_db_initialization, update_accounting=False, nb_jobs=3
+    )
+    return job_ids
+
+
+@pytest.mark.parametrize("mode", ["swf", "owf"])
+def test_oar2trace_stream(
+    minimal_db_initialization, setup_config, terminated_jobs, mode
+):
+    config, _ = setup_config
+    runner = CliRunner()
+    obj = (minimal_db_initialization, config)
+    with runner.isolated_filesystem():
+        result = runner.invoke(cli, ["-m", mode, "-f", "trace"], obj=obj)
+        assert result.exit_code == 0
+        result = runner.invoke(
+            cli,
+            ["-m", mode, "-f", "trace_stream", "--stream", "--chunk-size", "2"],
+            obj=obj,
+        )
+        assert result.exit_code == 0
+        assert result.output.count("Chunck") == 4
+
+        result = runner.invoke(
+            cli,
+            ["-m", mode, "-f", "trace.gz", "--stream", "-z", "gzip"],
+            obj=obj,
+        )
+        assert result.exit_code == 0
+
+        lines = trace_lines("trace")
+        job_lines = [line for line in lines if not line.startswith(";")]
+        assert len(job_lines) == len(terminated_jobs)
+        # 2 resources per job
+        nb_resources_column = 4 if mode == "swf" else 5
+        assert all(line.split()[nb_resources_column] == "2" for line in job_lines)
+        assert trace_lines("trace_stream") == lines
+        assert trace_lines("trace.gz", gzip.open) == lines
+        assert not os.path.exists("trace_stream.checkpoint")
+
+
+def test_oar2trace_stream_resume(
+    minimal_db_initialization, setup_config, terminated_jobs, monkeypatch
+):
+    config, _ = setup_config
+    runner = CliRunner()
+    obj = (minimal_db_initialization, config)
+    args = ["-f", "trace.gz", "--stream", "-z", "gzip", "--chunk-size", "3"]
+    with runner.isolated_filesystem():
+        result = runner.invoke(cli, ["-f", "trace"], obj=obj)
+        assert result.exit_code == 0
+
+        jobs2trace = oar.cli.oar2trace.jobs2trace
+        nb_calls = []
+
+        def interrupted_jobs2trace(*args):
+            nb_calls.append(1)
+            if len(nb_calls) == 2:
+                raise KeyboardInterrupt()
+            jobs2trace(*args)
+
+        monkeypatch.setattr(oar.cli.oar2trace, "jobs2trace", interrupted_jobs2trace)
+        result = runner.invoke(cli, args, obj=obj)
+        assert result.exit_code != 0
+        assert os.path.exists("trace.gz.checkpoint")
+        # Partially written data after the checkpoint
+        with open("trace.gz", "ab") as f:
+            f.write(b"garbage")
+
+        monkeypatch.setattr(oar.cli.oar2trace, "jobs2trace", jobs2trace)
+        result = runner.invoke(cli, args + ["--resume"], obj=obj)
+        assert result.exit_code == 0
+        assert "Resume from job id" in result.output
+        assert not os.path.exists("trace.gz.checkpoint")
+        assert trace_lines("trace.gz", gzip.open) == trace_lines("trace")
+
+        # A checkpoint of another export is refused
+        monkeypatch.setattr(oar.cli.oar2trace, "jobs2trace", interrupted_jobs2trace)
+        nb_calls.clear()
+        runner.invoke(cli, args, obj=obj)
+        monkeypatch.setattr(oar.cli.oar2trace, "jobs2trace", jobs2trace)
+        result = runner.invoke(cli, args + ["--resume", "-m", "owf"], obj=obj)
+        assert result.exit_code == 1
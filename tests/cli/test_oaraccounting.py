@@ -9,7 +9,7 @@ import oar.lib.tools  # for monkeypatching
 from oar.cli.oaraccounting import cli as oaraccounting
 from oar.cli.oarstat import cli
 from oar.lib.database import ephemeral_session
-from oar.lib.models import Accounting, Queue, Resource
+from oar.lib.models import Accounting, AccountingUsage, Queue, Resource
 
 from ..helpers import insert_terminated_jobs
 
@@ -104,3 +104,27 @@ def test_oaraccounting_delete_before(
     accounting2 = minimal_db_initialization.query(Accounting).all()
 
     assert len(accounting1) > len(accounting2)
+
+
+def test_oaraccounting_usage_summary(
+    monkeypatch, minimal_db_initialization, setup_config
+):
+    config, _ = setup_config
+    monkeypatch.setitem(config, "SCHEDULER_FAIRSHARING_USAGE_SUMMARY", "yes")
+    monkeypatch.setitem(config, "SCHEDULER_FAIRSHARING_WINDOW_SIZE", 5 * 86400)
+    insert_terminated_jobs(minimal_db_initialization, update_accounting=False)
+    runner = CliRunner()
+    runner.invoke(
+        oaraccounting, obj=(minimal_db_initialization, config), catch_exceptions=False
+    )
+
+    usage = minimal_db_initialization.query(AccountingUsage).all()
+    # Windows of days 5 to 9 (get_date is 864000, the start of day 10)
+    assert {(u.window_start, u.window_stop) for u in usage} == {
+        (5 * 86400, 10 * 86400 - 1)
+    }
+    # 5 jobs of 2 resources during these days
+    assert {(u.consumption_type, u.consumption) for u in usage} == {
+        ("USED", 5 * 5 * 2 * 86400),
+        ("ASKED", 5 * 5 * 2 * 86400),
+    }
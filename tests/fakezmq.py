@@ -1,4 +1,5 @@
 # coding: utf-8
+import zmq
 
 
 class Singleton(type):
@@ -53,8 +54,11 @@ class FakeZmqSocket(object):
             else:
                 return msg.encode("utf8")
 
-    def recv_json(self):
-        return self._pop_msg()
+    def recv_json(self, flags=0):
+        msg = self._pop_msg()
+        if msg is None and flags & zmq.NOBLOCK:
+            raise zmq.error.Again()
+        return msg
 
     def recv(self):
         return self.recv_json()
@@ -14,8 +14,9 @@ import oar.lib.tools  # for monkeypatching
 from oar.kao.meta_sched import meta_schedule
 from oar.kao.quotas import Quotas
 from oar.lib.database import ephemeral_session
+from oar.lib.event import add_new_event_with_host
 from oar.lib.job_handling import insert_job, set_job_state, set_jobs_start_time
-from oar.lib.models import GanttJobsPrediction, Job, Queue, Resource
+from oar.lib.models import EventLog, GanttJobsPrediction, Job, Queue, Resource
 from oar.lib.tools import get_date, local_to_sql
 
 from ..fakezmq import FakeZmq
@@ -780,6 +781,39 @@ def test_db_all_in_one_sleep_node_1(
     ]
 
 
+def test_db_all_in_one_sleep_node_woken_up_recently(
+    monkeypatch, minimal_db_initialization, setup_config, active_energy_saving
+):
+    config = active_energy_saving
+
+    now = get_date(minimal_db_initialization)
+
+    insert_job(
+        minimal_db_initialization, res=[(60, [("resource_id=1", "")])], properties=""
+    )
+
+    minimal_db_initialization.query(Resource).update(
+        {Resource.available_upto: now + 50000}, synchronize_session=False
+    )
+    minimal_db_initialization.commit()
+    # localhost1 was woken up an old time ago, localhost2 just now
+    add_new_event_with_host(
+        minimal_db_initialization, "WAKEUP_NODE", 0, "wake up", ["localhost1"]
+    )
+    minimal_db_initialization.query(EventLog).update(
+        {EventLog.date: now - 1000}, synchronize_session=False
+    )
+    add_new_event_with_host(
+        minimal_db_initialization, "WAKEUP_NODE", 0, "wake up", ["localhost2"]
+    )
+    meta_schedule(minimal_db_initialization, config, "internal")
+
+    job = minimal_db_initialization.query(Job).one()
+    print(node_list)
+    assert job.state == "toLaunch"
+    assert node_list == ["localhost1"]
+
+
 def test_db_all_in_one_wakeup_node_energy_saving_internal_1(
     monkeypatch, minimal_db_initialization, setup_config, active_energy_saving
 ):
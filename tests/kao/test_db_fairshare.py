@@ -8,9 +8,17 @@ from sqlalchemy import delete, insert
 from sqlalchemy.orm import scoped_session, sessionmaker
 
 from oar.kao.kamelot import schedule_cycle
+from oar.kao.karma import (
+    evaluate_jobs_karma,
+    get_sum_accounting_by_project,
+    get_sum_accounting_by_user,
+    get_sum_accounting_usage,
+    get_sum_accounting_window,
+)
 from oar.kao.platform import Platform
+from oar.lib.accounting import accounting_usage_range, update_accounting_usage
 from oar.lib.database import ephemeral_session
-from oar.lib.job_handling import insert_job
+from oar.lib.job_handling import JobPseudo, insert_job
 from oar.lib.models import Accounting, GanttJobsPrediction, Job, Resource
 
 
@@ -148,3 +156,64 @@ def test_db_fairsharing(minimal_db_initialization, setup_config):
 
     for j in req:
         assert r.match(j.message) is not None
+
+
+def test_db_fairsharing_usage_summary(
+    monkeypatch, minimal_db_initialization, setup_config
+):
+    config, _ = setup_config
+    session = minimal_db_initialization
+    window_size = 86400
+    karma_window_size = 10 * window_size
+    now = 30 * window_size + 5000
+
+    del_accounting(session)
+    for consumption_type in ("ASKED", "USED"):
+        accountings = []
+        for day in range(15, 31):
+            for u in range(4):
+                accountings.append(
+                    (
+                        day * window_size,
+                        (day + 1) * window_size - 1,
+                        "proj" + str(u % 2),
+                        "zozo" + str(u),
+                        "default" if u < 3 else "besteffort",
+                        day * 10 + u + (consumption_type == "ASKED"),
+                    )
+                )
+        set_accounting(session, accountings, consumption_type)
+    update_accounting_usage(session, now, karma_window_size, window_size)
+
+    window_start, window_stop = accounting_usage_range(
+        now, karma_window_size, window_size
+    )
+    assert (window_start, window_stop) == (21 * window_size, 30 * window_size - 1)
+    for queues in (["default"], ["default", "besteffort"]):
+        assert get_sum_accounting_usage(session, queues, window_start, window_stop) == (
+            get_sum_accounting_window(session, queues, now - karma_window_size, now),
+            get_sum_accounting_by_project(
+                session, queues, now - karma_window_size, now
+            ),
+            get_sum_accounting_by_user(session, queues, now - karma_window_size, now),
+        )
+    # Summary of another fairsharing window
+    assert get_sum_accounting_usage(session, ["default"], 0, window_stop) is None
+
+    def jobs_karma():
+        jobs = {
+            u: JobPseudo(id=u, user="zozo" + str(u), project="proj" + str(u % 2))
+            for u in range(4)
+        }
+        evaluate_jobs_karma(
+            session, config, ["default"], now, list(jobs), jobs, Platform()
+        )
+        return [job.karma for job in jobs.values()]
+
+    monkeypatch.setitem(config, "SCHEDULER_FAIRSHARING_WINDOW_SIZE", karma_window_size)
+    karmas = jobs_karma()
+    monkeypatch.setitem(config, "SCHEDULER_FAIRSHARING_USAGE_SUMMARY", "yes")
+    monkeypatch.setattr(
+        Platform, "get_sum_accounting_window", lambda *args: pytest.fail()
+    )
+    assert jobs_karma() == karmas
@@ -0,0 +1,199 @@
+# coding: utf-8
+import pytest
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+import oar.lib.tools  # for monkeypatching
+from oar.kao.incremental_gantt import IncrementalGantt
+from oar.kao.meta_sched import gantt_init_with_running_jobs, meta_schedule
+from oar.kao.platform import Platform
+from oar.lib.database import ephemeral_session
+from oar.lib.job_handling import insert_job
+from oar.lib.models import (
+    AssignedResource,
+    GanttJobsPrediction,
+    Job,
+    MoldableJobDescription,
+    Queue,
+    Resource,
+)
+
+
+@pytest.fixture(scope="function", autouse=True)
+def minimal_db_initialization(request, setup_config):
+    _, engine = setup_config
+    session_factory = sessionmaker(bind=engine)
+    scoped = scoped_session(session_factory)
+
+    with ephemeral_session(scoped, engine, bind=engine) as session:
+        Queue.create(
+            session,
+            name="default",
+            priority=3,
+            scheduler_policy="kamelot",
+            state="Active",
+        )
+        Queue.create(
+            session,
+            name="besteffort",
+            priority=0,
+            scheduler_policy="kamelot",
+            state="Active",
+        )
+
+        # add some resources
+        for i in range(5):
+            Resource.create(session, network_address="localhost")
+
+        yield session
+
+
+@pytest.fixture(scope="function", autouse=True)
+def monkeypatch_tools(request, monkeypatch):
+    monkeypatch.setattr(oar.lib.tools, "create_almighty_socket", lambda x, y: None)
+    monkeypatch.setattr(oar.lib.tools, "notify_almighty", lambda x: True)
+    monkeypatch.setattr(
+        oar.lib.tools, "notify_tcp_socket", lambda addr, port, msg: len(msg)
+    )
+    monkeypatch.setattr(
+        oar.lib.tools, "notify_user", lambda session, job, state, msg: len(state + msg)
+    )
+    monkeypatch.setattr(oar.lib.tools, "notify_bipbip_commander", lambda json_msg: True)
+
+
+def set_date(monkeypatch, date):
+    monkeypatch.setattr(oar.lib.tools, "get_date", lambda session: date)
+
+
+def insert_running_job(session, start_time, walltime, nb_resources, first=0):
+    job_id = insert_job(
+        session,
+        res=[(walltime, [("resource_id={}".format(nb_resources), "")])],
+        start_time=start_time,
+        state="Running",
+    )
+    moldable = (
+        session.query(MoldableJobDescription)
+        .filter(MoldableJobDescription.job_id == job_id)
+        .first()
+    )
+    session.query(Job).filter(Job.id == job_id).update(
+        {Job.assigned_moldable_job: moldable.id}, synchronize_session=False
+    )
+    for r in session.query(Resource).all()[first : first + nb_resources]:
+        AssignedResource.create(session, moldable_id=moldable.id, resource_id=r.id)
+    return job_id
+
+
+def free_resources_at(slot_set, date):
+    return slot_set.slots[slot_set.slot_id_at(date)].itvs
+
+
+def assert_same_slot_set(slot_set, expected_slot_set):
+    assert slot_set.begin == expected_slot_set.begin
+    dates = {s.b for s in slot_set.slots.values()} | {
+        s.b for s in expected_slot_set.slots.values()
+    }
+    for date in dates:
+        assert free_resources_at(slot_set, date) == free_resources_at(
+            expected_slot_set, date
+        )
+
+
+def init_gantts(session, config, gantt, now):
+    plt = Platform()
+    job_security_time = int(config["SCHEDULER_JOB_SECURITY_TIME"])
+    slot_sets, scheduled_jobs, _ = gantt.init_with_running_jobs(
+        session, config, plt, now, job_security_time
+    )
+    expected_slot_sets, expected_scheduled_jobs, _ = gantt_init_with_running_jobs(
+        session, config, plt, now, job_security_time
+    )
+    assert sorted(j.id for j in scheduled_jobs) == sorted(
+        j.id for j in expected_scheduled_jobs
+    )
+    assert_same_slot_set(slot_sets["default"], expected_slot_sets["default"])
+    return slot_sets
+
+
+def test_incremental_gantt_new_jobs(
+    monkeypatch, minimal_db_initialization, setup_config
+):
+    config, _ = setup_config
+    session = minimal_db_initialization
+    gantt = IncrementalGantt(config)
+
+    set_date(monkeypatch, 1000)
+    insert_running_job(session, 900, 600, 2)
+    insert_job(session, res=[(300, [("resource_id=2", "")])], properties="")
+    meta_schedule(session, config, gantt=gantt)
+    assert gantt.nb_full_rebuilds == 1
+
+    # The waiting job is now toLaunch and must be inserted in gantt
+    set_date(monkeypatch, 1010)
+    insert_job(session, res=[(300, [("resource_id=3", "")])], properties="")
+    slot_sets = init_gantts(session, config, gantt, 1010)
+
+    assert gantt.nb_full_rebuilds == 1
+    assert gantt.nb_incremental_rounds == 1
+    assert len(free_resources_at(slot_sets["default"], 1010)) == 1
+    assert len(session.query(GanttJobsPrediction).all()) == 2
+
+
+def test_incremental_gantt_release_job(
+    monkeypatch, minimal_db_initialization, setup_config
+):
+    config, _ = setup_config
+    session = minimal_db_initialization
+    gantt = IncrementalGantt(config)
+
+    set_date(monkeypatch, 1000)
+    job_id = insert_running_job(session, 900, 600, 2)
+    insert_running_job(session, 950, 1200, 2, first=2)
+    meta_schedule(session, config, gantt=gantt)
+
+    session.query(Job).filter(Job.id == job_id).update(
+        {Job.state: "Terminated"}, synchronize_session=False
+    )
+    set_date(monkeypatch, 1100)
+    slot_sets = init_gantts(session, config, gantt, 1100)
+
+    assert gantt.nb_full_rebuilds == 1
+    assert gantt.nb_incremental_rounds == 1
+    assert len(free_resources_at(slot_sets["default"], 1100)) == 3
+
+
+def test_incremental_gantt_resources_change(
+    monkeypatch, minimal_db_initialization, setup_config
+):
+    config, _ = setup_config
+    session = minimal_db_initialization
+    gantt = IncrementalGantt(config)
+
+    set_date(monkeypatch, 1000)
+    insert_running_job(session, 900, 600, 2)
+    meta_schedule(session, config, gantt=gantt)
+
+    session.query(Resource).filter(Resource.id == 5).update(
+        {Resource.state: "Dead"}, synchronize_session=False
+    )
+    set_date(monkeypatch, 1100)
+    slot_sets = init_gantts(session, config, gantt, 1100)
+
+    assert gantt.nb_full_rebuilds == 2
+    assert len(free_resources_at(slot_sets["default"], 1100)) == 2
+
+
+def test_incremental_gantt_full_rebuild_rounds(
+    monkeypatch, minimal_db_initialization, setup_config
+):
+    config, _ = setup_config
+    session = minimal_db_initialization
+    monkeypatch.setitem(config, "SCHEDULER_GANTT_FULL_REBUILD_ROUNDS", "1")
+    gantt = IncrementalGantt(config)
+
+    insert_running_job(session, 900, 600, 2)
+    for date in (1000, 1010, 1020):
+        set_date(monkeypatch, date)
+        meta_schedule(session, config, gantt=gantt)
+
+    assert gantt.nb_full_rebuilds == 2
@@ -2,6 +2,7 @@
 from os import environ
 
 import pytest
+from sqlalchemy import event
 from sqlalchemy.orm import scoped_session, sessionmaker
 
 import oar.lib.tools  # for monkeypatching
@@ -12,6 +13,9 @@ from oar.lib.models import (
     AssignedResource,
     FragJob,
     GanttJobsPrediction,
+    GanttJobsPredictionsVisu,
+    GanttJobsResource,
+    GanttJobsResourcesVisu,
     Job,
     MoldableJobDescription,
     Queue,
@@ -302,6 +306,82 @@ def test_db_metasched_be_released_for_job(
     assert fragjob.job_id == job_id
 
 
+def test_db_metasched_gantt_write_diff(
+    monkeypatch, minimal_db_initialization, setup_config
+):
+    config, _ = setup_config
+    session = minimal_db_initialization
+    now = get_date(session)
+    monkeypatch.setattr(oar.lib.tools, "get_date", lambda x: now)
+
+    job_id = insert_job(
+        session,
+        res=[(500, [("resource_id=4", "")])],
+        start_time=now - 10,
+        state="Running",
+    )
+    assign_resources(session, job_id)
+    for nb_resources in (3, 2):
+        insert_job(session, res=[(500, [("resource_id=%d" % nb_resources, "")])])
+
+    def gantt_tables():
+        return [
+            sorted(
+                (r.moldable_id, r.start_time)
+                for r in session.query(GanttJobsPrediction)
+            ),
+            sorted(
+                (r.moldable_id, r.resource_id) for r in session.query(GanttJobsResource)
+            ),
+            sorted(
+                (r.moldable_id, r.start_time)
+                for r in session.query(GanttJobsPredictionsVisu)
+            ),
+            sorted(
+                (r.moldable_id, r.resource_id)
+                for r in session.query(GanttJobsResourcesVisu)
+            ),
+        ]
+
+    def meta_schedule_writes(gantt_write_diff):
+        monkeypatch.setitem(config, "SCHEDULER_GANTT_WRITE_DIFF", gantt_write_diff)
+        statements = []
+
+        def log_write(conn, cursor, statement, *args):
+            if "gantt_jobs_resources" in statement and cursor.rowcount > 0:
+                statements.append(statement.split()[0])
+
+        engine = session.get_bind().engine
+        event.listen(engine, "after_cursor_execute", log_write)
+        try:
+            meta_schedule(session, config)
+        finally:
+            event.remove(engine, "after_cursor_execute", log_write)
+        return statements
+
+    meta_schedule_writes("no")
+    expected_tables = gantt_tables()
+    # 4 + 3 + 2 resources in gantt and visualization tables
+    assert len(expected_tables[1]) == len(expected_tables[3]) == 9
+
+    # First round in diff mode: the visualization tables are kept
+    meta_schedule_writes("yes")
+    assert gantt_tables() == expected_tables
+    # Nothing changed: resources rows are neither deleted nor inserted
+    assert meta_schedule_writes("yes") == []
+    assert gantt_tables() == expected_tables
+
+    # The running job ends: the waiting jobs are moved
+    session.query(Job).filter(Job.id == job_id).update(
+        {Job.state: "Terminated"}, synchronize_session=False
+    )
+    session.commit()
+    meta_schedule_writes("yes")
+    tables = gantt_tables()
+    meta_schedule_writes("no")
+    assert tables == gantt_tables()
+
+
 def test_db_metasched_ar_2(monkeypatch, minimal_db_initialization, setup_config):
     """
     Test multiple AR reservation in the same metaschedule.
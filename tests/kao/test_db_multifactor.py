@@ -5,9 +5,10 @@ import pytest
 from sqlalchemy.orm import scoped_session, sessionmaker
 
 from oar.kao.kamelot import schedule_cycle
+from oar.kao.multifactor_priority import get_priority_conf, multifactor_jobs_sorting
 from oar.kao.platform import Platform
 from oar.lib.database import ephemeral_session
-from oar.lib.job_handling import insert_job
+from oar.lib.job_handling import JobPseudo, insert_job
 from oar.lib.models import GanttJobsPrediction, Resource
 
 from .test_db_fairshare import generate_accountings
@@ -93,3 +94,66 @@ def test_db_multifactor_fairshare(minimal_db_initialization, oar_conf):
             break
 
     assert flag
+
+
+def test_priority_conf_cache(tmp_path):
+    priority_file_name = str(tmp_path / "priority.yaml")
+    with open(priority_file_name, "w") as priority_fd:
+        priority_fd.write('{"karma_weight": 1.0}')
+
+    priority_conf = get_priority_conf(priority_file_name)
+    assert priority_conf["karma_weight"] == 1.0
+    assert priority_conf["age_weight"] == 0
+    assert get_priority_conf(priority_file_name) is priority_conf
+
+    with open(priority_file_name, "w") as priority_fd:
+        priority_fd.write('{"karma_weight": 2.0, "age_weight": 10}')
+    priority_conf = get_priority_conf(priority_file_name)
+    assert priority_conf["karma_weight"] == 2.0
+    assert priority_conf["age_weight"] == 10
+
+
+def test_multifactor_jobs_sorting_max_jobs(
+    monkeypatch, tmp_path, minimal_db_initialization, oar_conf
+):
+    config = oar_conf
+    priority_file_name = str(tmp_path / "priority.yaml")
+    monkeypatch.setitem(config, "PRIORITY_CONF_FILE", priority_file_name)
+    with open(priority_file_name, "w") as priority_fd:
+        priority_fd.write(
+            '{"age_weight": 1.0, "age_coef": 0.01, "queue_weight": 10,'
+            ' "queue_coefs": {"default": 1, "admin": 5}}'
+        )
+
+    now = 10000
+    jobs = {}
+    for jid in range(1, 101):
+        jobs[jid] = JobPseudo(
+            id=jid,
+            user="zozo",
+            project="default",
+            queue_name="admin" if jid % 10 == 0 else "default",
+            # Some jobs have the same age
+            submission_time=now - 1000 * (jid % 7),
+        )
+    jids = list(jobs)
+
+    ordered_jids = multifactor_jobs_sorting(
+        minimal_db_initialization, config, ["default"], now, jids, jobs, Platform()
+    )
+    assert jobs[70].priority == 10.0 * 5 + 1.0 * max(1.0, 0.01 * 0)
+    assert jobs[6].priority == 10.0 * 1 + 1.0 * max(1.0, 0.01 * 6000)
+    # Jobs 20 and 90 have the same priority
+    assert ordered_jids[:3] == [20, 90, 40]
+
+    top_jids = multifactor_jobs_sorting(
+        minimal_db_initialization,
+        config,
+        ["default"],
+        now,
+        jids,
+        jobs,
+        Platform(),
+        max_jobs=15,
+    )
+    assert top_jids == ordered_jids[:15]
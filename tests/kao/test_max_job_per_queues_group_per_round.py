@@ -1,5 +1,7 @@
 # coding: utf-8
+import os
 import sys
+from tempfile import mkstemp
 
 import pytest
 from sqlalchemy.orm import scoped_session, sessionmaker
@@ -92,3 +94,30 @@ def test_no_db_metasched_max_job_internal_cycle(
     del config[OPT]
     req = minimal_db_initialization.query(GanttJobsPrediction).all()
     assert len(req) == 2
+
+
+@pytest.mark.skipif(
+    "os.environ.get('DB_TYPE', '') == 'postgresql'",
+    reason="meta_schedule forks and leaks a libpq connection on the shared "
+    "postgresql test database, hanging a later test",
+)
+def test_no_db_metasched_max_job_multifactor(
+    minimal_db_initialization, setup_config, caplog
+):
+    config, _ = setup_config
+    _, priority_file_name = mkstemp()
+    with open(priority_file_name, "w", encoding="utf-8") as priority_fd:
+        priority_fd.write('{"age_weight": 1.0}')
+    config["PRIORITY_CONF_FILE"] = priority_file_name
+    config["JOB_PRIORITY"] = "MULTIFACTOR"
+    config[OPT] = "2"
+    try:
+        meta_schedule(minimal_db_initialization, config)
+    finally:
+        del config[OPT]
+        config["JOB_PRIORITY"] = "FIFO"
+        del config["PRIORITY_CONF_FILE"]
+        os.remove(priority_file_name)
+    req = minimal_db_initialization.query(GanttJobsPrediction).all()
+    assert len(req) == 2
+    assert "scheduling 2 of 5 waiting jobs" in caplog.text
@@ -376,3 +376,116 @@ def test_quotas_two_jobs_job_type_proc():
 
     assert j1.start_time == 0
     assert j2.start_time == 50
+
+
+@pytest.mark.parametrize(
+    "rules",
+    [
+        {("*", "*", "*", "/"): [16, -1, -1]},
+        {("*", "*", "*", "/"): [-1, 2, -1], ("*", "projA", "*", "*"): [20, -1, -1]},
+        {
+            ("*", "*", "besteffort", "*"): [-1, -1, 3000],
+            ("/", "*", "*", "*"): [24, -1, -1],
+        },
+    ],
+)
+def test_quotas_check_slots_quotas_same_as_combine(rules):
+    Quotas.enabled = True
+    Quotas.default_rules = rules
+    Quotas.job_types = ["*", "besteffort"]
+
+    res = ProcSet(*[(1, 32)])
+    ResourceSet.default_itvs = res
+
+    ss = SlotSet(Slot(1, 0, 0, res, 0, 1000))
+    jobs = []
+    for i in range(8):
+        jobs.append(
+            JobPseudo(
+                id=i,
+                start_time=50 * i,
+                walltime=120,
+                res_set=ProcSet((4 * i + 1, 4 * i + 4)),
+                types={"besteffort": True} if i % 3 == 0 else {},
+                queue_name="default" if i % 2 else "admin",
+                project="projA" if i % 4 else "projB",
+                user="toto" if i < 4 else "titi",
+                ts=False,
+                ph=0,
+            )
+        )
+    ss.split_slots_jobs(jobs)
+
+    for user in ["toto", "titi", "tata"]:
+        for types in [{}, {"besteffort": True}]:
+            job = JobPseudo(
+                id=100,
+                types=types,
+                queue_name="default",
+                project="projA",
+                user=user,
+            )
+            for t_begin, t_end in [(0, 99), (50, 400), (300, 600), (700, 999)]:
+                sid_left, sid_right = ss.get_encompassing_slots(t_begin, t_end)
+                for nb_res in [1, 4, 16]:
+                    # Reference: combine all the counters then check the job's one
+                    quotas = Quotas(rules)
+                    for slot in ss.traverse_id(sid_left, sid_right):
+                        quotas.combine(slot.quotas)
+                    quotas.update(job, nb_res, 100)
+                    expected = quotas.check(job)
+
+                    assert expected == Quotas.check_slots_quotas(
+                        ss.slots, sid_left, sid_right, job, nb_res, 100
+                    )
+
+
+def test_quotas_counters_copy_on_write():
+    Quotas.enabled = True
+    Quotas.default_rules = {("*", "*", "*", "/"): [16, -1, -1]}
+
+    res = ProcSet(*[(1, 32)])
+    ResourceSet.default_itvs = res
+
+    ss = SlotSet(Slot(1, 0, 0, res, 0, 1000))
+    j1 = JobPseudo(
+        id=1,
+        start_time=0,
+        walltime=500,
+        res_set=ProcSet((1, 8)),
+        types={},
+        queue_name="default",
+        project="",
+        user="toto",
+        ts=False,
+        ph=0,
+    )
+    ss.split_slots_jobs([j1])
+    sid_left = ss.slot_id_at(0)
+    left_counters = list(ss.slots[sid_left].quotas.counters)
+
+    j2 = JobPseudo(
+        id=2,
+        start_time=600,
+        walltime=100,
+        res_set=ProcSet((9, 12)),
+        types={},
+        queue_name="default",
+        project="",
+        user="toto",
+        ts=False,
+        ph=0,
+    )
+    ss.split_slots_jobs([j2])
+
+    # Slots split around j2 still share their counters, only the ones of j2 are copied
+    before_j2 = ss.slots[ss.slot_id_at(550)].quotas
+    after_j2 = ss.slots[ss.slot_id_at(800)].quotas
+    assert before_j2.counters is after_j2.counters
+    assert before_j2.counters is not ss.slots[ss.slot_id_at(650)].quotas.counters
+
+    key = ("*", "*", "*", "toto")
+    assert ss.slots[sid_left].quotas.counters == left_counters
+    assert ss.slots[sid_left].quotas.counter(key) == [8, 1, 4000]
+    assert ss.slots[ss.slot_id_at(650)].quotas.counter(key) == [4, 1, 400]
+    assert after_j2.counter(key) == [0, 0, 0]
@@ -0,0 +1,111 @@
+# coding: utf-8
+import json
+
+import pytest
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+import oar.lib.tools  # for monkeypatching
+from oar.kao.meta_sched import meta_schedule
+from oar.kao.round_profiler import RoundProfiler, read_round_profiles
+from oar.lib.database import ephemeral_session
+from oar.lib.job_handling import insert_job
+from oar.lib.models import Job, Queue, Resource
+
+
+@pytest.fixture(scope="function", autouse=True)
+def minimal_db_initialization(request, setup_config):
+    _, engine = setup_config
+    session_factory = sessionmaker(bind=engine)
+    scoped = scoped_session(session_factory)
+
+    with ephemeral_session(scoped, engine, bind=engine) as session:
+        Queue.create(
+            session,
+            name="default",
+            priority=3,
+            scheduler_policy="kamelot",
+            state="Active",
+        )
+        Queue.create(
+            session,
+            name="besteffort",
+            priority=0,
+            scheduler_policy="kamelot",
+            state="Active",
+        )
+
+        # add some resources
+        for i in range(5):
+            Resource.create(session, network_address="localhost")
+
+        yield session
+
+
+@pytest.fixture(scope="function", autouse=True)
+def monkeypatch_tools(request, monkeypatch):
+    monkeypatch.setattr(oar.lib.tools, "create_almighty_socket", lambda x, y: None)
+    monkeypatch.setattr(oar.lib.tools, "notify_almighty", lambda x: True)
+    monkeypatch.setattr(oar.lib.tools, "notify_bipbip_commander", lambda json_msg: True)
+
+
+def test_round_profiler_disabled(minimal_db_initialization, setup_config):
+    config, _ = setup_config
+    profiler = RoundProfiler(config)
+    assert not profiler.enabled
+
+    meta_schedule(minimal_db_initialization, config, profiler=profiler)
+    assert profiler.stop() is None
+
+
+def test_round_profiler_meta_schedule(
+    monkeypatch, tmp_path, minimal_db_initialization, setup_config
+):
+    config, _ = setup_config
+    session = minimal_db_initialization
+    profile_file = str(tmp_path / "rounds.jsonl")
+    monkeypatch.setitem(config, "SCHEDULER_ROUND_PROFILE_FILE", profile_file)
+
+    insert_job(session, res=[(60, [("resource_id=4", "")])], properties="")
+    meta_schedule(session, config)
+    insert_job(session, res=[(60, [("resource_id=1", "")])], properties="")
+    meta_schedule(session, config)
+
+    assert [j.state for j in session.query(Job).all()] == ["toLaunch", "toLaunch"]
+
+    with open(profile_file) as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 2
+
+    record = records[0]
+    phases = record["phases"]
+    for phase in [
+        "gantt_init_with_running_jobs",
+        "get_waiting_jobs",
+        "get_data_jobs",
+        "sorting",
+        "scheduling",
+        "save_assigns",
+        "get_gantt_jobs_to_launch",
+        "check_besteffort_jobs_to_kill",
+        "handle_jobs_to_launch",
+        "update_gantt_visualization",
+    ]:
+        assert phases[phase]["duration"] >= 0
+    assert phases["gantt_init_with_running_jobs"]["queries"] > 0
+    assert phases["save_assigns"]["queries"] > 0
+    assert phases["save_assigns"]["rows"] > 0
+    assert phases["scheduling"]["queries"] == 0
+    assert record["queries"] >= sum(p["queries"] for p in phases.values())
+    assert record["duration"] >= sum(p["duration"] for p in phases.values())
+
+    # Queues are scheduled by group of priority, the besteffort queue has no waiting job
+    assert [g["queues"] for g in record["queues"]] == [["default"], ["besteffort"]]
+    assert "get_data_jobs" in record["queues"][0]["phases"]
+    assert "get_data_jobs" not in record["queues"][1]["phases"]
+    assert (
+        record["queues"][0]["phases"]["get_waiting_jobs"]["queries"]
+        + record["queues"][1]["phases"]["get_waiting_jobs"]["queries"]
+        == phases["get_waiting_jobs"]["queries"]
+    )
+
+    assert read_round_profiles(profile_file, 1) == records[1:]
@@ -1,6 +1,7 @@
 # coding: utf-8
 from procset import ProcSet
 
+import oar.kao.scheduling
 from oar.kao.scheduling import (
     assign_resources_mld_job_split_slots,
     schedule_id_jobs_ct,
@@ -8,6 +9,7 @@ from oar.kao.scheduling import (
 )
 from oar.kao.slot import Slot, SlotSet
 from oar.lib.globals import init_config
+from oar.lib.hierarchy import Hierarchy
 from oar.lib.job_handling import JobPseudo
 
 config = init_config()
@@ -823,3 +825,47 @@ def test_schedule_error_2():
         print(f"jid: {j.id}, start_time: {j.start_time}, res_set: {j.res_set}")
 
     print(ss)
+
+
+def test_schedule_skip_windows_without_enough_free_resources(monkeypatch):
+    res = ProcSet(*[(1, 16)])
+    ss = SlotSet(Slot(1, 0, 0, res, 0, 1000))
+    all_ss = {"default": ss}
+
+    hy_rid = {
+        "node": {i: [2 * i + 1, 2 * i + 2] for i in range(8)},
+        "core": {i: [i] for i in range(1, 17)},
+    }
+    hy = Hierarchy(hy_rid=hy_rid).hy
+
+    j1 = JobPseudo(id=1, start_time=0, walltime=300, res_set=ProcSet(*[(1, 12)]))
+    j2 = JobPseudo(id=2, start_time=300, walltime=200, res_set=ProcSet(*[(1, 10)]))
+    ss.split_slots_jobs([j1, j2])
+
+    calls = []
+    find_resource_hierarchies_job = oar.kao.scheduling.find_resource_hierarchies_job
+
+    def counted_find_resource_hierarchies_job(itvs_slots, hy_res_rqts, hy):
+        calls.append(itvs_slots)
+        return find_resource_hierarchies_job(itvs_slots, hy_res_rqts, hy)
+
+    monkeypatch.setattr(
+        oar.kao.scheduling,
+        "find_resource_hierarchies_job",
+        counted_find_resource_hierarchies_job,
+    )
+
+    j3 = JobPseudo(
+        id=3,
+        types={},
+        key_cache={},
+        mld_res_rqts=[(1, 60, [([("node", 4), ("core", 2)], res)])],
+        ts=False,
+        ph=0,
+    )
+    schedule_id_jobs_ct(all_ss, {3: j3}, hy, [3], 20)
+
+    assert j3.start_time == 500
+    assert j3.res_set == ProcSet((1, 8))
+    # Windows with 4 or 6 free resources are skipped
+    assert calls == [ProcSet((1, 16))]
@@ -3,7 +3,18 @@ import pytest
 from procset import ProcSet
 from rich import print
 
-from oar.kao.slot import MAX_TIME, Slot, SlotSet, intersec_itvs_slots
+from oar.kao.slot import (
+    MAX_TIME,
+    ArraySlotSet,
+    Slot,
+    SlotSet,
+    WindowIntersection,
+    enough_free_resources_slots,
+    get_slot_set_class,
+    intersec_itvs_slots,
+    intersec_ts_ph_itvs_slots,
+)
+from oar.lib.exceptions import InvalidConfiguration
 from oar.lib.job_handling import JobPseudo
 
 
@@ -579,3 +590,192 @@ def test_split_slots_jobs_job_4():
     print()
     print(ss)
     assert compare_slots_val_ref(ss, v)
+
+
+def check_array_slot_set_index(ss: ArraySlotSet):
+    ids = [slot.id for slot in ss.traverse_id()]
+    assert ss.sids == ids
+    assert ss.begins == [ss.slots[sid].b for sid in ids]
+
+
+@pytest.mark.parametrize(
+    "time, answer",
+    [(5, 0), (250, 2), (499, 2), (500, 3), (1500, 0), (25, 0)],
+)
+def test_array_slot_id_at(time, answer):
+    slots = {
+        1: Slot(1, 0, 2, ProcSet((1, 32)), 50, 249),
+        2: Slot(2, 1, 3, ProcSet((1, 32)), 250, 499),
+        3: Slot(3, 2, 0, ProcSet((1, 32)), 500, 1000),
+    }
+
+    ss = ArraySlotSet(slots)
+
+    assert ss.slot_id_at(time) == answer
+
+
+@pytest.mark.parametrize(
+    "range, answer",
+    [
+        ((50, 50), (1, 1)),
+        ((50, 249), (1, 1)),
+        ((249, 249), (1, 1)),
+        ((50, 1000), (1, 3)),
+        ((499, 500), (2, 3)),
+    ],
+)
+def test_array_get_encompassing_range(range, answer):
+    slots = {
+        1: Slot(1, 0, 2, ProcSet((1, 32)), 50, 249),
+        2: Slot(2, 1, 3, ProcSet((1, 32)), 250, 499),
+        3: Slot(3, 2, 0, ProcSet((1, 32)), 500, 1000),
+    }
+
+    ss = ArraySlotSet(slots)
+
+    assert ss.get_encompassing_range(*range) == answer
+
+
+@pytest.mark.parametrize("date", [1, 100, 50])
+def test_array_split_at(date):
+    for split in ("split_at_before", "split_at_after"):
+        ss = ArraySlotSet(Slot(1, 0, 0, ProcSet((1, 32)), 1, 100))
+        getattr(ss, split)(1, date)
+
+        check_slot_integrity(ss)
+        check_array_slot_set_index(ss)
+
+
+def test_array_slot_set_same_as_linked():
+    jobs = [
+        JobPseudo(id=5, start_time=1, walltime=1, res_set=ProcSet(5), ts=False, ph=0),
+        JobPseudo(id=1, start_time=5, walltime=10, res_set=ProcSet(1), ts=False, ph=0),
+        JobPseudo(id=2, start_time=5, walltime=20, res_set=ProcSet(2), ts=False, ph=0),
+        JobPseudo(id=3, start_time=12, walltime=7, res_set=ProcSet(3), ts=False, ph=0),
+        JobPseudo(id=4, start_time=40, walltime=3, res_set=ProcSet(4), ts=False, ph=0),
+    ]
+
+    linked = SlotSet(Slot(1, 0, 0, ProcSet((1, 32)), 1, 300))
+    array = ArraySlotSet(Slot(1, 0, 0, ProcSet((1, 32)), 1, 300))
+
+    linked.split_slots_jobs(jobs)
+    array.split_slots_jobs(jobs)
+
+    check_slot_integrity(array)
+    check_array_slot_set_index(array)
+
+    v = [(slot.b, slot.e, slot.itvs) for slot in linked.traverse_id()]
+    assert compare_slots_val_ref(array, v)
+
+    assert array.first().id == linked.first().id
+    assert array.last().id == linked.last().id
+    for date in (0, 1, 5, 11, 12, 24, 25, 43, 300, 301):
+        assert array.slot_id_at(date) == linked.slot_id_at(date)
+    for t_begin, t_end in ((1, 1), (5, 14), (12, 42), (13, 300)):
+        assert array.get_encompassing_slots(
+            t_begin, t_end
+        ) == linked.get_encompassing_slots(t_begin, t_end)
+    assert [(b.id, e.id) for b, e in array.traverse_with_width(10)] == [
+        (b.id, e.id) for b, e in linked.traverse_with_width(10)
+    ]
+
+
+def test_get_slot_set_class():
+    assert get_slot_set_class({}) is SlotSet
+    assert get_slot_set_class({"SCHEDULER_SLOTSET_ENGINE": "array"}) is ArraySlotSet
+    with pytest.raises(InvalidConfiguration):
+        get_slot_set_class({"SCHEDULER_SLOTSET_ENGINE": "tree"})
+
+
+@pytest.mark.parametrize("slot_set_class", [SlotSet, ArraySlotSet])
+def test_slot_set_copy_and_trim_before(slot_set_class):
+    jobs = [
+        JobPseudo(id=1, start_time=5, walltime=10, res_set=ProcSet(1), ts=False, ph=0),
+        JobPseudo(id=2, start_time=12, walltime=7, res_set=ProcSet(2), ts=False, ph=0),
+    ]
+    ss = slot_set_class(Slot(1, 0, 0, ProcSet((1, 32)), 1, 100))
+    ss.split_slots_jobs(jobs)
+
+    ss_copy = ss.copy()
+    assert type(ss_copy) is slot_set_class
+    ss_copy.trim_before(13)
+
+    # the copied slot set is unchanged
+    v = [
+        (1, 4, ProcSet((1, 32))),
+        (5, 11, ProcSet((2, 32))),
+        (12, 14, ProcSet((3, 32))),
+        (15, 18, ProcSet(1, (3, 32))),
+        (19, 100, ProcSet((1, 32))),
+    ]
+    assert compare_slots_val_ref(ss, v)
+
+    assert ss_copy.begin == 13
+    assert ss_copy.first().id == 1
+    assert compare_slots_val_ref(ss_copy, [(13, 14, ProcSet((3, 32)))] + v[3:])
+    check_slot_integrity(ss_copy)
+    if slot_set_class is ArraySlotSet:
+        check_array_slot_set_index(ss_copy)
+
+
+@pytest.mark.parametrize("slot_set_class", [SlotSet, ArraySlotSet])
+def test_slots_nb_free(slot_set_class):
+    ss = slot_set_class(Slot(1, 0, 0, ProcSet((1, 32)), 0, 1000))
+    j1 = JobPseudo(
+        id=1, start_time=10, walltime=100, res_set=ProcSet((1, 16)), ts=False, ph=0
+    )
+    j2 = JobPseudo(
+        id=2, start_time=50, walltime=100, res_set=ProcSet((9, 24)), ts=False, ph=0
+    )
+    ss.split_slots_jobs([j1])
+    ss.split_slots_jobs([j2])
+    ss.split_slots_jobs([j1], False)
+
+    for slot in ss.traverse_id():
+        assert slot.nb_free == len(slot.itvs)
+    assert [slot.nb_free for slot in ss.traverse_id()] == [32, 32, 24, 16, 32]
+
+    sid_left, sid_right = ss.get_encompassing_slots(0, 149)
+    assert enough_free_resources_slots(ss.slots, sid_left, sid_right, 16)
+    assert not enough_free_resources_slots(ss.slots, sid_left, sid_right, 17)
+
+
+@pytest.mark.parametrize("slot_set_class", [SlotSet, ArraySlotSet])
+def test_window_intersection(slot_set_class):
+    ss = slot_set_class(Slot(1, 0, 0, ProcSet((1, 32)), 0, 1000))
+    jobs = [
+        JobPseudo(
+            id=i,
+            start_time=10 * i,
+            walltime=15 + 10 * (i % 3),
+            res_set=ProcSet((i, i + 4)),
+            ts=(i % 2 == 0),
+            ts_user="toto",
+            ts_name="*",
+            ph=0,
+        )
+        for i in range(1, 20)
+    ]
+    ss.split_slots_jobs(jobs)
+
+    job_ts = JobPseudo(id=100, ts=True, user="toto", name="foo", ph=0)
+    for job in [None, job_ts]:
+        for width in [1, 25, 60, 200]:
+            window_itvs = WindowIntersection(ss.slots, job)
+            for slot_begin, slot_end in ss.traverse_with_width(width):
+                if job is None:
+                    expected = intersec_itvs_slots(ss.slots, slot_begin.id, slot_end.id)
+                else:
+                    expected = intersec_ts_ph_itvs_slots(
+                        ss.slots, slot_begin.id, slot_end.id, job
+                    )
+                assert window_itvs.itvs(slot_begin.id, slot_end.id) == expected
+
+    # The window is rebuilt when it goes backward
+    window_itvs = WindowIntersection(ss.slots)
+    last_id = ss.last().id
+    assert window_itvs.itvs(ss.slot_id_at(500), last_id) == ProcSet((1, 32))
+    sid_left, sid_right = ss.get_encompassing_slots(10, 40)
+    assert window_itvs.itvs(sid_left, sid_right) == intersec_itvs_slots(
+        ss.slots, sid_left, sid_right
+    )
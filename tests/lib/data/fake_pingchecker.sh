@@ -0,0 +1,10 @@
+#!/bin/sh
+# Fake taktuk for the pingchecker: hosts are read on stdin, hosts named bad* are in
+# error and hosts named hung* never answer
+while read host; do
+    case $host in
+        bad*) echo "STATUS $host 1" ;;
+        hung*) sleep 10 ;;
+        *) echo "STATUS $host 0" ;;
+    esac
+done
@@ -3,17 +3,19 @@ import pytest
 from sqlalchemy.orm import scoped_session, sessionmaker
 
 from oar.lib.accounting import (
+    check_accounting_update,
     delete_accounting_windows_before,
     delete_all_from_accounting,
     get_accounting_summary,
     get_accounting_summary_byproject,
     get_last_project_karma,
+    update_accounting,
 )
 from oar.lib.database import ephemeral_session
 from oar.lib.job_handling import insert_job
-from oar.lib.models import Accounting, Queue, Resource
+from oar.lib.models import Accounting, Job, Queue, Resource
 
-from ..helpers import insert_terminated_jobs
+from ..helpers import insert_running_jobs, insert_terminated_jobs
 
 
 @pytest.fixture(scope="function", autouse=True)
@@ -98,6 +100,65 @@ def test_delete_accounting_windows_before(minimal_db_initialization):
     assert len(accounting1) > len(accounting2)
 
 
+def accounting_rows(session):
+    return sorted(
+        (
+            a.window_start,
+            a.window_stop,
+            a.user,
+            a.project,
+            a.queue_name,
+            a.consumption_type,
+            a.consumption,
+        )
+        for a in session.query(Accounting).all()
+    )
+
+
+def test_check_accounting_update_bulk(minimal_db_initialization):
+    session = minimal_db_initialization
+    window_size = 86400
+    # Existing windows must be updated
+    update_accounting(
+        session, 30000, 100000, window_size, "zozo", "yopa", "default", "USED", 2
+    )
+    insert_terminated_jobs(session, update_accounting=False, window_size=window_size)
+    running_job_ids = insert_running_jobs(session, nb_jobs=1)
+
+    check_accounting_update(session, window_size)
+    rows = accounting_rows(session)
+    assert len(rows) > 2
+
+    # Same windows as computed job by job
+    session.query(Accounting).delete(synchronize_session=False)
+    update_accounting(
+        session, 30000, 100000, window_size, "zozo", "yopa", "default", "USED", 2
+    )
+    walltime = window_size * 12
+    for job in session.query(Job).filter(Job.state == "Terminated").all():
+        for c_type, stop_time in (
+            ("USED", job.stop_time),
+            ("ASKED", job.start_time + walltime),
+        ):
+            update_accounting(
+                session,
+                job.start_time,
+                stop_time,
+                window_size,
+                job.user,
+                job.project,
+                job.queue_name,
+                c_type,
+                2,
+            )
+    assert rows == accounting_rows(session)
+
+    assert {
+        j.accounted for j in session.query(Job).filter(Job.state == "Terminated")
+    } == {"YES"}
+    assert session.get(Job, running_job_ids[0]).accounted == "NO"
+
+
 def test_get_last_project_karma(minimal_db_initialization):
     user = "toto"
     project = "yopa"
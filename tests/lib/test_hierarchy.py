@@ -1,11 +1,16 @@
 # coding: utf-8
+import pytest
 from procset import ProcSet
 
 from oar.lib.hierarchy import (
+    Hierarchy,
+    HierarchyLevel,
+    bits_to_procset,
     extract_all_best_half_scattered_block_itv,
     extract_n_scattered_block_itv,
     find_resource_hierarchies_scattered,
     keep_no_empty_scat_bks,
+    procset_to_bits,
 )
 
 
@@ -196,3 +201,115 @@ def test_find_resource_hierarchies_scattere6_fail():
         ProcSet(*[(1, 32)]), [h0, h1, h2], [1, 2, 1]
     )
     assert x == ProcSet(*[(1, 4), (9, 12)])
+
+
+def test_procset_to_bits():
+    for itvs in [
+        ProcSet(),
+        ProcSet(0),
+        ProcSet((1, 3), 6),
+        ProcSet((0, 64), (70, 200)),
+    ]:
+        bits = procset_to_bits(itvs)
+        assert bits.bit_count() == len(itvs)
+        assert bits_to_procset(bits) == itvs
+
+    assert procset_to_bits(ProcSet((1, 3), 6)) == 0b1001110
+
+
+@pytest.mark.parametrize(
+    "itvs, levels, rqts",
+    [
+        (ProcSet((1, 32)), [[[(1, 16)], [(17, 32)]]], [2]),
+        (ProcSet((2, 32)), [[[(1, 16)], [(17, 32)]]], [1]),
+        (ProcSet((2, 32)), [[[(1, 8)], [(9, 16)], [(17, 24)], [(25, 32)]]], [-1]),
+        (ProcSet((2, 32)), [[[(1, 8)], [(9, 16)], [(17, 24)], [(25, 32)]]], [-2]),
+        (ProcSet((2, 32)), [[[(1, 8)], [(9, 16)], [(17, 24)], [(25, 32)]]], [-3]),
+        (
+            ProcSet((1, 12), (17, 28)),
+            [[[(1, 16)], [(17, 32)]], [[(1, 8)], [(9, 16)], [(17, 24)], [(25, 32)]]],
+            [2, 1],
+        ),
+        (
+            ProcSet((1, 32)),
+            [[[(1, 16)], [(17, 32)]], [[(1, 8)], [(9, 16)], [(17, 24)], [(25, 32)]]],
+            [1, 3],
+        ),
+        (
+            ProcSet((1, 30)),
+            [
+                [[(1, 16)], [(17, 32)]],
+                [[(1, 8)], [(9, 16)], [(17, 24)], [(25, 32)]],
+                [[(i, i + 3)] for i in range(1, 32, 4)],
+            ],
+            [2, 2, 1],
+        ),
+        (
+            ProcSet((1, 10), (13, 64)),
+            [
+                [[(1, 32)], [(33, 64)]],
+                [[(1, 16)], [(17, 32)], [(33, 48)], [(49, 64)]],
+                [[(i, i + 7)] for i in range(1, 64, 8)],
+                [[(i, i + 1)] for i in range(1, 64, 2)],
+            ],
+            [2, 2, 1, 2],
+        ),
+    ],
+)
+def test_find_resource_hierarchies_scattered_bitset(itvs, levels, rqts):
+    hy = [[ProcSet(*y) for y in level] for level in levels]
+    hy_bits = [HierarchyLevel(level, bitset=True) for level in hy]
+
+    assert hy_bits == hy
+    assert find_resource_hierarchies_scattered(
+        itvs, hy_bits, rqts
+    ) == find_resource_hierarchies_scattered(itvs, hy, rqts)
+
+
+def hierarchy_rid(nb_switches, nb_hosts, nb_cores):
+    """cluster/switch/host/core hierarchy of resource ids"""
+    hy_rid = {"cluster": {"c": []}, "switch": {}, "host": {}, "core": {}}
+    roid = 1
+    for s in range(nb_switches):
+        for h in range(nb_hosts):
+            for c in range(nb_cores):
+                hy_rid["cluster"]["c"].append(roid)
+                hy_rid["switch"].setdefault(s, []).append(roid)
+                hy_rid["host"].setdefault((s, h), []).append(roid)
+                hy_rid["core"][roid] = [roid]
+                roid += 1
+    return hy_rid
+
+
+def test_hierarchy_index():
+    hy = Hierarchy(hy_rid=hierarchy_rid(2, 2, 2)).hy
+
+    assert hy["switch"] == [ProcSet((1, 4)), ProcSet((5, 8))]
+    assert hy["switch"].children["host"] == [[0, 1], [2, 3]]
+    assert hy["host"].children["core"] == [[0, 1], [2, 3], [4, 5], [6, 7]]
+    assert hy["host"].children["switch"] == [[0], [0], [1], [1]]
+    assert hy["switch"].masks is None
+
+
+@pytest.mark.parametrize("bitset", [False, True])
+@pytest.mark.parametrize(
+    "labels, rqts",
+    [
+        (["switch", "host", "core"], [2, 2, 1]),
+        (["switch", "host", "core"], [1, 3, 2]),
+        (["cluster", "switch", "host", "core"], [1, 3, 1, 4]),
+        (["switch", "core"], [3, 2]),
+        (["host", "switch"], [2, 1]),
+        (["host"], [3]),
+    ],
+)
+def test_find_resource_hierarchies_scattered_index(bitset, labels, rqts):
+    hy = Hierarchy(hy_rid=hierarchy_rid(4, 4, 4), bitset=bitset).hy
+    hy_lists = {label: list(level) for label, level in hy.items()}
+
+    for itvs in [ProcSet((1, 64)), ProcSet((2, 30), (33, 40), (43, 64))]:
+        assert find_resource_hierarchies_scattered(
+            itvs, [hy[label] for label in labels], rqts
+        ) == find_resource_hierarchies_scattered(
+            itvs, [hy_lists[label] for label in labels], rqts
+        )
@@ -1,17 +1,29 @@
 # coding: utf-8
 import pytest
+from procset import ProcSet
+from sqlalchemy import event, text
 from sqlalchemy.orm import scoped_session, sessionmaker
 
 import oar.lib.tools  # for monkeypatching
 from oar.kao.platform import Platform
 from oar.lib.database import ephemeral_session
 from oar.lib.job_handling import (
+    JobPseudo,
     check_end_of_job,
+    gantt_flush_tables,
     get_data_jobs,
     insert_job,
     job_message,
+    save_assigns,
+)
+from oar.lib.models import (
+    EventLog,
+    GanttJobsPrediction,
+    GanttJobsResource,
+    Job,
+    MoldableJobDescription,
+    Resource,
 )
-from oar.lib.models import EventLog, Job
 
 NB_JOBS = 5
 
@@ -130,6 +142,107 @@ def test_get_data_jobs_moldable(monkeypatch, minimal_db_initialization, setup_co
         assert len(jobs[0][test_job_id].mld_res_rqts) == test_nb_mold
 
 
+def test_get_data_jobs_batched_constraints(minimal_db_initialization, setup_config):
+    config, _ = setup_config
+    session = minimal_db_initialization
+    for i in range(8):
+        Resource.create(session, network_address="node%d" % (i // 2), cpu=i % 4)
+
+    def get_data_jobs_queries(queue, nb_jobs):
+        sql_constraints = {}
+        for i in range(nb_jobs):
+            properties = "network_address <> 'node%d'" % (i % 4)
+            # abs() is not evaluated in memory but by the database
+            grp_property = ("abs(cpu) < %d" if i % 2 else "cpu < %d") % (i % 8)
+            job_id = insert_job(
+                session,
+                res=[(60, [("resource_id=1", grp_property)])],
+                properties=properties,
+                queue_name=queue,
+            )
+            sql_constraints[job_id] = properties + " AND " + grp_property
+
+        plt = Platform()
+        resource_set = plt.resource_set(session, config)
+        jobs, jids, _ = plt.get_waiting_jobs(queue, session=session)
+
+        queries = []
+        engine = session.get_bind().engine
+
+        def count_query(conn, cursor, statement, *args):
+            queries.append(statement)
+
+        event.listen(engine, "after_cursor_execute", count_query)
+        try:
+            get_data_jobs(session, jobs, jids, resource_set, 5)
+        finally:
+            event.remove(engine, "after_cursor_execute", count_query)
+        return jobs, sql_constraints, resource_set, queries
+
+    _, _, _, queries_2_jobs = get_data_jobs_queries("few", 2)
+    jobs, sql_constraints, resource_set, queries = get_data_jobs_queries("many", 32)
+    # The distinct constraints are evaluated in memory or by the same query
+    assert len(queries) == len(queries_2_jobs)
+
+    for job_id, job in jobs.items():
+        rids = session.query(Resource.id).filter(text(sql_constraints[job_id]))
+        roids = ProcSet(*[resource_set.rid_i2o[r] for (r,) in rids])
+        for _, _, jrg in job.mld_res_rqts:
+            for _, constraints in jrg:
+                assert constraints == roids
+
+
+@pytest.mark.parametrize("bulk", ["no", "yes"])
+def test_save_assigns(bulk, monkeypatch, minimal_db_initialization, setup_config):
+    config, _ = setup_config
+    session = minimal_db_initialization
+    # Several chunks of multi-row inserts
+    monkeypatch.setattr(oar.lib.job_handling, "SAVE_ASSIGNS_BULK_CHUNK_SIZE", 7)
+    monkeypatch.setitem(config, "SCHEDULER_SAVE_ASSIGNS_BULK", bulk)
+    for i in range(20):
+        Resource.create(session, network_address="node%d" % (i // 4))
+    resource_set = Platform().resource_set(session, config)
+
+    jobs = []
+    for i in range(6):
+        job_id = insert_job(session, res=[(60, [("resource_id=%d" % (i + 1), "")])])
+        moldable_id = (
+            session.query(MoldableJobDescription.id)
+            .filter(MoldableJobDescription.job_id == job_id)
+            .scalar()
+        )
+        jobs.append(
+            JobPseudo(
+                id=job_id,
+                moldable_id=moldable_id,
+                start_time=1000 * i if i else -1,
+                walltime=60,
+                res_set=ProcSet((i, 2 * i + 1)),
+                type="PASSIVE",
+                queue_name="default",
+                name=None,
+            )
+        )
+    gantt_flush_tables(session)
+    save_assigns(session, jobs, resource_set, config)
+
+    predictions = session.query(GanttJobsPrediction).order_by(
+        GanttJobsPrediction.moldable_id
+    )
+    assert [(p.moldable_id, p.start_time) for p in predictions] == [
+        (job.moldable_id, job.start_time) for job in jobs[1:]
+    ]
+    gantt_resources = session.query(GanttJobsResource).order_by(
+        GanttJobsResource.moldable_id, GanttJobsResource.resource_id
+    )
+    assert [(r.moldable_id, r.resource_id) for r in gantt_resources] == [
+        (job.moldable_id, resource_set.rid_o2i[roid])
+        for job in jobs[1:]
+        for roid in job.res_set
+    ]
+    assert session.get(Job, jobs[1].id).message.startswith("R=3,W=60")
+
+
 def test_job_message(minimal_db_initialization):
     session = minimal_db_initialization
 
@@ -0,0 +1,50 @@
+# coding: utf-8
+import struct
+
+from sqlalchemy import BigInteger, Column, Integer, MetaData, String, Table
+
+from oar.lib.psycopg2 import PG_COPY_BINARY_HEADER, pg_bulk_insert
+
+table = Table(
+    "copy_test",
+    MetaData(),
+    Column("id", Integer),
+    Column("big", BigInteger),
+    Column("name", String(32)),
+)
+
+
+class FakeCursor(object):
+    def copy_expert(self, sql, data):
+        self.sql = sql
+        self.data = data.read()
+
+
+def test_pg_bulk_insert_binary():
+    cursor = FakeCursor()
+    rows = [(1, 2**40, "node1"), (2, None, "é\t")]
+    pg_bulk_insert(cursor, table, rows, ("id", "big", "name"), binary=True)
+
+    assert cursor.sql == 'COPY "copy_test" ("id", "big", "name") FROM STDIN WITH BINARY'
+    data = cursor.data
+    assert data.startswith(PG_COPY_BINARY_HEADER)
+    data = data[len(PG_COPY_BINARY_HEADER) :]
+    expected = (
+        struct.pack("!hiiiq", 3, 4, 1, 8, 2**40)
+        + struct.pack("!i", 5)
+        + b"node1"
+        + struct.pack("!hiii", 3, 4, 2, -1)
+        + struct.pack("!i", 3)
+        + "é\t".encode("utf-8")
+        + struct.pack("!h", -1)
+    )
+    assert data == expected
+
+
+def test_pg_bulk_insert_text():
+    cursor = FakeCursor()
+    rows = [(1, 2**40, "node1"), (2, None, "a\\b\tc\n")]
+    pg_bulk_insert(cursor, table, rows, ("id", "big", "name"))
+
+    assert cursor.sql == 'COPY "copy_test" ("id", "big", "name") FROM STDIN'
+    assert cursor.data == "1\t1099511627776\tnode1\n2\t\\N\ta\\\\b\\tc\\n\n"
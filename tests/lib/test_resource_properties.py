@@ -0,0 +1,91 @@
+# coding: utf-8
+import pytest
+from procset import ProcSet
+from sqlalchemy import text
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from oar.lib.database import ephemeral_session
+from oar.lib.models import Resource
+from oar.lib.resource import ResourceSet
+from oar.lib.resource_properties import UnsupportedExpression
+
+
+@pytest.fixture(scope="function")
+def resource_set(request, setup_config):
+    config, engine = setup_config
+    session_factory = sessionmaker(bind=engine)
+    scoped = scoped_session(session_factory)
+
+    with ephemeral_session(scoped, engine, bind=engine) as session:
+        for i in range(12):
+            Resource.create(
+                session,
+                network_address="node%d" % (i // 4),
+                host="Host%d" % (i // 4) if i % 5 else None,
+                cpu=i // 2,
+                core=i,
+                mem=None if i == 3 else 16 * (i % 3 + 1),
+                type="default" if i < 10 else "disk",
+                state="Dead" if i == 11 else "Alive",
+            )
+        yield session, ResourceSet(session, config)
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "",
+        "network_address = 'node1'",
+        "network_address='node1' or network_address = 'node2'",
+        "NETWORK_ADDRESS <> 'node1' AND mem > 16",
+        "mem >= 32 and not (cpu = 2 or core = 7)",
+        "mem != 32",
+        "32 < mem",
+        "mem <= -1 or core > 9.5",
+        "not mem = 16",
+        "cpu in (1, 3, 5) and network_address not in ('node0')",
+        "host like 'Host%'",
+        "host not like '_ost1'",
+        "host like 'host%'",
+        "host is null or mem is not null",
+        "mem > 16 or host = 'Host1'",
+        "type = 'disk'",
+        "network_address = 'it''s'",
+    ],
+)
+def test_properties_evaluator(resource_set, expression):
+    session, resource_set = resource_set
+    roids = [
+        resource_set.rid_i2o[rid]
+        for (rid,) in session.query(Resource.id).filter(text(expression))
+    ]
+    evaluator = resource_set.properties_evaluator
+    assert evaluator.evaluate(expression) == ProcSet(*roids)
+    # Second evaluation is cached
+    assert evaluator.evaluate(expression) is evaluator.evaluate(expression)
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "unknown_column = 1",
+        "network_address > 'node1'",
+        "mem = '16'",
+        "network_address = 1",
+        "lower(network_address) = 'node1'",
+        "resource_id in (select resource_id from resources)",
+        'network_address = "node1"',
+        "last_job_date > 0",
+        "host like 'Host\\_1'",
+        "mem > 16 and",
+        "(mem > 16",
+        "mem > 16)",
+    ],
+)
+def test_properties_evaluator_unsupported(resource_set, expression):
+    _, resource_set = resource_set
+    with pytest.raises(UnsupportedExpression):
+        resource_set.properties_evaluator.evaluate(expression)
+    # Unsupported expressions are also cached
+    with pytest.raises(UnsupportedExpression):
+        resource_set.properties_evaluator.evaluate(expression)
@@ -0,0 +1,55 @@
+# coding: utf-8
+import os
+import time
+
+import pytest
+
+import oar.lib.tools
+from oar.lib.tools import pingchecker_stream
+
+FAKE_PINGCHECKER = os.path.join(
+    os.path.dirname(__file__), "data", "fake_pingchecker.sh"
+)
+
+
+@pytest.fixture(scope="function")
+def fake_taktuk(monkeypatch):
+    monkeypatch.setitem(oar.lib.tools.config, "TAKTUK_CMD", "sh " + FAKE_PINGCHECKER)
+    monkeypatch.setitem(
+        oar.lib.tools.config,
+        "PINGCHECKER_TAKTUK_ARG_COMMAND",
+        "broadcast exec timeout 5 kill 9 [ true ]",
+    )
+    monkeypatch.setitem(oar.lib.tools.config, "TIMEOUT_SSH", 0.5)
+    monkeypatch.setitem(oar.lib.tools.config, "PINGCHECKER_SHARD_SIZE", "2")
+
+
+def test_pingchecker_stream(fake_taktuk):
+    hosts = ["node1", "node2", "bad1", "node3", "node4"]
+    pingcheck, bad_hosts, latencies = pingchecker_stream(hosts)
+    assert pingcheck == 1
+    assert bad_hosts == ["bad1"]
+    assert set(latencies.keys()) == {"node1", "node2", "node3", "node4"}
+
+
+def test_pingchecker_stream_timeout(fake_taktuk):
+    # Only the shard of the hung host times out, its hosts which have not answered are bad
+    hosts = ["node1", "node2", "hung1", "node3", "node4", "node5", "node4"]
+    start = time.time()
+    pingcheck, bad_hosts, latencies = pingchecker_stream(hosts)
+    assert time.time() - start < 5
+    assert pingcheck == 1
+    assert bad_hosts == ["hung1", "node3"]
+    assert set(latencies.keys()) == {"node1", "node2", "node4", "node5"}
+
+
+def test_pingchecker_stream_bad_hosts_output(monkeypatch):
+    # Generic commands only print the bad hosts
+    monkeypatch.setitem(
+        oar.lib.tools.config, "PINGCHECKER_GENERIC_COMMAND", "printf '%s\\n' "
+    )
+    monkeypatch.setitem(oar.lib.tools.config, "PINGCHECKER_SHARD_SIZE", "500")
+    pingcheck, bad_hosts, latencies = pingchecker_stream(["node1", "node2"])
+    assert pingcheck == 1
+    assert bad_hosts == ["node1", "node2"]
+    assert latencies == {}
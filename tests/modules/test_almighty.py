@@ -6,6 +6,7 @@ import pytest
 import zmq
 
 import oar.lib.tools
+import oar.modules.almighty
 
 # from oar.lib import config
 from oar.modules.almighty import Almighty, signal_handler
@@ -173,3 +174,21 @@ def test_almighty_finishTag():
     # This below doesn't work
     # global finishTag
     # finishTag = False
+
+
+def test_almighty_resident_meta_scheduler(monkeypatch, setup):
+    config = setup
+    monkeypatch.setitem(config, "METASCHEDULER_RESIDENT", "yes")
+    monkeypatch.setattr(oar.modules.almighty, "init_config", lambda: config)
+    monkeypatch.setattr(oar.modules.almighty, "finishTag", False)
+    set_fake_date(1000)
+    almighty = Almighty()
+    assert fake_popen["cmd"] == "/usr/local/lib/oar/oar-kao-server"
+
+    # socket 0: appendice, socket 1: kao server
+    fakezmq.recv_msgs[1] = [{"exit_code": 2}]
+    almighty.state = "Scheduler"
+    almighty.run(False)
+    assert fakezmq.sent_msgs[1] == [{"cmd": "SCHEDULE"}]
+    assert almighty.state == "Leon"
+    set_fake_date(0)
@@ -5,16 +5,19 @@ from sqlalchemy.orm import scoped_session, sessionmaker
 
 import oar.lib.tools  # for monkeypatching
 from oar.lib.database import ephemeral_session
+from oar.lib.globals import get_logger
 from oar.lib.job_handling import insert_job
 from oar.lib.models import (
     AssignedResource,
     Challenge,
     EventLog,
+    EventLogHostname,
     Job,
     MoldableJobDescription,
     Resource,
 )
-from oar.modules.bipbip import BipBip
+from oar.modules.bipbip import BipBip, launch_jobs
+from oar.modules.bipbip_commander import execute_bipbip_leon_command
 
 from ..faketools import FakePopen, fake_popen
 
@@ -32,7 +35,7 @@ def fake_pingchecker(hosts):
     return fake_bad_nodes["pingchecker"]
 
 
-def fake_launch_oarexec(cmt, data, oarexec_files):
+def fake_launch_oarexec(cmt, data, oarexec_files, env=None):
     return True
 
 
@@ -352,3 +355,168 @@ def test_bipbip_running_oarexec_reattachexit_bad_value(
         args=["bug", "2", "foo1"],
     )
     assert bipbip.exit_code == 2
+
+
+def _insert_jobs_to_launch(session, nb_jobs, types=[]):
+    resources = session.query(Resource).order_by(Resource.id).all()
+    job_ids = []
+    for i in range(nb_jobs):
+        (job_id, moldable_ids) = insert_job(
+            session,
+            res=[(60, [("resource_id=1", "")])],
+            properties="",
+            command="yop",
+            state="toLaunch",
+            stdout_file="poy",
+            stderr_file="yop",
+            types=types,
+            return_moldable=True,
+        )
+        session.query(Job).filter(Job.id == job_id).update(
+            {Job.assigned_moldable_job: moldable_ids[0]}, synchronize_session=False
+        )
+        Challenge.create(
+            session,
+            job_id=job_id,
+            challenge="foo1",
+            ssh_private_key="foo2",
+            ssh_public_key="foo2",
+        )
+        AssignedResource.create(
+            session, moldable_id=moldable_ids[0], resource_id=resources[i].id
+        )
+        job_ids.append(job_id)
+    session.commit()
+    return job_ids
+
+
+def test_bipbip_launch_jobs(monkeypatch, minimal_db_initialization, builtin_config):
+    session = minimal_db_initialization
+    pingchecked_hosts = []
+
+    def fake_round_pingchecker(hosts):
+        pingchecked_hosts.append(hosts)
+        return (1, ["localhost1"])
+
+    monkeypatch.setattr(oar.lib.tools, "pingchecker", fake_round_pingchecker)
+
+    job_ids = _insert_jobs_to_launch(session, 3)
+    exit_codes = launch_jobs(lambda: session, builtin_config, job_ids)
+
+    # Nodes of all the jobs are checked at once
+    assert pingchecked_hosts == [["localhost0", "localhost1", "localhost2"]]
+    assert exit_codes == {job_ids[0]: 0, job_ids[1]: 2, job_ids[2]: 0}
+    states = dict(session.query(Job.id, Job.state).filter(Job.id.in_(job_ids)))
+    assert states[job_ids[0]] == "Running"
+    assert states[job_ids[2]] == "Running"
+
+
+def test_bipbip_launch_jobs_pool(
+    monkeypatch, minimal_db_initialization, builtin_config
+):
+    session = minimal_db_initialization
+    pingchecked_hosts = []
+
+    def fake_round_pingchecker(hosts):
+        pingchecked_hosts.append(hosts)
+        return (1, ["localhost1"])
+
+    def fake_run(self, session, config):
+        # The jobs share the node check of the round
+        hosts = ["localhost%d" % (self.job_id - job_ids[0])]
+        self.exit_code = len(self.pingchecker(hosts)[1])
+
+    monkeypatch.setattr(oar.lib.tools, "pingchecker", fake_round_pingchecker)
+    monkeypatch.setattr(BipBip, "run", fake_run)
+
+    job_ids = _insert_jobs_to_launch(session, 3)
+    exit_codes = launch_jobs(lambda: session, builtin_config, job_ids, 3)
+
+    assert pingchecked_hosts == [["localhost0", "localhost1", "localhost2"]]
+    assert exit_codes == {job_ids[0]: 0, job_ids[1]: 1, job_ids[2]: 0}
+
+
+def test_bipbip_launch_jobs_round_timeout(
+    monkeypatch, minimal_db_initialization, builtin_config
+):
+    session = minimal_db_initialization
+    pingchecked_hosts = []
+
+    def fake_round_pingchecker(hosts):
+        pingchecked_hosts.append(hosts)
+        if len(hosts) > 1:
+            # Timeout of the check of the round
+            return (0, [])
+        if hosts == ["localhost1"]:
+            return (0, [])
+        return (1, [])
+
+    monkeypatch.setattr(oar.lib.tools, "pingchecker", fake_round_pingchecker)
+
+    job_ids = _insert_jobs_to_launch(session, 3)
+    exit_codes = launch_jobs(lambda: session, builtin_config, job_ids)
+
+    # Each job checks its own nodes after the timeout of the round check
+    assert pingchecked_hosts == [
+        ["localhost0", "localhost1", "localhost2"],
+        ["localhost0"],
+        ["localhost1"],
+        ["localhost2"],
+    ]
+    # Only the nodes of the job whose check timed out are suspected
+    assert exit_codes == {job_ids[0]: 0, job_ids[1]: 2, job_ids[2]: 0}
+    suspected = {
+        hostname
+        for (hostname,) in session.query(EventLogHostname.hostname)
+        .filter(EventLogHostname.event_id == EventLog.id)
+        .filter(EventLog.job_id.in_(job_ids))
+    }
+    assert suspected == {"localhost1"}
+
+
+def test_bipbip_launch_jobs_not_checked(
+    monkeypatch, minimal_db_initialization, builtin_config
+):
+    session = minimal_db_initialization
+    pingchecked_hosts = []
+
+    def fake_round_pingchecker(hosts):
+        pingchecked_hosts.append(hosts)
+        return (1, [])
+
+    monkeypatch.setattr(oar.lib.tools, "pingchecker", fake_round_pingchecker)
+
+    job_ids = _insert_jobs_to_launch(session, 2, types=["deploy"])
+    session.query(Job).filter(Job.id == job_ids[1]).update(
+        {Job.state: "Error"}, synchronize_session=False
+    )
+    session.commit()
+    exit_codes = launch_jobs(lambda: session, builtin_config, job_ids)
+
+    assert pingchecked_hosts == []
+    assert exit_codes == {job_ids[0]: 0, job_ids[1]: 1}
+
+
+def test_bipbip_commander_execute_command(minimal_db_initialization, builtin_config):
+    session = minimal_db_initialization
+    job_ids = _insert_jobs_to_launch(session, 3)
+    logger = get_logger("test_bipbip")
+
+    exit_code = execute_bipbip_leon_command(
+        {"job_id": job_ids[0], "cmd": "OARRUN", "args": []},
+        builtin_config,
+        lambda: session,
+        logger,
+    )
+    assert exit_code == 0
+
+    # Jobs of a round
+    exit_code = execute_bipbip_leon_command(
+        {"job_id": job_ids[1], "cmd": "OARRUN", "job_ids": job_ids[1:]},
+        builtin_config,
+        lambda: session,
+        logger,
+    )
+    assert exit_code == 0
+    states = dict(session.query(Job.id, Job.state).filter(Job.id.in_(job_ids)))
+    assert set(states.values()) == {"Running"}
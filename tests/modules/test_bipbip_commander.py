@@ -4,6 +4,7 @@ import pytest
 import zmq
 
 import oar.lib.tools
+import oar.modules.bipbip_commander
 from oar.modules.bipbip_commander import BipbipCommander
 
 from ..faketools import (
@@ -94,3 +95,83 @@ def test_bipbip_commander_LEONEXTERMINATE2(setup_config):
     print(bipbip_commander.bipbip_leon_commands_to_run)
     assert bipbip_commander.bipbip_leon_commands_to_run[0]["job_id"] == 10
     assert ["/usr/local/lib/oar/oar-leon", "10"] == fake_popen["cmd"].split()
+
+
+def test_bipbip_commander_OARRUN_round(monkeypatch, setup_config, setup):
+    config, _ = setup_config
+    launched_commands = []
+    monkeypatch.setattr(
+        oar.modules.bipbip_commander,
+        "launch_command",
+        lambda command, logger: launched_commands.append(command),
+    )
+    config["BIPBIP_LAUNCH_POOL_SIZE"] = "4"
+    config["MAX_CONCURRENT_JOBS_STARTING_OR_TERMINATING"] = "3"
+    fakezmq.recv_msgs[0] = [
+        {"job_id": 10, "cmd": "OARRUN", "args": []},
+        {"job_id": 11, "cmd": "OARRUN", "args": []},
+        {"job_id": 10, "cmd": "OARRUN", "args": []},
+        {"job_id": 12, "cmd": "LEONEXTERMINATE"},
+        {"job_id": 13, "cmd": "OARRUN", "args": []},
+        {"job_id": 14, "cmd": "OARRUN", "args": []},
+    ]
+    bipbip_commander = BipbipCommander(config)
+    del config["BIPBIP_LAUNCH_POOL_SIZE"]
+    del config["MAX_CONCURRENT_JOBS_STARTING_OR_TERMINATING"]
+
+    bipbip_commander.run(False)
+
+    # The first jobs of the round are launched by one bipbip, the command of the job
+    # with an executor is requeued
+    assert launched_commands == [
+        "/usr/local/lib/oar/oar-bipbip --round 10 11 13",
+        "/usr/local/lib/oar/oar-leon 12",
+    ]
+    assert set(bipbip_commander.bipbip_leon_executors.keys()) == {10, 11, 12, 13}
+    assert [c["job_id"] for c in bipbip_commander.bipbip_leon_commands_to_run] == [
+        14,
+        10,
+    ]
+
+
+class NotStartedProcess(object):
+    def __init__(self, **kargs):
+        self.target = kargs["target"]
+        self.args = kargs["args"]
+
+    def start(self):
+        pass
+
+    def is_alive(self):
+        return True
+
+
+def test_bipbip_commander_workers(monkeypatch, setup_config, setup):
+    config, _ = setup_config
+    monkeypatch.setattr(oar.lib.tools, "Process", NotStartedProcess)
+    config["BIPBIP_COMMANDER_WORKERS"] = "2"
+    fakezmq.recv_msgs[0] = [
+        {"job_id": 10, "cmd": "OARRUN", "args": []},
+        {"job_id": 11, "cmd": "OARRUN", "args": []},
+        {"job_id": 12, "cmd": "LEONEXTERMINATE"},
+        {"job_id": 10, "cmd": "WORKER_DONE", "worker_id": 0, "exit_code": 0},
+    ]
+    bipbip_commander = BipbipCommander(config)
+    del config["BIPBIP_COMMANDER_WORKERS"]
+    workers_commands = [w.process.args[1] for w in bipbip_commander.workers]
+
+    bipbip_commander.run(False)
+    bipbip_commander.run(False)
+    assert workers_commands[0].recv()["job_id"] == 10
+    assert workers_commands[1].recv()["job_id"] == 11
+
+    # All the workers are busy
+    bipbip_commander.run(False)
+    assert [c["job_id"] for c in bipbip_commander.bipbip_leon_commands_to_run] == [12]
+    assert not workers_commands[0].poll()
+
+    # The first worker has finished
+    bipbip_commander.run(False)
+    assert workers_commands[0].recv() == {"job_id": 12, "cmd": "LEONEXTERMINATE"}
+    assert bipbip_commander.bipbip_leon_commands_to_run == []
+    assert set(bipbip_commander.bipbip_leon_executors.keys()) == {11, 12}
@@ -8,13 +8,16 @@ from sqlalchemy.orm import scoped_session, sessionmaker
 
 import oar.lib.tools
 import oar.lib.tools as tools
+import oar.modules.greta
 from oar.lib.database import ephemeral_session
 from oar.lib.globals import get_logger, init_oar
-from oar.lib.models import Resource
+from oar.lib.models import EventLog, EventLogHostname, Resource
 from oar.modules.greta import (
+    BatchForker,
     Greta,
     GretaClient,
     WindowForker,
+    batch_command_executor,
     command_executor,
     fill_timeouts,
     get_timeout,
@@ -448,3 +451,202 @@ def test_greta_window_forker_check_executors_timeout(
         .first()
     )
     assert resource.next_state == "Suspected"
+
+
+def test_greta_batch_command_executor(setup):
+    config = setup
+    assert batch_command_executor("HALT", ["node1", "node2"], config, logger) == 0
+    assert called_command == "printf '%s\\n' node1 node2 | sleep_cmd"
+    assert batch_command_executor("WAKEUP", ["node1"], config, logger) == 0
+    assert called_command == "printf '%s\\n' node1 | wakeup_cmd"
+
+
+class FakePool(object):
+    def __init__(self, processes):
+        self.launched = []
+
+    def apply_async(self, func, args, callback, error_callback):
+        self.launched.append((args[0], args[1], callback, error_callback))
+
+
+@pytest.mark.usefixtures("minimal_db_initialization")
+def test_greta_batch_forker(
+    setup_config, setup, minimal_db_initialization, monkeypatch
+):
+    config = setup
+    config["ENERGY_SAVING_COMMAND_BATCH_SIZE"] = 2
+    config["ENERGY_SAVING_WAKEUP_RATE"] = 3
+    now = [1000.0]
+    monkeypatch.setattr(
+        oar.modules.greta, "time", mock.MagicMock(monotonic=lambda: now[0])
+    )
+    monkeypatch.setattr(oar.modules.greta, "Pool", FakePool)
+
+    wf = BatchForker(1, 10, config, logger)
+    nodes_list_command_running = {
+        node: "command_and_args"
+        for node in ["localhost0", "localhost1", "halt3", "wake1", "wake2", "wake3"]
+    }
+    wf.add_commands_toLaunch(
+        minimal_db_initialization,
+        [
+            ("HALT", "localhost0"),
+            ("HALT", "localhost1"),
+            ("HALT", "halt3"),
+            ("WAKEUP", "wake1"),
+            ("WAKEUP", "wake2"),
+            ("WAKEUP", "wake3"),
+            ("WAKEUP", "wake4"),
+        ],
+    )
+    config["ENERGY_SAVING_COMMAND_BATCH_SIZE"] = 0
+    config["ENERGY_SAVING_WAKEUP_RATE"] = 0
+
+    # The wake up rate limits the first minute to 3 nodes
+    launched = [(cmd, nodes) for cmd, nodes, _, _ in wf.pool.launched]
+    assert launched == [
+        ("HALT", ["localhost0", "localhost1"]),
+        ("HALT", ["halt3"]),
+        ("WAKEUP", ["wake1", "wake2"]),
+        ("WAKEUP", ["wake3"]),
+    ]
+    assert list(wf.wakeup_nodes) == ["wake4"]
+    events = (
+        minimal_db_initialization.query(EventLogHostname.hostname)
+        .filter(EventLogHostname.event_id == EventLog.id)
+        .filter(EventLog.type == "WAKEUP_NODE")
+        .all()
+    )
+    assert sorted(e[0] for e in events) == ["wake1", "wake2", "wake3"]
+
+    # Completions are received from the callbacks
+    callbacks = [
+        (callback, error_callback)
+        for _, _, callback, error_callback in wf.pool.launched
+    ]
+    callbacks[0][0](0)
+    callbacks[1][0](1)
+    callbacks[2][1](Exception("failed"))
+    callbacks[3][0](0)
+    wf.check_executors(minimal_db_initialization, config, nodes_list_command_running)
+    assert wf.executors == {}
+    assert nodes_list_command_running == {
+        "halt3": "command_and_args",
+        "wake1": "command_and_args",
+        "wake2": "command_and_args",
+        "wake3": "command_and_args",
+    }
+    # The last node is woken up the next minute
+    assert len(wf.pool.launched) == 4
+    now[0] += 60
+    wf.check_executors(minimal_db_initialization, config, nodes_list_command_running)
+    assert wf.pool.launched[4][:2] == ("WAKEUP", ["wake4"])
+
+    # Halt batches which time out suspect their nodes
+    wf.add_commands_toLaunch(minimal_db_initialization, [("HALT", "localhost1")])
+    now[0] += 11
+    wf.check_executors(minimal_db_initialization, config, nodes_list_command_running)
+    assert wf.executors == {}
+    # Results after the timeout are ignored
+    wf.pool.launched[5][2](0)
+    wf.check_executors(minimal_db_initialization, config, nodes_list_command_running)
+
+    suspected = {
+        r.network_address
+        for r in minimal_db_initialization.query(Resource).filter(
+            Resource.next_state == "Suspected"
+        )
+    }
+    assert suspected == {"localhost1"}
+
+
+@pytest.mark.usefixtures("minimal_db_initialization")
+def test_greta_wakeup_batch(
+    monkeypatch, setup_config, minimal_db_initialization, setup
+):
+    config = setup
+    config["ENERGY_SAVING_COMMAND_BATCH_SIZE"] = 2
+    fakezmq.recv_msgs[0] = [{"cmd": "WAKEUP", "nodes": ["localhost2", "localhost3"]}]
+    greta = Greta(config, logger)
+    exit_code = greta.run(minimal_db_initialization, False)
+    config["ENERGY_SAVING_COMMAND_BATCH_SIZE"] = 0
+    assert isinstance(greta.window_forker, BatchForker)
+    assert list(greta.window_forker.executors.values())[0][:2] == (
+        ["localhost2", "localhost3"],
+        "WAKEUP",
+    )
+    assert greta.nodes_list_command_running["localhost2"]["command"] == "WAKEUP"
+    assert greta.nodes_list_command_running["localhost3"]["command"] == "WAKEUP"
+    assert exit_code == 0
+
+
+@pytest.mark.usefixtures("minimal_db_initialization")
+def test_greta_wakeup_batch_held_back(
+    monkeypatch, setup_config, minimal_db_initialization, setup
+):
+    config = setup
+    monkeypatch.setitem(config, "ENERGY_SAVING_COMMAND_BATCH_SIZE", 1)
+    monkeypatch.setitem(config, "ENERGY_SAVING_WAKEUP_RATE", 1)
+    monkeypatch.setitem(config, "ENERGY_SAVING_NODE_MANAGER_WAKEUP_TIMEOUT", 100)
+    now = [1000.0]
+    date = [10000]
+    monkeypatch.setattr(
+        oar.modules.greta, "time", mock.MagicMock(monotonic=lambda: now[0])
+    )
+    monkeypatch.setattr(oar.modules.greta, "Pool", FakePool)
+    monkeypatch.setattr(oar.lib.tools, "get_date", lambda session: date[0])
+
+    fakezmq.recv_msgs[0] = [
+        {"cmd": "WAKEUP", "nodes": ["localhost2", "localhost3"]},
+        {"cmd": "CHECK"},
+        {"cmd": "CHECK"},
+    ]
+    greta = Greta(config, logger)
+    greta.run(minimal_db_initialization, False)
+    assert list(greta.window_forker.wakeup_nodes) == ["localhost3"]
+
+    # The timeout of the launched node expires, localhost3 is still held back
+    date[0] += 150
+    greta.run(minimal_db_initialization, False)
+    assert list(greta.window_forker.wakeup_nodes) == ["localhost3"]
+    assert "localhost2" not in greta.nodes_list_command_running
+    assert greta.nodes_list_command_running["localhost3"]["timeout"] == 10250
+
+    # localhost3 is launched the next minute, its timeout starts
+    now[0] += 60
+    date[0] += 50
+    greta.run(minimal_db_initialization, False)
+    assert [nodes for _, nodes, _, _ in greta.window_forker.pool.launched] == [
+        ["localhost2"],
+        ["localhost3"],
+    ]
+    assert greta.nodes_list_command_running["localhost3"]["timeout"] == 10300
+
+    suspected = {
+        r.network_address
+        for r in minimal_db_initialization.query(Resource).filter(
+            Resource.next_state == "Suspected"
+        )
+    }
+    assert suspected == {"localhost2"}
+
+
+@pytest.mark.usefixtures("minimal_db_initialization")
+def test_greta_wakeup_batch_held_back_restart(
+    monkeypatch, setup_config, minimal_db_initialization, setup, tmp_path
+):
+    config = setup
+    monkeypatch.setitem(config, "ENERGY_SAVING_COMMAND_BATCH_SIZE", 1)
+    monkeypatch.setitem(config, "ENERGY_SAVING_WAKEUP_RATE", 1)
+    monkeypatch.setitem(config, "ENERGY_MAX_CYCLES_UNTIL_REFRESH", 1)
+    monkeypatch.setitem(config, "OAR_RUNTIME_DIRECTORY", str(tmp_path) + "/")
+    monkeypatch.setattr(oar.modules.greta, "Pool", FakePool)
+
+    fakezmq.recv_msgs[0] = [{"cmd": "WAKEUP", "nodes": ["localhost2", "localhost3"]}]
+    greta = Greta(config, logger)
+    assert greta.run(minimal_db_initialization, False) == 42
+
+    # The nodes held back by the wake up rate are restored
+    greta = Greta(config, logger)
+    assert list(greta.window_forker.wakeup_nodes) == ["localhost3"]
+    assert greta.nodes_list_command_running["localhost3"]["command"] == "WAKEUP"
@@ -0,0 +1,135 @@
+# coding: utf-8
+import os
+from tempfile import mkstemp
+
+import pytest
+import zmq
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+import oar.lib.tools
+from oar.kao.quotas import Quotas
+from oar.lib.database import ephemeral_session
+from oar.lib.job_handling import insert_job
+from oar.lib.models import Job, Queue, Resource
+from oar.modules.kao_server import KaoServer
+
+from ..fakezmq import FakeZmq
+
+fakezmq = FakeZmq()
+
+
+@pytest.fixture(scope="function")
+def scoped(request, setup_config):
+    _, engine = setup_config
+    session_factory = sessionmaker(bind=engine)
+    scoped = scoped_session(session_factory)
+
+    with ephemeral_session(scoped, engine, bind=engine) as session:
+        Queue.create(
+            session,
+            name="default",
+            priority=3,
+            scheduler_policy="kamelot",
+            state="Active",
+        )
+        for i in range(5):
+            Resource.create(session, network_address="localhost")
+
+        yield scoped
+
+
+@pytest.fixture(scope="function", autouse=True)
+def monkeypatch_tools(request, monkeypatch):
+    monkeypatch.setattr(zmq, "Context", FakeZmq)
+    monkeypatch.setattr(oar.lib.tools, "create_almighty_socket", lambda x, y: None)
+    monkeypatch.setattr(oar.lib.tools, "notify_almighty", lambda x: True)
+    monkeypatch.setattr(oar.lib.tools, "notify_bipbip_commander", lambda json_msg: True)
+    fakezmq.reset()
+
+
+def test_kao_server_schedule(scoped, setup_config):
+    config, _ = setup_config
+    session = scoped()
+    kao_server = KaoServer(config, scoped)
+
+    insert_job(session, res=[(60, [("resource_id=4", "")])], properties="")
+    fakezmq.recv_msgs[0] = [{"cmd": "SCHEDULE"}]
+    kao_server.run(False)
+
+    assert fakezmq.sent_msgs[0] == [{"exit_code": 0}]
+    assert session.query(Job).one().state == "toLaunch"
+
+    # Second round: the resource set and the gantt are kept
+    resource_set = kao_server.plt.resource_set()
+    insert_job(session, res=[(60, [("resource_id=1", "")])], properties="")
+    assert kao_server.schedule() == 0
+
+    assert kao_server.plt.resource_set() is resource_set
+    assert kao_server.gantt.nb_incremental_rounds == 1
+    assert [j.state for j in session.query(Job).order_by(Job.id).all()] == [
+        "toLaunch",
+        "toLaunch",
+    ]
+
+
+def test_kao_server_resources_change(scoped, setup_config):
+    config, _ = setup_config
+    session = scoped()
+    kao_server = KaoServer(config, scoped)
+
+    assert kao_server.schedule() == 0
+    resource_set = kao_server.plt.resource_set()
+
+    session.query(Resource).filter(Resource.id == 5).update(
+        {Resource.state: "Dead"}, synchronize_session=False
+    )
+    assert kao_server.schedule() == 0
+
+    assert kao_server.plt.resource_set() is not resource_set
+    assert len(kao_server.plt.resource_set().roid_itvs) == 4
+
+
+def test_kao_server_quotas_counter_keys_bounded(scoped, setup_config, monkeypatch):
+    config, _ = setup_config
+    session = scoped()
+    _, quotas_file_name = mkstemp()
+    with open(quotas_file_name, "w") as quotas_fd:
+        quotas_fd.write('{"quotas": {"*,*,*,/": [4,-1,-1]}}')
+    monkeypatch.setitem(config, "QUOTAS", "yes")
+    monkeypatch.setitem(config, "QUOTAS_CONF_FILE", quotas_file_name)
+    monkeypatch.setitem(config, "SCHEDULER_GANTT_FULL_REBUILD_ROUNDS", "2")
+    kao_server = KaoServer(config, scoped)
+
+    try:
+        nb_counter_keys = []
+        for i in range(12):
+            insert_job(
+                session,
+                res=[(60, [("resource_id=1", "")])],
+                properties="",
+                user="user{}".format(i),
+            )
+            assert kao_server.schedule() == 0
+            nb_counter_keys.append(len(Quotas.counter_indices))
+            session.query(Job).update(
+                {Job.state: "Terminated"}, synchronize_session=False
+            )
+    finally:
+        os.remove(quotas_file_name)
+        Quotas.enabled = False
+        Quotas.default_rules = {}
+        Quotas.reset_registries()
+
+    assert kao_server.gantt.nb_full_rebuilds == 4
+    # Only the counter keys of the users seen since the last full rebuild are kept
+    assert max(nb_counter_keys) == max(nb_counter_keys[:3])
+
+
+def test_kao_server_unknown_request(scoped, setup_config):
+    config, _ = setup_config
+    kao_server = KaoServer(config, scoped)
+
+    fakezmq.recv_msgs[0] = [{"cmd": "FOO"}]
+    kao_server.run(False)
+
+    assert fakezmq.sent_msgs[0] == [{"exit_code": -1}]
@@ -15,6 +15,7 @@ from oar.lib.models import (
     Job,
     MoldableJobDescription,
     Resource,
+    ResourceLog,
 )
 from oar.modules.node_change_state import NodeChangeState
 
@@ -484,3 +485,69 @@ def test_node_change_state_job_cosystem(minimal_db_initialization, setup_config)
 
     fragjob = minimal_db_initialization.query(FragJob).first()
     assert fragjob is not None and fragjob.job_id == job_id
+
+
+def test_node_change_state_resources_absent_alive(
+    minimal_db_initialization, setup_config, monkeypatch
+):
+    config, _ = setup_config
+    session = minimal_db_initialization
+    emails = []
+    monkeypatch.setattr(
+        oar.lib.tools, "send_log_by_email", lambda title, msg: emails.append(msg)
+    )
+    os.environ["OARDO_USER"] = "oar"
+
+    job_id = insert_job(
+        session,
+        res=[(60, [("resource_id=1", "")])],
+        properties="",
+        state="Running",
+    )
+    assign_resources_with_range(session, job_id, 0, 1)
+
+    # localhost4 is already Alive
+    session.query(Resource).update(
+        {Resource.next_state: "Absent"}, synchronize_session=False
+    )
+    session.query(Resource).filter(Resource.network_address == "localhost4").update(
+        {Resource.next_state: "Alive"}, synchronize_session=False
+    )
+    session.query(Resource).filter(Resource.network_address == "localhost1").update(
+        {Resource.next_finaud_decision: "YES"}, synchronize_session=False
+    )
+    session.commit()
+
+    node_change_state = NodeChangeState(config)
+    node_change_state.run(session)
+    assert node_change_state.exit_code == 2
+    assert [job_id for (job_id,) in session.query(FragJob.job_id)] == [job_id]
+
+    resources = session.query(Resource).order_by(Resource.id).all()
+    assert [r.state for r in resources] == ["Absent"] * 4 + ["Alive"]
+    assert [r.finaud_decision for r in resources] == ["NO", "YES", "NO", "NO", "NO"]
+    assert {r.next_state for r in resources} == {"UnChanged"}
+    assert len(emails) == 1
+
+    # The resources come back, the Absent state logs are closed
+    session.query(Resource).update(
+        {Resource.next_state: "Alive"}, synchronize_session=False
+    )
+    session.commit()
+    node_change_state = NodeChangeState(config)
+    node_change_state.run(session)
+    assert node_change_state.exit_code == 1
+
+    logs = [
+        (log.resource_id, log.value, log.date_stop == 0)
+        for log in session.query(ResourceLog)
+        .filter(ResourceLog.attribute == "state")
+        .order_by(ResourceLog.resource_id, ResourceLog.date_start, ResourceLog.value)
+    ]
+    absent_rids = [r.id for r in resources[:4]]
+    assert [log for log in logs if log[1] == "Absent"] == [
+        (rid, "Absent", False) for rid in absent_rids
+    ]
+    assert [log for log in logs if log[1] == "Alive" and log[2]] == [
+        (rid, "Alive", True) for rid in absent_rids
+    ]
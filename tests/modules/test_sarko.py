@@ -11,6 +11,7 @@ from oar.lib.models import (
     EventLog,
     FragJob,
     Job,
+    JobStateLog,
     MoldableJobDescription,
     Resource,
     ResourceLog,
@@ -48,6 +49,14 @@ def minimal_db_initialization(request, setup_config):
         yield session
 
 
+@pytest.fixture(scope="function", autouse=True, params=["no", "yes"])
+def sarko_sweep(request, setup_config):
+    config, _ = setup_config
+    config["SARKO_SWEEP"] = request.param
+    yield request.param
+    config["SARKO_SWEEP"] = "no"
+
+
 @pytest.fixture(scope="function", autouse=True)
 def monkeypatch_tools(request, monkeypatch):
     monkeypatch.setattr(oar.lib.tools, "get_date", fake_get_date)
@@ -296,3 +305,62 @@ def test_sarko_expired_resources(minimal_db_initialization, setup_config):
 
     assert resource.next_state == "Suspected"
     assert sarko.guilty_found == 0
+
+
+def test_sarko_walltimes(minimal_db_initialization, setup_config):
+    config, _ = setup_config
+    session = minimal_db_initialization
+    job_ids = {}
+    for name, walltime, checkpoint in [
+        ("expired1", 60, 0),
+        ("expired2", 90, 0),
+        ("to_checkpoint", 120, 30),
+        ("running", 120, 0),
+        ("suspended", 60, 0),
+    ]:
+        job_ids[name] = insert_job(
+            session,
+            res=[(walltime, [("resource_id=4", "")])],
+            properties="",
+            state="Running",
+            checkpoint=checkpoint,
+        )
+        assign_resources(session, job_ids[name])
+
+    # The suspended job was suspended for 300 seconds
+    session.query(Job).filter(Job.id == job_ids["suspended"]).update(
+        {Job.suspended: "YES"}, synchronize_session=False
+    )
+    JobStateLog.create(
+        session,
+        job_id=job_ids["suspended"],
+        job_state="Suspended",
+        date_start=10,
+        date_stop=310,
+    )
+    session.commit()
+
+    set_fake_date(100)
+    sarko = Sarko(config, logger)
+    sarko.run(session)
+    set_fake_date(0)
+
+    assert sarko.guilty_found == 1
+    assert {job_id for (job_id,) in session.query(FragJob.job_id)} == {
+        job_ids["expired1"],
+        job_ids["expired2"],
+    }
+    events = {
+        (event.type, event.job_id)
+        for event in session.query(EventLog).filter(
+            EventLog.job_id.in_(job_ids.values())
+        )
+    }
+    assert events == {
+        ("FRAG_JOB_REQUEST", job_ids["expired1"]),
+        ("FRAG_JOB_REQUEST", job_ids["expired2"]),
+        ("WALLTIME", job_ids["expired1"]),
+        ("WALLTIME", job_ids["expired2"]),
+        ("CHECKPOINT", job_ids["to_checkpoint"]),
+        ("CHECKPOINT_SUCCESSFULL", job_ids["to_checkpoint"]),
+    }